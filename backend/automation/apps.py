@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class AutomationConfig(AppConfig):
+    name = 'automation'
+
+    def ready(self):
+        from . import signals  # noqa: F401
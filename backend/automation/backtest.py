@@ -0,0 +1,177 @@
+"""
+Backtesting vetorizado das estratégias de automação.
+
+O histórico de um símbolo (fechos das velas ou preços das execuções) é lido
+para um array NumPy e cada estratégia é calculada sobre a série completa de
+uma vez: indicadores por somas acumuladas, sinais com a mesma regra de
+disparo por transição do runtime (`automation.engine`), execuções ao preço
+do ponto e PnL marcado a mercado numa única passagem.
+
+`sweep` distribui combinações de parâmetros por um pool de processos; cada
+processo recebe a série uma só vez e reutiliza os indicadores já calculados
+para a mesma janela.
+"""
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+from trading.candles import execution_trades
+from trading.models import Candle, Trade
+from .engine import STRATEGIES
+
+
+def load_prices(symbol, interval='1m', start=None, end=None, source='candles'):
+    """Série de preços por ordem cronológica: fechos de `interval` ou preços das execuções."""
+    if source == 'candles':
+        queryset = Candle.objects.filter(symbol=symbol, interval=interval)
+        field, order = 'close', ('bucket_start',)
+        time_field = 'bucket_start'
+    else:
+        queryset = execution_trades(Trade.objects.filter(symbol=symbol))
+        field, order = 'price', ('timestamp', 'id')
+        time_field = 'timestamp'
+    if start is not None:
+        queryset = queryset.filter(**{f'{time_field}__gte': start})
+    if end is not None:
+        queryset = queryset.filter(**{f'{time_field}__lt': end})
+    values = queryset.order_by(*order).annotate(value=Cast(field, FloatField())).values_list('value', flat=True)
+    return np.fromiter(values, dtype=np.float64)
+
+
+def sma(prices, window, cumulative=None):
+    """Média móvel simples; NaN enquanto não há `window` pontos."""
+    if cumulative is None:
+        cumulative = np.concatenate(([0.0], np.cumsum(prices)))
+    result = np.full(len(prices), np.nan)
+    if window <= len(prices):
+        result[window - 1:] = (cumulative[window:] - cumulative[:-window]) / window
+    return result
+
+
+def edges(signal, require_prior=False):
+    """Posições e sentidos dos sinais que disparam, com a regra de `batch.state` do runtime.
+
+    Um sinal dispara quando difere do último sinal não nulo; com
+    `require_prior`, só depois de já ter havido um.
+    """
+    index = np.flatnonzero(signal)
+    values = signal[index]
+    prior = np.empty_like(values)
+    prior[:1] = 0
+    prior[1:] = values[:-1]
+    fire = values != prior
+    if require_prior:
+        fire &= prior != 0
+    return index[fire], values[fire]
+
+
+class IndicatorCache:
+    """Indicadores de uma série, calculados uma vez por janela."""
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.cumulative = np.concatenate(([0.0], np.cumsum(prices)))
+        self._sma = {}
+
+    def sma(self, window):
+        window = max(int(window), 1)
+        if window not in self._sma:
+            self._sma[window] = sma(self.prices, window, self.cumulative)
+        return self._sma[window]
+
+
+def threshold_signals(indicators, buy_below=0.0, sell_above=float('inf')):
+    prices = indicators.prices
+    signal = (prices <= buy_below).astype(np.int8)
+    signal[prices >= sell_above] = -1
+    return edges(signal)
+
+
+def sma_cross_signals(indicators, fast=5, slow=20):
+    fast_avg, slow_avg = indicators.sma(fast), indicators.sma(slow)
+    # Comparações com NaN (médias ainda sem dados) dão falso, ou seja, sinal 0.
+    signal = np.subtract(fast_avg > slow_avg, fast_avg < slow_avg, dtype=np.int8)
+    return edges(signal, require_prior=True)
+
+
+SIGNALS = {'threshold': threshold_signals, 'sma_cross': sma_cross_signals}
+
+
+def simulate(prices, fill_index, fill_side, quantity=1.0, cost_bps=0.0):
+    """Executa `quantity` por sinal ao preço do ponto e marca a carteira a mercado.
+
+    Posição e caixa só mudam nas execuções: são acumuladas sobre estas e
+    depois expandidas para a série completa.
+    """
+    n = len(prices)
+    traded = fill_side * quantity
+    position = np.cumsum(traded)
+    cash = -np.cumsum(traded * prices[fill_index] * (1 + fill_side * cost_bps / 10000))
+    equity = np.zeros(n)
+    if len(fill_index):
+        lengths = np.diff(np.append(fill_index, n))
+        first = fill_index[0]
+        equity[first:] = np.repeat(cash, lengths) + np.repeat(position, lengths) * prices[first:]
+    drawdown = np.maximum.accumulate(equity) - equity if n else equity
+    return {
+        'pnl': float(equity[-1]) if n else 0.0,
+        'trades': int(len(fill_index)),
+        'max_drawdown': float(drawdown.max()) if n else 0.0,
+        'final_position': float(position[-1]) if len(position) else 0.0,
+    }
+
+
+def backtest(prices, strategy_name, parameters, cost_bps=0.0, indicators=None):
+    if strategy_name not in STRATEGIES:
+        raise ValueError(f'Estratégia desconhecida: {strategy_name}')
+    indicators = indicators or IndicatorCache(prices)
+    params = {key: float(parameters.get(key, default)) for key, default in STRATEGIES[strategy_name].defaults.items()}
+    fill_index, fill_side = SIGNALS[strategy_name](indicators, **params)
+    result = simulate(indicators.prices, fill_index, fill_side, float(parameters.get('quantity', 1)), cost_bps)
+    result['parameters'] = dict(parameters)
+    return result
+
+
+_worker_indicators = None
+
+
+def _init_worker(prices):
+    global _worker_indicators
+    _worker_indicators = IndicatorCache(prices)
+
+
+def _run_chunk(strategy_name, chunk, cost_bps):
+    return [
+        backtest(_worker_indicators.prices, strategy_name, parameters, cost_bps, _worker_indicators)
+        for parameters in chunk
+    ]
+
+
+def parameter_grid(grid):
+    """{'fast': [5, 10], 'slow': [20]} -> [{'fast': 5, 'slow': 20}, {'fast': 10, 'slow': 20}]."""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def sweep(prices, strategy_name, grid, cost_bps=0.0, processes=None):
+    """Corre todas as combinações de `grid` e devolve os resultados por PnL decrescente."""
+    combinations = parameter_grid(grid)
+    processes = processes or os.cpu_count() or 1
+    if processes <= 1 or len(combinations) <= 1:
+        indicators = IndicatorCache(prices)
+        results = [backtest(prices, strategy_name, parameters, cost_bps, indicators) for parameters in combinations]
+    else:
+        # Blocos contíguos: combinações vizinhas partilham janelas e, portanto, indicadores.
+        size = -(-len(combinations) // processes)
+        chunks = [combinations[i:i + size] for i in range(0, len(combinations), size)]
+        with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(prices,)) as pool:
+            results = [
+                result
+                for chunk_results in pool.map(_run_chunk, itertools.repeat(strategy_name), chunks, itertools.repeat(cost_bps))
+                for result in chunk_results
+            ]
+    return sorted(results, key=lambda result: result['pnl'], reverse=True)
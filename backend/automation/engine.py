@@ -0,0 +1,296 @@
+"""
+Runtime assíncrono das automações ativas.
+
+As automações são agrupadas por (estratégia, símbolo) em `StrategyBatch`, com
+os parâmetros guardados em arrays NumPy: um tick avalia todas as automações
+do lote numa única operação vetorizada, pelo que o custo por tick cresce com
+o número de lotes e não com o de automações.
+
+O runtime subscreve os grupos `market.<símbolo>` do channel layer (os mesmos
+do stream WebSocket). Entre duas avaliações só é guardado o último preço de
+cada símbolo, o que limita a latência por tick mesmo com rajadas. As ordens
+geradas num tick são criadas em lote e enviadas ao motor de matching. Num
+processo separado dos workers ASGI, o channel layer tem de ser partilhado
+(Redis ou o broker por socket Unix).
+"""
+import asyncio
+import contextlib
+import logging
+import time
+from collections import deque
+from decimal import Decimal
+
+import numpy as np
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from trading.matching import BUY, SELL, get_engine
+from trading.models import Order
+from trading.risk import get_risk_engine
+from trading.streaming import group_name
+from .models import Automation
+
+logger = logging.getLogger(__name__)
+
+
+class ThresholdStrategy:
+    """Compra abaixo de `buy_below`, vende acima de `sell_above` (uma vez por travessia)."""
+
+    name = 'threshold'
+    defaults = {'buy_below': 0.0, 'sell_above': float('inf')}
+
+    @staticmethod
+    def window(params):
+        return 1
+
+    @staticmethod
+    def evaluate(batch, price, history):
+        signal = np.where(price <= batch.params['buy_below'], 1, 0)
+        signal = np.where(price >= batch.params['sell_above'], -1, signal)
+        fire = (signal != 0) & (signal != batch.state)
+        batch.state = np.where(signal != 0, signal, batch.state)
+        return np.where(fire, signal, 0)
+
+
+class MovingAverageCrossStrategy:
+    """Compra quando a média curta (`fast`) cruza a longa (`slow`) para cima; vende no inverso."""
+
+    name = 'sma_cross'
+    defaults = {'fast': 5, 'slow': 20}
+
+    @staticmethod
+    def window(params):
+        return int(params['slow'].max())
+
+    @staticmethod
+    def evaluate(batch, price, history):
+        n = len(history)
+        cumulative = np.concatenate(([0.0], np.cumsum(history)))
+        fast = np.maximum(batch.params['fast'].astype(np.int64), 1)
+        slow = np.maximum(batch.params['slow'].astype(np.int64), 1)
+        ready = slow <= n
+        fast_avg = (cumulative[n] - cumulative[np.maximum(n - fast, 0)]) / fast
+        slow_avg = (cumulative[n] - cumulative[np.maximum(n - slow, 0)]) / slow
+        signal = np.where(ready, np.sign(fast_avg - slow_avg), 0).astype(np.int64)
+        fire = (signal != 0) & (batch.state != 0) & (signal != batch.state)
+        batch.state = np.where(signal != 0, signal, batch.state)
+        return np.where(fire, signal, 0)
+
+
+STRATEGIES = {strategy.name: strategy for strategy in (ThresholdStrategy, MovingAverageCrossStrategy)}
+
+
+class StrategyBatch:
+    """As automações de uma estratégia num símbolo, com parâmetros em colunas."""
+
+    def __init__(self, strategy, symbol, automations):
+        self.strategy = strategy
+        self.symbol = symbol
+        self.automation_ids = np.array([a.pk for a in automations], dtype=np.int64)
+        self.user_ids = np.array([a.user_id for a in automations], dtype=np.int64)
+        self.quantities = [Decimal(str(a.parameters.get('quantity', 1))) for a in automations]
+        self.params = {
+            key: np.array([float(a.parameters.get(key, default)) for a in automations], dtype=np.float64)
+            for key, default in strategy.defaults.items()
+        }
+        self.state = np.zeros(len(automations), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.automation_ids)
+
+    def inherit(self, previous):
+        """Mantém o estado das automações que já estavam no lote anterior."""
+        known = dict(zip(previous.automation_ids.tolist(), previous.state.tolist()))
+        self.state = np.array([known.get(pk, 0) for pk in self.automation_ids.tolist()], dtype=np.int64)
+
+
+def _valid(automation):
+    if automation.strategy_name not in STRATEGIES or not automation.asset_symbol:
+        return False
+    try:
+        for key in ('quantity', *STRATEGIES[automation.strategy_name].defaults):
+            float(automation.parameters.get(key, 1))
+    except (TypeError, ValueError, AttributeError):
+        return False
+    return True
+
+
+class StrategyRuntime:
+    def __init__(self, submit=True):
+        self.submit = submit
+        self.batches = {}
+        self.by_symbol = {}
+        self.history = {}
+        self.latest = {}
+        self.wakeup = None
+        self.stats = {}
+        self.tick_stats = {'ticks': 0, 'ms': 0.0, 'max_ms': 0.0}
+
+    def symbols(self):
+        return set(self.by_symbol)
+
+    def load(self, automations=None):
+        """(Re)carrega as automações ativas; o estado das que se mantêm é preservado."""
+        if automations is None:
+            automations = Automation.objects.filter(status='active').only(
+                'id', 'user_id', 'asset_symbol', 'strategy_name', 'parameters',
+            )
+        grouped = {}
+        for automation in automations:
+            if not _valid(automation):
+                logger.warning('Automação %s ignorada: estratégia ou parâmetros inválidos', automation.pk)
+                continue
+            grouped.setdefault((automation.strategy_name, automation.asset_symbol), []).append(automation)
+        batches = {}
+        for (name, symbol), members in grouped.items():
+            batch = StrategyBatch(STRATEGIES[name], symbol, members)
+            if (name, symbol) in self.batches:
+                batch.inherit(self.batches[(name, symbol)])
+            batches[(name, symbol)] = batch
+        self.batches = batches
+        self.by_symbol = {}
+        for (_, symbol), batch in batches.items():
+            self.by_symbol.setdefault(symbol, []).append(batch)
+        windows = {}
+        for (_, symbol), batch in batches.items():
+            windows[symbol] = max(windows.get(symbol, 1), batch.strategy.window(batch.params))
+        self.history = {
+            symbol: deque(self.history.get(symbol, ()), maxlen=window) for symbol, window in windows.items()
+        }
+        return sum(len(batch) for batch in batches.values())
+
+    def evaluate(self, prices):
+        """Avalia os lotes dos símbolos em `prices` e devolve as ordens (por gravar)."""
+        started = time.perf_counter()
+        orders = []
+        for symbol, price in prices.items():
+            batches = self.by_symbol.get(symbol)
+            if not batches:
+                continue
+            price = Decimal(str(price))
+            history = self.history[symbol]
+            history.append(float(price))
+            values = np.fromiter(history, dtype=np.float64, count=len(history))
+            for batch in batches:
+                batch_started = time.perf_counter()
+                signals = batch.strategy.evaluate(batch, float(price), values)
+                fired = np.flatnonzero(signals)
+                for i in fired.tolist():
+                    orders.append(Order(
+                        user_id=int(batch.user_ids[i]), asset=symbol, price=price,
+                        order_type=BUY if signals[i] > 0 else SELL, quantity=batch.quantities[i],
+                    ))
+                self._record(batch, (time.perf_counter() - batch_started) * 1000, len(fired))
+        elapsed = (time.perf_counter() - started) * 1000
+        self.tick_stats['ticks'] += 1
+        self.tick_stats['ms'] += elapsed
+        self.tick_stats['max_ms'] = max(self.tick_stats['max_ms'], elapsed)
+        return orders
+
+    def _record(self, batch, elapsed_ms, signals):
+        entry = self.stats.setdefault(
+            batch.strategy.name, {'evaluations': 0, 'automations': 0, 'signals': 0, 'ms': 0.0, 'max_ms': 0.0},
+        )
+        entry['evaluations'] += 1
+        entry['automations'] += len(batch)
+        entry['signals'] += signals
+        entry['ms'] += elapsed_ms
+        entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+
+    def report(self):
+        strategies = {}
+        for name, entry in self.stats.items():
+            strategies[name] = dict(entry, avg_ms=entry['ms'] / entry['evaluations'] if entry['evaluations'] else 0.0)
+        ticks = self.tick_stats['ticks']
+        return {
+            'automations': sum(len(batch) for batch in self.batches.values()),
+            'batches': len(self.batches),
+            'ticks': ticks,
+            'tick_avg_ms': self.tick_stats['ms'] / ticks if ticks else 0.0,
+            'tick_max_ms': self.tick_stats['max_ms'],
+            'strategies': strategies,
+        }
+
+    def place_orders(self, orders):
+        """Verifica o risco por utilizador e envia as ordens aceites num lote.
+
+        Como em `submit_batch`: as ordens de cada utilizador são verificadas em
+        conjunto (duas automações do mesmo utilizador não passam o limite juntas)
+        e os locks de envio ficam seguros até o motor reservar a exposição.
+        """
+        risk = get_risk_engine()
+        by_user = {}
+        for order in orders:
+            by_user.setdefault(order.user_id, []).append(order)
+        allowed = []
+        with contextlib.ExitStack() as locks:
+            # Por ordem de id, como qualquer outro envio que segure vários utilizadores.
+            for user_id in sorted(by_user):
+                locks.enter_context(risk.order_lock(user_id))
+                user_orders = by_user[user_id]
+                reasons = risk.check_batch(
+                    user_id, [(order.asset, order.order_type, order.quantity, order.price) for order in user_orders],
+                )
+                for order, reason in zip(user_orders, reasons):
+                    if reason:
+                        logger.info('Ordem da automação rejeitada pelo risco: %s', reason)
+                    else:
+                        allowed.append(order)
+            if not allowed:
+                return []
+            created = Order.objects.bulk_create(allowed)
+            return get_engine().submit(created)
+
+    def process(self, prices):
+        orders = self.evaluate(prices)
+        if self.submit:
+            self.place_orders(orders)
+        return orders
+
+    async def run(self, reload_interval=None):
+        """Ciclo principal: recebe ticks, avalia e envia ordens até ser cancelado."""
+        layer = get_channel_layer()
+        channel = await layer.new_channel()
+        self.wakeup = asyncio.Event()
+        tasks = [
+            asyncio.ensure_future(self._receive(layer, channel)),
+            asyncio.ensure_future(self._reload_loop(layer, channel, reload_interval)),
+            asyncio.ensure_future(self._evaluate_loop()),
+        ]
+        try:
+            # A primeira falha de qualquer uma das tarefas termina o runtime.
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _evaluate_loop(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            prices, self.latest = self.latest, {}
+            orders = self.evaluate(prices)
+            if orders and self.submit:
+                await database_sync_to_async(self.place_orders)(orders)
+
+    async def _receive(self, layer, channel):
+        while True:
+            message = await layer.receive(channel)
+            if message.get('type') == 'market.tick':
+                tick = message['tick']
+                self.latest[tick['symbol']] = tick['price']
+                self.wakeup.set()
+
+    async def _reload_loop(self, layer, channel, reload_interval):
+        interval = settings.AUTOMATION_RELOAD_INTERVAL if reload_interval is None else reload_interval
+        subscribed = set()
+        while True:
+            await database_sync_to_async(self.load)()
+            symbols = self.symbols()
+            for symbol in symbols - subscribed:
+                await layer.group_add(group_name(symbol), channel)
+            for symbol in subscribed - symbols:
+                await layer.group_discard(group_name(symbol), channel)
+            subscribed = symbols
+            await asyncio.sleep(interval)
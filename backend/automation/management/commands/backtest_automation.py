@@ -0,0 +1,59 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from automation.backtest import load_prices, sweep
+from automation.engine import STRATEGIES
+from automation.models import Automation
+
+
+def _values(text):
+    return [float(value) for value in text.split(',')]
+
+
+class Command(BaseCommand):
+    help = (
+        'Testa uma estratégia sobre o histórico de um símbolo. Cada --param aceita vários valores '
+        '(fast=5,10,20) e todas as combinações são corridas em paralelo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--automation', type=int, help='Usa o símbolo, a estratégia e os parâmetros desta automação.')
+        parser.add_argument('--symbol')
+        parser.add_argument('--strategy', choices=sorted(STRATEGIES), default='threshold')
+        parser.add_argument('--param', action='append', default=[], help='nome=v1,v2,...')
+        parser.add_argument('--interval', default='1m')
+        parser.add_argument('--source', choices=['candles', 'trades'], default='candles')
+        parser.add_argument('--cost-bps', type=float, default=0.0)
+        parser.add_argument('--processes', type=int)
+        parser.add_argument('--top', type=int, default=10)
+
+    def handle(self, *args, **options):
+        grid = {}
+        symbol, strategy = options['symbol'], options['strategy']
+        if options['automation']:
+            automation = Automation.objects.get(pk=options['automation'])
+            symbol, strategy = automation.asset_symbol, automation.strategy_name
+            grid = {key: [value] for key, value in automation.parameters.items()}
+        for item in options['param']:
+            key, _, values = item.partition('=')
+            try:
+                grid[key] = _values(values)
+            except ValueError:
+                raise CommandError(f'Parâmetro inválido: {item}')
+        if not symbol:
+            raise CommandError('Indique --symbol ou --automation.')
+        prices = load_prices(symbol, options['interval'], source=options['source'])
+        if not len(prices):
+            raise CommandError(f'Sem histórico para {symbol}.')
+        started = time.perf_counter()
+        results = sweep(prices, strategy, grid, options['cost_bps'], options['processes'])
+        self.stdout.write(json.dumps({
+            'symbol': symbol,
+            'strategy': strategy,
+            'points': len(prices),
+            'combinations': len(results),
+            'seconds': round(time.perf_counter() - started, 3),
+            'results': results[:options['top']],
+        }))
@@ -0,0 +1,62 @@
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from automation.engine import StrategyRuntime
+from automation.models import Automation
+
+
+class Command(BaseCommand):
+    help = 'Mede a latência por tick do runtime de estratégias com milhares de automações (sem base de dados).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--automations', type=int, default=10000)
+        parser.add_argument('--symbols', type=int, default=20)
+        parser.add_argument('--ticks', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        symbols = [f'SYM{i}' for i in range(options['symbols'])]
+        automations = []
+        for pk in range(1, options['automations'] + 1):
+            symbol = symbols[pk % len(symbols)]
+            if pk % 2:
+                parameters = {'buy_below': float(rng.uniform(90, 100)), 'sell_above': float(rng.uniform(100, 110))}
+                strategy = 'threshold'
+            else:
+                fast = int(rng.integers(3, 10))
+                parameters = {'fast': fast, 'slow': fast + int(rng.integers(5, 40))}
+                strategy = 'sma_cross'
+            automations.append(Automation(
+                pk=pk, user_id=pk, status='active', asset_symbol=symbol,
+                strategy_name=strategy, parameters=parameters,
+            ))
+        runtime = StrategyRuntime(submit=False)
+        runtime.load(automations)
+
+        prices = dict.fromkeys(symbols, 100.0)
+        latencies, signals = [], 0
+        for _ in range(options['ticks']):
+            symbol = symbols[int(rng.integers(len(symbols)))]
+            prices[symbol] = round(prices[symbol] * (1 + rng.normal(0, 0.01)), 4)
+            started = time.perf_counter()
+            signals += len(runtime.evaluate({symbol: prices[symbol]}))
+            latencies.append((time.perf_counter() - started) * 1000)
+        report = runtime.report()
+        self.stdout.write(json.dumps({
+            'benchmark': 'automation.tick',
+            'automations': report['automations'],
+            'batches': report['batches'],
+            'ticks': options['ticks'],
+            'signals': signals,
+            'tick_ms_p50': round(float(np.percentile(latencies, 50)), 4),
+            'tick_ms_p99': round(float(np.percentile(latencies, 99)), 4),
+            'tick_ms_max': round(max(latencies), 4),
+            'strategies': {
+                name: {key: round(value, 4) for key, value in entry.items()}
+                for name, entry in report['strategies'].items()
+            },
+        }))
@@ -0,0 +1,41 @@
+import json
+import os
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from automation.backtest import backtest, sweep
+
+
+class Command(BaseCommand):
+    help = 'Mede o backtest de um ano de dados ao minuto (série sintética) e um sweep de parâmetros.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=525600)
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.0005, options['points'])))
+
+        started = time.perf_counter()
+        single = backtest(prices, 'sma_cross', {'fast': 15, 'slow': 60})
+        single_seconds = time.perf_counter() - started
+
+        grid = {'fast': list(range(5, 55, 5)), 'slow': list(range(60, 260, 10))}
+        timings = {}
+        for processes in sorted({1, options['processes']}):
+            started = time.perf_counter()
+            results = sweep(prices, 'sma_cross', grid, processes=processes)
+            timings[processes] = round(time.perf_counter() - started, 3)
+        self.stdout.write(json.dumps({
+            'benchmark': 'automation.backtest',
+            'points': options['points'],
+            'single_seconds': round(single_seconds, 4),
+            'single_trades': single['trades'],
+            'sweep_combinations': len(results),
+            'sweep_seconds_by_processes': timings,
+            'best': results[0]['parameters'],
+        }))
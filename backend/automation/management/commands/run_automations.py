@@ -0,0 +1,33 @@
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand
+
+from automation.engine import StrategyRuntime
+
+
+class Command(BaseCommand):
+    help = 'Executa as automações ativas sobre os ticks do channel layer e reporta o tempo por estratégia.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reload-interval', type=float, help='Segundos entre recargas das automações.')
+        parser.add_argument('--report-interval', type=float, default=30.0)
+        parser.add_argument('--dry-run', action='store_true', help='Avalia as estratégias sem criar ordens.')
+
+    def handle(self, *args, **options):
+        runtime = StrategyRuntime(submit=not options['dry_run'])
+        try:
+            asyncio.run(self.run(runtime, options))
+        except KeyboardInterrupt:
+            self.stdout.write(json.dumps(runtime.report()))
+
+    async def run(self, runtime, options):
+        task = asyncio.ensure_future(runtime.run(options['reload_interval']))
+        try:
+            while True:
+                done, _ = await asyncio.wait([task], timeout=options['report_interval'])
+                if done:
+                    task.result()
+                self.stdout.write(json.dumps(runtime.report()))
+        finally:
+            task.cancel()
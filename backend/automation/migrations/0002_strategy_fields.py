@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("automation", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="automation",
+            name="asset_symbol",
+            field=models.CharField(blank=True, default="", max_length=50),
+        ),
+        migrations.AddField(
+            model_name="automation",
+            name="parameters",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="automation",
+            name="strategy_name",
+            field=models.CharField(
+                choices=[
+                    ("threshold", "Limiares de preço"),
+                    ("sma_cross", "Cruzamento de médias móveis"),
+                ],
+                default="threshold",
+                max_length=50,
+            ),
+        ),
+    ]
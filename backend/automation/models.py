@@ -0,0 +1,16 @@
+from django.db import models
+from users.models import User
+
+class Automation(models.Model):
+    STATUS_CHOICES = [('active', 'Ativa'), ('inactive', 'Inativa')]
+    STRATEGY_CHOICES = [('threshold', 'Limiares de preço'), ('sma_cross', 'Cruzamento de médias móveis')]
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='automations')
+    name = models.CharField(max_length=100)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='inactive')
+    asset_symbol = models.CharField(max_length=50, blank=True, default='')
+    strategy_name = models.CharField(max_length=50, choices=STRATEGY_CHOICES, default='threshold')
+    parameters = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
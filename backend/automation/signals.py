@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from trading_platform.fragment_cache import bump, user_scope
+from .models import Automation
+
+
+@receiver(post_save, sender=Automation)
+@receiver(post_delete, sender=Automation)
+def invalidate_automation_panel(sender, instance, **kwargs):
+    bump(user_scope(instance.user_id))
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+from automation.backtest import backtest, load_prices, sweep
+from automation.engine import StrategyRuntime
+from automation.models import Automation
+from trading.matching import get_engine
+from trading.models import Candle, Order, Trade
+from users.models import User
+
+
+@pytest.mark.parametrize('strategy, parameters', [
+    ('threshold', {'buy_below': 99, 'sell_above': 101}),
+    ('sma_cross', {'fast': 3, 'slow': 8}),
+])
+def test_backtest_fires_where_the_runtime_would(strategy, parameters):
+    """
+    A série vetorizada gera os mesmos sinais que o runtime tick a tick.
+    """
+    prices = np.round(100 + np.cumsum(np.random.default_rng(3).normal(0, 0.7, 300)), 2)
+    runtime = StrategyRuntime(submit=False)
+    runtime.load([Automation(pk=1, user_id=1, asset_symbol='X', strategy_name=strategy, parameters=parameters)])
+    live = [(i, o.order_type) for i, p in enumerate(prices) for o in runtime.evaluate({'X': p})]
+    result = backtest(prices, strategy, parameters)
+
+    assert result['trades'] == len(live) > 0
+    cash = sum(p if side == 'sell' else -p for p, side in ((prices[i], side) for i, side in live))
+    position = sum(1 if side == 'buy' else -1 for _, side in live)
+    assert result['pnl'] == pytest.approx(cash + position * prices[-1])
+
+
+@pytest.mark.django_db
+def test_sweep_over_candle_history_is_ranked_by_pnl():
+    """
+    O sweep corre todas as combinações em paralelo sobre os fechos das velas.
+    """
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    closes = 100 + 5 * np.sin(np.arange(400) / 15)
+    Candle.objects.bulk_create([
+        Candle(symbol='BTC', interval='1m', bucket_start=start + timedelta(minutes=i),
+               open=c, high=c, low=c, close=round(c, 4))
+        for i, c in enumerate(closes)
+    ])
+    prices = load_prices('BTC', '1m')
+    results = sweep(prices, 'sma_cross', {'fast': [2, 4], 'slow': [10, 20, 30]}, processes=2)
+
+    assert len(prices) == 400
+    assert len(results) == 6
+    assert [r['pnl'] for r in results] == sorted((r['pnl'] for r in results), reverse=True)
+    assert results[0] == backtest(prices, 'sma_cross', results[0]['parameters'])
+
+
+@pytest.mark.django_db
+def test_trade_prices_have_one_point_per_execution():
+    """
+    Com `source='trades'`, uma execução do motor dá um ponto e as vendas avulsas também contam.
+    """
+    get_engine().reset()
+    buyer = User.objects.create_user(username='buyer', password='x')
+    seller = User.objects.create_user(username='seller', password='x')
+    get_engine().submit([Order.objects.create(user=seller, asset='BTC', order_type='sell', quantity=1, price=100)])
+    get_engine().submit([Order.objects.create(user=buyer, asset='BTC', order_type='buy', quantity=1, price=100)])
+    get_engine().reset()
+    Trade.objects.create(user=seller, symbol='BTC', quantity=1, price=101, side='sell')
+    assert load_prices('BTC', source='trades').tolist() == [100.0, 101.0]
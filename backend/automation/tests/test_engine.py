@@ -0,0 +1,76 @@
+import pytest
+from automation.engine import StrategyRuntime
+from automation.models import Automation
+from trading.matching import get_engine
+from trading.models import Order, RiskSettings, Trade
+from trading.risk import get_risk_engine
+from users.models import User
+
+
+@pytest.mark.django_db
+def test_threshold_automations_submit_orders_that_match():
+    """
+    Um tick avalia todas as automações do símbolo e as ordens geradas passam pelo motor de matching.
+    """
+    buyer = User.objects.create_user(username='buyer', password='x')
+    seller = User.objects.create_user(username='seller', password='x')
+    Automation.objects.create(
+        user=buyer, name='Compra', status='active', asset_symbol='BTC', strategy_name='threshold',
+        parameters={'buy_below': 100, 'quantity': 2},
+    )
+    Automation.objects.create(
+        user=seller, name='Venda', status='active', asset_symbol='BTC', strategy_name='threshold',
+        parameters={'sell_above': 100, 'quantity': 2},
+    )
+    Automation.objects.create(user=seller, name='Parada', status='inactive', asset_symbol='BTC')
+    runtime = StrategyRuntime()
+    assert runtime.load() == 2
+
+    orders = runtime.process({'BTC': '100'})
+    assert sorted(order.order_type for order in orders) == ['buy', 'sell']
+    assert Trade.objects.filter(symbol='BTC', side='buy', user=buyer).count() == 1
+    assert set(Order.objects.values_list('status', flat=True)) == {'filled'}
+    # O sinal só dispara de novo depois de o preço sair da zona.
+    assert runtime.process({'BTC': '100'}) == []
+    assert runtime.report()['strategies']['threshold']['automations'] == 4
+
+
+def test_moving_average_cross_fires_on_crossing_only():
+    """
+    O cruzamento das médias gera uma ordem; a tendência estável e o aquecimento não.
+    """
+    automation = Automation(
+        pk=1, user_id=1, status='active', asset_symbol='ETH', strategy_name='sma_cross',
+        parameters={'fast': 2, 'slow': 4},
+    )
+    runtime = StrategyRuntime(submit=False)
+    runtime.load([automation])
+    sides = [[o.order_type for o in runtime.evaluate({'ETH': p})] for p in (10, 9, 8, 7, 6, 9, 12, 13)]
+    assert sides == [[], [], [], [], [], [], ['buy'], []]
+    # Recarregar mantém o estado: não há novo sinal sem novo cruzamento.
+    runtime.load([automation])
+    assert runtime.evaluate({'ETH': 14}) == []
+
+
+@pytest.mark.django_db
+def test_automations_of_one_user_share_the_risk_limit():
+    """
+    Duas automações do mesmo utilizador no mesmo tick contam juntas para o limite de posição.
+    """
+    get_engine().reset()
+    get_risk_engine().reset()
+    user = User.objects.create_user(username='bot', password='x')
+    RiskSettings.objects.create(user=user, max_position_size=150)
+    for name in ('A', 'B'):
+        Automation.objects.create(
+            user=user, name=name, status='active', asset_symbol='BTC', strategy_name='threshold',
+            parameters={'buy_below': 100, 'quantity': 1},
+        )
+    runtime = StrategyRuntime()
+    runtime.load()
+    try:
+        assert len(runtime.process({'BTC': '100'})) == 2
+        assert Order.objects.filter(user=user).count() == 1
+    finally:
+        get_engine().reset()
+        get_risk_engine().reset()
@@ -1,7 +1,10 @@
+from django.conf import settings
 from django.urls import path
-from .views import AutomationPanelHTMXView, ToggleAutomationView
+from . import views, views_async
+
+htmx = views_async if settings.ASYNC_HTMX_VIEWS else views
 
 urlpatterns = [
-    path('panel/htmx/', AutomationPanelHTMXView.as_view(), name='automation-panel-htmx'),
-    path('toggle/<int:automation_id>/', ToggleAutomationView.as_view(), name='toggle_automation'),
+    path('panel/htmx/', htmx.AutomationPanelHTMXView.as_view(), name='automation-panel-htmx'),
+    path('toggle/<int:automation_id>/', htmx.ToggleAutomationView.as_view(), name='toggle_automation'),
 ]
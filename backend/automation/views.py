@@ -1,19 +1,21 @@
 from django.views import View
-from django.shortcuts import render, get_object_or_404
-from django.http import HttpResponseRedirect, HttpResponse
-from django.template.loader import render_to_string
+from django.shortcuts import get_object_or_404
+from trading_platform.fragment_cache import render_cached, user_scope
 from .models import Automation
 
+def _automation_panel(request):
+    return render_cached(
+        request, 'automation', [user_scope(request.user.pk)], 'automation/partials/automation_panel.html',
+        lambda: {'automations': Automation.objects.filter(user=request.user)},
+    )
+
 class AutomationPanelHTMXView(View):
     def get(self, request):
-        automations = Automation.objects.filter(user=request.user)
-        return render(request, 'automation/partials/automation_panel.html', {'automations': automations})
+        return _automation_panel(request)
 
 class ToggleAutomationView(View):
     def post(self, request, automation_id):
         automation = get_object_or_404(Automation, id=automation_id, user=request.user)
         automation.status = 'inactive' if automation.status == 'active' else 'active'
         automation.save()
-        automations = Automation.objects.filter(user=request.user)
-        html = render_to_string('automation/partials/automation_panel.html', {'automations': automations}, request=request)
-        return HttpResponse(html)
\ No newline at end of file
+        return _automation_panel(request)
@@ -0,0 +1,24 @@
+from django.views import View
+from django.shortcuts import aget_object_or_404
+from trading_platform.async_views import request_user
+from trading_platform.fragment_cache import arender_cached, user_scope
+from .models import Automation
+
+async def _automation_panel(request, user):
+    async def context():
+        return {'automations': [automation async for automation in Automation.objects.filter(user=user)]}
+    return await arender_cached(
+        request, 'automation', [user_scope(user.pk)], 'automation/partials/automation_panel.html', context,
+    )
+
+class AutomationPanelHTMXView(View):
+    async def get(self, request):
+        return await _automation_panel(request, await request_user(request))
+
+class ToggleAutomationView(View):
+    async def post(self, request, automation_id):
+        user = await request_user(request)
+        automation = await aget_object_or_404(Automation, id=automation_id, user=user)
+        automation.status = 'inactive' if automation.status == 'active' else 'active'
+        await automation.asave()
+        return await _automation_panel(request, user)
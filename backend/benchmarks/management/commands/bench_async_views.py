@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from benchmarks.seed import PREFIX, bench_users
+from benchmarks.server import load, serve, summary
+
+PATHS = [
+    '/api/trading/dashboard/panels/htmx/',
+    '/api/trading/positions/htmx/',
+    '/api/trading/portfolio/htmx/',
+    '/api/trading/orderbook/htmx/',
+    '/api/trading/market-ticker/htmx/',
+    '/api/trading/performance-chart/htmx/',
+    '/api/automation/panel/htmx/',
+    '/api/chat/panel/htmx/',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara as views HTMX síncronas e assíncronas (ASYNC_HTMX_VIEWS) servidas pelo daphne, com o '
+        'mesmo número de processos: pedidos/s e latência p50/p99 com várias ligações em simultâneo. '
+        'Requer seed_benchmark_data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', dest='paths', help=f'Por omissão: {", ".join(PATHS)}.')
+        parser.add_argument('--requests', type=int, default=500, help='Pedidos medidos por caminho e modo.')
+        parser.add_argument('--warmup', type=int, default=50)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--user', default=f'{PREFIX}0')
+
+    def handle(self, *args, **options):
+        user = bench_users().filter(username=options['user']).first()
+        if user is None:
+            raise CommandError(f'Utilizador {options["user"]} inexistente; corra seed_benchmark_data primeiro.')
+        client = Client()
+        client.force_login(user)
+        headers = {
+            'Cookie': f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}',
+            'HX-Request': 'true',
+        }
+        paths = options['paths'] or PATHS
+        results = {}
+        for mode in ('sync', 'async'):
+            env = {'ASYNC_HTMX_VIEWS': '1' if mode == 'async' else '0'}
+            with serve(options['port'], env):
+                for path in paths:
+                    asyncio.run(load(options['port'], path, options['warmup'], options['concurrency'], headers))
+                    result = summary(*asyncio.run(
+                        load(options['port'], path, options['requests'], options['concurrency'], headers)
+                    ))
+                    results[mode, path] = result
+                    self.stdout.write(json.dumps({
+                        'benchmark': 'htmx.async_views', 'mode': mode, 'path': path,
+                        'concurrency': options['concurrency'], **result,
+                    }))
+        for path in paths:
+            sync, async_ = results['sync', path], results['async', path]
+            self.stdout.write(json.dumps({
+                'benchmark': 'htmx.async_views.speedup', 'path': path,
+                'requests_per_sec': round(async_['requests_per_sec'] / sync['requests_per_sec'], 2),
+                'p99': round(sync['p99_ms'] / async_['p99_ms'], 2),
+            }))
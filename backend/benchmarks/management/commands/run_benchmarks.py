@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.runner import compare, environment, run, scenario_names
+from benchmarks.seed import PREFIX, bench_users
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede latência e débito da API REST, dos painéis HTMX, do fecho de posições, das notícias '
+        '(contra um servidor local) e do fan-out do chat. Requer seed_benchmark_data. Com --compare, '
+        'termina com erro se alguma métrica piorar face à linha de base.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', dest='patterns', help='Nome ou padrão (ex.: "htmx.*").')
+        parser.add_argument('--list', action='store_true', help='Lista os cenários e termina.')
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--ws-clients', type=int, default=200)
+        parser.add_argument('--ws-messages', type=int, default=50)
+        parser.add_argument('--user', default=f'{PREFIX}0', help='Utilizador em nome de quem os pedidos são feitos.')
+        parser.add_argument('--output', help='Grava o documento JSON (serve de linha de base).')
+        parser.add_argument('--compare', help='Linha de base (JSON de uma execução anterior).')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Piora relativa aceite (0.2 = 20%%).')
+        parser.add_argument('--min-delta-ms', type=float, default=1.0, help='Piora absoluta mínima nas latências.')
+
+    def handle(self, *args, **options):
+        names = scenario_names(options['patterns'])
+        if options['list']:
+            self.stdout.write('\n'.join(names))
+            return
+        if not names:
+            raise CommandError('Nenhum cenário corresponde aos padrões indicados.')
+        user = bench_users().filter(username=options['user']).first()
+        if user is None:
+            raise CommandError(f'Utilizador {options["user"]} inexistente; corra seed_benchmark_data primeiro.')
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as handle:
+                baseline = json.load(handle)
+
+        results = []
+        for result in run(user, names, options['iterations'], options['warmup'],
+                          options['ws_clients'], options['ws_messages']):
+            results.append(result)
+            self.stdout.write(json.dumps(result))
+        document = {'environment': environment(), 'results': results}
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(document, handle, indent=2)
+
+        if baseline is not None:
+            regressions = compare(baseline, results, options['tolerance'], options['min_delta_ms'])
+            for regression in regressions:
+                self.stdout.write(json.dumps({'regression': regression}))
+            if regressions:
+                raise CommandError(f'{len(regressions)} regressão(ões) face a {options["compare"]}.')
+            self.stdout.write(json.dumps({'compare': options['compare'], 'regressions': 0}))
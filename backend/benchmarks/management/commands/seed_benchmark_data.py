@@ -0,0 +1,40 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.seed import SCALES, bench_users, clear, seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Cria dados sintéticos para os benchmarks (utilizadores bench-*, negociações, ordens, posições, '
+        'automações e mensagens). Use com USE_SQLITE_FOR_TESTS=1 ou um Postgres local, nunca em produção.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+        for name in ('users', 'symbols', 'trades', 'orders', 'positions', 'messages'):
+            parser.add_argument(f'--{name}', type=int, help=f'Sobrepõe o valor de --scale ({name}).')
+        parser.add_argument('--chunk-size', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=7)
+        parser.add_argument('--reset', action='store_true', help='Apaga os dados bench-* existentes antes.')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            clear()
+        elif bench_users().exists():
+            raise CommandError('Já existem dados de benchmark; use --reset para os recriar.')
+        volumes = dict(SCALES[options['scale']])
+        volumes.update({key: options[key] for key in volumes if options.get(key) is not None})
+        started = time.perf_counter()
+        counts = seed(
+            **volumes, chunk_size=options['chunk_size'], seed=options['seed'],
+            log=lambda message: self.stderr.write(message) if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(json.dumps({
+            'benchmark': 'benchmarks.seed',
+            'scale': options['scale'],
+            **counts,
+            'seconds': round(time.perf_counter() - started, 2),
+        }))
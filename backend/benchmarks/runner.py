@@ -0,0 +1,136 @@
+"""
+Medição dos cenários e comparação com uma linha de base.
+
+Cada cenário corre `warmup` iterações sem medir e depois `iterations`
+medidas: latência por pedido (p50/p95/p99/máx.), débito sequencial, consultas
+SQL por pedido (só as da thread do pedido) e respostas com erro. Os
+resultados são um documento JSON; `compare` assinala as métricas que
+pioraram acima da tolerância.
+"""
+import contextlib
+import fnmatch
+import platform
+import time
+
+import django
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.db import connection
+
+from .scenarios import SCENARIOS, Context, chat_fanout
+
+WS_SCENARIO = 'ws.chat.fanout'
+
+# Métricas comparadas: (nome, True se maior é melhor).
+METRICS = [('p50_ms', False), ('p95_ms', False), ('throughput_per_sec', True)]
+
+
+def scenario_names(patterns=None):
+    names = [*SCENARIOS, WS_SCENARIO]
+    if not patterns:
+        return names
+    return [name for name in names if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)]
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _summary(name, latencies, elapsed, errors, **extra):
+    latencies = np.array(latencies) * 1000
+    result = {
+        'scenario': name,
+        'iterations': len(latencies),
+        'errors': errors,
+        'seconds': round(elapsed, 4),
+        'throughput_per_sec': round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
+    for label, q in (('p50_ms', 50), ('p95_ms', 95), ('p99_ms', 99)):
+        result[label] = round(float(np.percentile(latencies, q)), 3) if len(latencies) else None
+    result['max_ms'] = round(float(latencies.max()), 3) if len(latencies) else None
+    result.update(extra)
+    return result
+
+
+def measure(ctx, name, iterations, warmup):
+    with contextlib.ExitStack() as stack:
+        ctx.stack = stack
+        step = SCENARIOS[name](ctx, iterations + warmup)
+        for _ in range(warmup):
+            step()
+        counter = _QueryCounter()
+        latencies, errors = [], 0
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            for _ in range(iterations):
+                begin = time.perf_counter()
+                status = step()
+                latencies.append(time.perf_counter() - begin)
+                if status >= 400:
+                    errors += 1
+            elapsed = time.perf_counter() - started
+    return _summary(name, latencies, elapsed, errors, queries_per_request=round(counter.count / iterations, 2))
+
+
+def run(user, names, iterations=200, warmup=20, ws_clients=200, ws_messages=50):
+    """Corre os cenários `names` como `user`, devolvendo um resultado por cenário."""
+    ctx = Context(user, None)
+    try:
+        for name in names:
+            if name == WS_SCENARIO:
+                latencies, elapsed, errors, extra = async_to_sync(chat_fanout)(ws_clients, ws_messages)
+                yield _summary(name, latencies, elapsed, errors, **extra)
+            else:
+                yield measure(ctx, name, iterations, warmup)
+    finally:
+        ctx.close()
+
+
+def environment():
+    return {
+        'vendor': connection.vendor,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'machine': platform.machine(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+
+
+def compare(baseline, results, tolerance=0.2, min_delta_ms=1.0):
+    """Regressões de `results` face a `baseline` (documento com a chave `results`).
+
+    Uma métrica regride se piorar mais de `tolerance` (fração) e o tempo por
+    pedido subir mais de `min_delta_ms`, o que ignora o ruído dos pedidos
+    de uma fração de milissegundo.
+    """
+    previous = {result['scenario']: result for result in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        base = previous.get(result['scenario'])
+        if base is None:
+            continue
+        if result.get('errors', 0) > base.get('errors', 0):
+            regressions.append({
+                'scenario': result['scenario'], 'metric': 'errors',
+                'baseline': base.get('errors', 0), 'current': result['errors'], 'change': None,
+            })
+        for metric, higher_is_better in METRICS:
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if higher_is_better:
+                worse = change < -tolerance and (new == 0 or 1000 / new - 1000 / old > min_delta_ms)
+            else:
+                worse = change > tolerance and new - old > min_delta_ms
+            if worse:
+                regressions.append({
+                    'scenario': result['scenario'], 'metric': metric,
+                    'baseline': old, 'current': new, 'change': round(change, 3),
+                })
+    return regressions
@@ -0,0 +1,268 @@
+"""
+Cenários do conjunto de benchmarks.
+
+Os pedidos HTTP passam pela pilha Django completa (middleware, autenticação,
+views e templates) através do cliente de testes, no próprio processo e sem
+rede, para que as medições reflitam o código da aplicação. A API REST usa
+JWT, como o frontend; as views HTMX usam a sessão.
+
+Cada cenário recebe o contexto e o número de iterações e devolve a função de
+uma iteração; a preparação (por exemplo, criar as posições a fechar) não é
+medida. Os cenários que escrevem apagam, no fim, o que criaram, para que
+repetir o conjunto sobre a mesma base de dados dê resultados comparáveis.
+`ws.chat.fanout` é assíncrono e mede-se à parte.
+"""
+import asyncio
+import json
+import threading
+import time
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.db.models import F, Max
+from django.test import Client, RequestFactory, override_settings
+from rest_framework.request import Request
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from trading.matching import get_engine
+from trading.models import MarketTicker, Order, OrderBook, Position
+from trading.risk import get_risk_engine
+from users.authentication import CachedJWTAuthentication
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    def register(prepare):
+        SCENARIOS[name] = prepare
+        return prepare
+    return register
+
+
+class Context:
+    """Utilizador medido, clientes autenticados e recursos partilhados entre cenários."""
+
+    def __init__(self, user, stack):
+        self.user = user
+        self.stack = stack
+        # Erros das views contam como falhas do cenário em vez de interromperem a execução.
+        self.token = str(RefreshToken.for_user(user).access_token)
+        self.api = Client(raise_request_exception=False, HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.browser = Client(raise_request_exception=False, HTTP_HX_REQUEST='true')
+        self.browser.force_login(user)
+        self.symbol = MarketTicker.objects.order_by('symbol').values_list('symbol', flat=True).first()
+        self._news = None
+
+    def news_stub(self):
+        """Servidor local no lugar da NewsAPI, arrancado na primeira utilização."""
+        if self._news is None:
+            server = ThreadingHTTPServer(('127.0.0.1', 0), _NewsStubHandler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self._news = server
+        return f'http://127.0.0.1:{self._news.server_port}/v2/everything'
+
+    def close(self):
+        if self._news is not None:
+            self._news.shutdown()
+            self._news.server_close()
+
+
+class _NewsStubHandler(BaseHTTPRequestHandler):
+    body = json.dumps({'articles': [
+        {'title': f'Artigo {i}', 'description': 'Resumo', 'url': f'https://example.com/{i}',
+         'source': {'name': 'Stub'}, 'publishedAt': '2024-01-01T00:00:00Z'}
+        for i in range(20)
+    ]}).encode()
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _discard_orders(ctx):
+    """No fim do cenário, apaga as ordens que `ctx.user` criou durante a medição."""
+    last = Order.objects.aggregate(last=Max('pk'))['last'] or 0
+
+    def discard():
+        # Compras a metade do preço de mercado: nunca executam, não há execuções a apagar.
+        Order.objects.filter(user=ctx.user, pk__gt=last, fills__isnull=True).delete()
+        # Os livros em memória (deste e de outros processos) ainda as têm: obriga a recarregá-los.
+        OrderBook.objects.filter(symbol=ctx.symbol).update(sequence=F('sequence') + 1)
+        get_engine().reset()
+        get_risk_engine().reset()
+    ctx.stack.callback(discard)
+
+
+def _get(client, path, **extra):
+    def step():
+        return client.get(path, **extra).status_code
+    return step
+
+
+# API REST
+
+@scenario('rest.positions.list')
+def rest_positions_list(ctx, iterations):
+    return _get(ctx.api, '/api/trading/positions/')
+
+
+@scenario('rest.positions.retrieve')
+def rest_positions_retrieve(ctx, iterations):
+    position = Position.objects.filter(user=ctx.user).first()
+    return _get(ctx.api, f'/api/trading/positions/{position.pk}/')
+
+
+@scenario('rest.orders.list')
+def rest_orders_list(ctx, iterations):
+    return _get(ctx.api, '/api/trading/orders/')
+
+
+@scenario('rest.orders.create')
+def rest_orders_create(ctx, iterations):
+    # Compras bem abaixo do mercado: ficam no livro sem executar.
+    price = str(Decimal(MarketTicker.objects.get(symbol=ctx.symbol).price) / 2)
+    _discard_orders(ctx)
+
+    def step():
+        return ctx.api.post('/api/trading/orders/', {
+            'asset': ctx.symbol, 'order_type': 'buy', 'quantity': '0.1', 'price': price,
+        }).status_code
+    return step
+
+
+@scenario('rest.orders.batch')
+def rest_orders_batch(ctx, iterations):
+    # Uma escada de 100 compras abaixo do mercado por pedido; comparar com 100 x rest.orders.create.
+    price = Decimal(MarketTicker.objects.get(symbol=ctx.symbol).price) / 2
+    orders = [
+        {'asset': ctx.symbol, 'order_type': 'buy', 'quantity': '0.1', 'price': str(price - i)} for i in range(100)
+    ]
+    _discard_orders(ctx)
+
+    def step():
+        return ctx.api.post(
+            '/api/trading/orders/batch/', json.dumps({'orders': orders}), content_type='application/json',
+        ).status_code
+    return step
+
+
+# Autenticação: só a resolução do token e do utilizador, sem view
+
+def _authenticate(ctx, ttl):
+    ctx.stack.enter_context(override_settings(AUTH_USER_CACHE_TTL=ttl))
+    request = Request(RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {ctx.token}'))
+    authentication = CachedJWTAuthentication()
+
+    def step():
+        user, _ = authentication.authenticate(request)
+        return 200 if user.pk == ctx.user.pk else 401
+    return step
+
+
+@scenario('auth.jwt.cached')
+def auth_jwt_cached(ctx, iterations):
+    return _authenticate(ctx, ttl=60)
+
+
+@scenario('auth.jwt.database')
+def auth_jwt_database(ctx, iterations):
+    # TTL 0: o utilizador vem sempre da base de dados, como no JWTAuthentication do simplejwt.
+    return _authenticate(ctx, ttl=0)
+
+
+# Painéis HTMX
+
+@scenario('htmx.dashboard_panels')
+def htmx_dashboard_panels(ctx, iterations):
+    return _get(ctx.browser, '/api/trading/dashboard/panels/htmx/')
+
+
+for _name, _path in [
+    ('positions', '/api/trading/positions/htmx/'),
+    ('orderbook', '/api/trading/orderbook/htmx/'),
+    ('portfolio', '/api/trading/portfolio/htmx/'),
+    ('recent_trades', '/api/trading/recent-trades/htmx/'),
+    ('performance_chart', '/api/trading/performance-chart/htmx/'),
+    ('market_ticker', '/api/trading/market-ticker/htmx/'),
+    ('automation_panel', '/api/automation/panel/htmx/'),
+    ('chat_panel', '/api/chat/panel/htmx/'),
+]:
+    scenario(f'htmx.{_name}')(lambda ctx, iterations, _path=_path: _get(ctx.browser, _path))
+
+
+@scenario('htmx.close_position')
+def htmx_close_position(ctx, iterations):
+    ticker = MarketTicker.objects.get(symbol=ctx.symbol)
+    positions = Position.objects.bulk_create([
+        Position(user=ctx.user, asset=ctx.symbol, quantity=Decimal('1'), open_price=ticker.price)
+        for _ in range(iterations)
+    ])
+    # Posições abertas à mão: o fecho não cria execuções e apagá-las desfaz o cenário.
+    ctx.stack.callback(lambda: Position.objects.filter(pk__in=[position.pk for position in positions]).delete())
+    pending = iter(positions)
+
+    def step():
+        return ctx.browser.post(f'/api/trading/positions/{next(pending).pk}/close/').status_code
+    return step
+
+
+# Notícias contra o servidor local
+
+def _news(ctx, path, client, ttl):
+    ctx.stack.enter_context(override_settings(
+        NEWS_API_KEY='bench', NEWS_API_URL=ctx.news_stub(), NEWS_CACHE_TTL=ttl, NEWS_CACHE_STALE_TTL=0,
+    ))
+    return _get(client, path)
+
+
+@scenario('news.api.cached')
+def news_api_cached(ctx, iterations):
+    return _news(ctx, '/api/news/', ctx.api, ttl=300)
+
+
+@scenario('news.api.upstream')
+def news_api_upstream(ctx, iterations):
+    # TTL 0: cada pedido vai ao servidor de notícias (pool de ligações e parsing).
+    return _news(ctx, '/api/news/', ctx.api, ttl=0)
+
+
+@scenario('news.panel')
+def news_panel(ctx, iterations):
+    return _news(ctx, '/api/news/htmx/', ctx.browser, ttl=300)
+
+
+# WebSocket
+
+async def chat_fanout(clients=200, messages=50, room='bench-fanout'):
+    """Latência de cada mensagem até chegar a todos os clientes da sala, pelo ChatConsumer."""
+    from channels.testing import WebsocketCommunicator
+    from trading_platform.asgi import application
+
+    communicators = [WebsocketCommunicator(application, f'/ws/chat/{room}/') for _ in range(clients)]
+    connected = await asyncio.gather(*(c.connect(timeout=60) for c in communicators))
+    errors = sum(1 for ok, _ in connected if not ok)
+    latencies, delivered = [], 0
+    started = time.perf_counter()
+    for i in range(messages):
+        # Emissores rotativos: o limite de débito é por ligação.
+        sender = communicators[i % clients]
+        sent = time.perf_counter()
+        await sender.send_to(text_data=json.dumps({'message': f'bench {i}'}))
+        results = await asyncio.gather(
+            *(c.receive_from(timeout=10) for c in communicators), return_exceptions=True,
+        )
+        ok = sum(1 for result in results if not isinstance(result, BaseException))
+        delivered += ok
+        errors += len(results) - ok
+        latencies.append(time.perf_counter() - sent)
+    elapsed = time.perf_counter() - started
+    # Um timeout cancela a aplicação do cliente; desligar essa ligação falha.
+    await asyncio.gather(*(c.disconnect(timeout=60) for c in communicators), return_exceptions=True)
+    return latencies, elapsed, errors, {'clients': clients, 'frames_delivered': delivered,
+                                        'frames_per_sec': round(delivered / elapsed, 1) if elapsed else None}
@@ -0,0 +1,190 @@
+"""
+Dados sintéticos para o conjunto de benchmarks.
+
+Todos os dados pertencem a utilizadores com o prefixo `bench-`, pelo que
+`clear` os remove sem tocar no resto da base de dados. As escritas são em
+lote (sem sinais). As negociações são geradas por ordem cronológica, pelo
+que as velas são agregadas em memória e inseridas quando o período fecha,
+sem o merge de `record_trades`.
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from automation.models import Automation
+from chat.models import Message
+from trading.candles import INTERVALS, aggregate
+from trading.models import Candle, MarketTicker, Order, Portfolio, Position, Trade
+from users.models import User
+
+PREFIX = 'bench-'
+PASSWORD = 'bench-password'
+SYMBOL_PREFIX = 'BENCH'
+
+# Volumes por escala; `large` aproxima a produção (milhões de negociações e ordens).
+SCALES = {
+    'small': {'users': 50, 'symbols': 10, 'trades': 20_000, 'orders': 20_000, 'positions': 10, 'messages': 2_000},
+    'medium': {'users': 500, 'symbols': 20, 'trades': 500_000, 'orders': 300_000, 'positions': 20, 'messages': 20_000},
+    'large': {'users': 5_000, 'symbols': 50, 'trades': 5_000_000, 'orders': 2_000_000, 'positions': 20, 'messages': 200_000},
+}
+
+
+def bench_users():
+    return User.objects.filter(username__startswith=PREFIX)
+
+
+def clear():
+    """Remove os utilizadores `bench-` e tudo o que lhes pertence."""
+    # Em cascata: ordens, negociações, posições e o livro de execuções saem com os utilizadores.
+    bench_users().delete()
+    Candle.objects.filter(symbol__startswith=SYMBOL_PREFIX).delete()
+    MarketTicker.objects.filter(symbol__startswith=SYMBOL_PREFIX).delete()
+
+
+def _chunks(total, size):
+    for start in range(0, total, size):
+        yield min(size, total - start)
+
+
+class _CandleWriter:
+    """Acumula velas e grava as que já fecharam."""
+
+    def __init__(self):
+        self.open = {}
+
+    def add(self, trades):
+        for key, (o, h, l, c, volume, count) in aggregate(trades).items():
+            bucket = self.open.get(key)
+            if bucket is None:
+                self.open[key] = [o, h, l, c, volume, count]
+            else:
+                bucket[1], bucket[2], bucket[3] = max(bucket[1], h), min(bucket[2], l), c
+                bucket[4] += volume
+                bucket[5] += count
+
+    def flush(self, before=None):
+        closed = [
+            key for key in self.open
+            if before is None or key[2].timestamp() + INTERVALS[key[1]] <= before.timestamp()
+        ]
+        Candle.objects.bulk_create(
+            [
+                Candle(symbol=symbol, interval=interval, bucket_start=start, open=o, high=h, low=l, close=c,
+                       volume=volume, trade_count=count)
+                for (symbol, interval, start), (o, h, l, c, volume, count) in
+                ((key, self.open.pop(key)) for key in closed)
+            ],
+            batch_size=5_000,
+        )
+
+
+def seed(users, symbols, trades, orders, positions, messages, days=30, chunk_size=10_000, seed=7, log=None):
+    """Cria os dados e devolve as contagens. `positions` é por utilizador."""
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    now = timezone.now()
+    start = now - timedelta(days=days)
+    names = [f'{SYMBOL_PREFIX}{i}' for i in range(symbols)]
+    marks = {name: rng.uniform(10, 1000) for name in names}
+
+    password = make_password(PASSWORD)
+    created = User.objects.bulk_create(
+        [User(username=f'{PREFIX}{i}', password=password, email=f'{PREFIX}{i}@example.com') for i in range(users)],
+        batch_size=chunk_size,
+    )
+    user_ids = [user.pk for user in created]
+    Portfolio.objects.bulk_create([Portfolio(user_id=pk) for pk in user_ids], batch_size=chunk_size)
+    log(f'{users} utilizadores')
+
+    # Negociações avulsas (uma linha por execução, sem pontas no livro de execuções), por ordem
+    # cronológica, com passeio aleatório do preço.
+    step = (now - start) / max(trades, 1)
+    moment = start
+    done = 0
+    candles = _CandleWriter()
+    for size in _chunks(trades, chunk_size):
+        rows, executions = [], []
+        for _ in range(size):
+            symbol = rng.choice(names)
+            marks[symbol] = max(0.01, marks[symbol] * (1 + rng.gauss(0, 0.002)))
+            price = Decimal(f'{marks[symbol]:.4f}')
+            quantity = Decimal(rng.randint(1, 100)) / 10
+            moment += step
+            side = rng.choice(('buy', 'sell'))
+            rows.append(Trade(
+                user_id=rng.choice(user_ids), symbol=symbol, quantity=quantity, price=price, side=side, timestamp=moment,
+            ))
+            executions.append((symbol, moment, price, quantity))
+        with transaction.atomic():
+            Trade.objects.bulk_create(rows)
+            candles.add(executions)
+            candles.flush(before=moment)
+        done += len(rows)
+        log(f'{done}/{trades} negociações')
+
+    candles.flush()
+
+    # Ordens: na maioria históricas; 2% em aberto, fora do spread para não cruzarem.
+    done = 0
+    for size in _chunks(orders, chunk_size):
+        rows = []
+        for _ in range(size):
+            symbol = rng.choice(names)
+            side = rng.choice(('buy', 'sell'))
+            quantity = Decimal(rng.randint(1, 100)) / 10
+            resting = rng.random() < 0.02
+            offset = rng.uniform(0.01, 0.05) * (-1 if side == 'buy' else 1)
+            price = Decimal(f'{marks[symbol] * (1 + offset if resting else rng.uniform(0.9, 1.1)):.4f}')
+            status = 'pending' if resting else rng.choice(('filled', 'filled', 'cancelled'))
+            rows.append(Order(
+                user_id=rng.choice(user_ids), asset=symbol, order_type=side, quantity=quantity, price=price,
+                status=status, filled_quantity=quantity if status == 'filled' else 0,
+            ))
+        Order.objects.bulk_create(rows)
+        done += size
+        log(f'{done}/{orders} ordens')
+
+    Position.objects.bulk_create(
+        [
+            Position(
+                user_id=pk, asset=symbol, quantity=Decimal(rng.randint(1, 50)) / 10,
+                open_price=Decimal(f'{marks[symbol] * rng.uniform(0.9, 1.1):.4f}'),
+                is_open=rng.random() < 0.7,
+            )
+            for pk in user_ids
+            for symbol in rng.sample(names, min(positions, len(names)))
+        ],
+        batch_size=chunk_size,
+    )
+    for symbol, price in marks.items():
+        MarketTicker.objects.update_or_create(
+            symbol=symbol, defaults={'price': Decimal(f'{price:.4f}'), 'volume_24h': Decimal(rng.randint(1000, 10 ** 6))},
+        )
+    Automation.objects.bulk_create(
+        [
+            Automation(
+                user_id=pk, name=f'Automação {i}', status=rng.choice(('active', 'inactive')),
+                asset_symbol=rng.choice(names), strategy_name='threshold',
+                parameters={'buy_below': 0, 'sell_above': 10 ** 6, 'quantity': 1},
+            )
+            for pk in user_ids for i in range(3)
+        ],
+        batch_size=chunk_size,
+    )
+    Message.objects.bulk_create(
+        [
+            Message(user_id=rng.choice(user_ids), room=f'bench-{i % 10}', text=f'mensagem {i}',
+                    timestamp=start + (now - start) * i / max(messages, 1))
+            for i in range(messages)
+        ],
+        batch_size=chunk_size,
+    )
+    log('posições, cotações, automações e mensagens')
+    return {
+        'users': users, 'symbols': symbols, 'trades': trades, 'orders': orders,
+        'positions': users * min(positions, len(names)), 'messages': messages,
+    }
@@ -0,0 +1,102 @@
+"""
+Carga HTTP contra um servidor ASGI real.
+
+`serve` arranca o daphne num subprocesso (um processo, como em produção por
+worker) com as variáveis de ambiente indicadas; `load` abre `concurrency`
+ligações keep-alive e reparte entre elas `requests` pedidos, medindo a
+latência de cada um do envio ao último byte da resposta.
+"""
+import asyncio
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+@contextlib.contextmanager
+def serve(port, env=None, application='trading_platform.asgi:application', timeout=30):
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'daphne', '-b', '127.0.0.1', '-p', str(port), application],
+        env={**os.environ, **(env or {})}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f'daphne terminou com o código {process.returncode}')
+            with contextlib.suppress(OSError), socket.create_connection(('127.0.0.1', port), timeout=1):
+                break
+            if time.monotonic() > deadline:
+                raise RuntimeError(f'daphne não abriu a porta {port} em {timeout}s')
+            time.sleep(0.1)
+        yield process
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def _read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def load(port, path, requests, concurrency, headers=None):
+    """Devolve (latências em segundos, segundos totais, respostas com erro)."""
+    request = ''.join(
+        [f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n']
+        + [f'{name}: {value}\r\n' for name, value in (headers or {}).items()]
+        + ['\r\n']
+    ).encode()
+    remaining = [requests]
+    latencies, errors = [], [0]
+
+    async def worker():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                started = time.perf_counter()
+                writer.write(request)
+                await writer.drain()
+                status, keep_alive = await _read_response(reader)
+                latencies.append(time.perf_counter() - started)
+                if status >= 400:
+                    errors[0] += 1
+                if not keep_alive:
+                    writer.close()
+                    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started, errors[0]
+
+
+def summary(latencies, elapsed, errors):
+    latencies = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'requests_per_sec': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 3),
+    }
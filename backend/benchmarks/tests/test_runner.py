@@ -0,0 +1,49 @@
+import pytest
+from asgiref.sync import async_to_sync
+from benchmarks.runner import compare, run
+from benchmarks.scenarios import chat_fanout
+from benchmarks.seed import bench_users, clear, seed
+from trading.matching import get_engine
+from trading.models import Order, Position
+from trading.risk import get_risk_engine
+
+
+def test_compare_flags_only_meaningful_regressions():
+    """
+    Latência e débito só regridem acima da tolerância relativa e do mínimo absoluto.
+    """
+    baseline = {'results': [
+        {'scenario': 'a', 'errors': 0, 'p50_ms': 10.0, 'p95_ms': 12.0, 'throughput_per_sec': 100.0},
+        {'scenario': 'b', 'errors': 0, 'p50_ms': 0.5, 'p95_ms': 0.6, 'throughput_per_sec': 2000.0},
+    ]}
+    results = [
+        {'scenario': 'a', 'errors': 1, 'p50_ms': 15.0, 'p95_ms': 12.5, 'throughput_per_sec': 66.0},
+        {'scenario': 'b', 'errors': 0, 'p50_ms': 0.9, 'p95_ms': 1.0, 'throughput_per_sec': 1100.0},
+        {'scenario': 'novo', 'errors': 0, 'p50_ms': 1.0, 'p95_ms': 1.0, 'throughput_per_sec': 1.0},
+    ]
+    flagged = {(r['scenario'], r['metric']) for r in compare(baseline, results, tolerance=0.2, min_delta_ms=1.0)}
+    assert flagged == {('a', 'errors'), ('a', 'p50_ms'), ('a', 'throughput_per_sec')}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_scenarios_run_against_seeded_data():
+    """
+    Com dados mínimos, todos os cenários HTTP respondem sem erros e o fan-out chega a todos os clientes.
+    """
+    # Os motores guardam estado por utilizador e símbolo entre testes.
+    get_engine().reset()
+    get_risk_engine().reset()
+    seed(users=3, symbols=2, trades=40, orders=40, positions=2, messages=5)
+    counts = (Order.objects.count(), Position.objects.count())
+    results = list(run(bench_users().first(), [
+        'rest.positions.list', 'rest.orders.create', 'rest.orders.batch', 'htmx.dashboard_panels',
+        'htmx.close_position', 'news.api.upstream', 'news.panel',
+    ], iterations=3, warmup=1))
+    assert [r['errors'] for r in results] == [0] * 7
+    # Os cenários que escrevem não deixam linhas para trás.
+    assert (Order.objects.count(), Position.objects.count()) == counts
+    assert all(r['p50_ms'] > 0 for r in results)
+    latencies, _, errors, extra = async_to_sync(chat_fanout)(clients=5, messages=3)
+    assert (len(latencies), errors, extra['frames_delivered']) == (3, 0, 15)
+    clear()
+    assert not bench_users().exists()
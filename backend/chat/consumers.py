@@ -1,36 +1,156 @@
+import asyncio
+import hashlib
 import json
+import re
+import threading
+import time
+from collections import deque
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from .store import get_chat_store
+
+_INVALID_GROUP_CHARS = re.compile(r'[^A-Za-z0-9._-]')
+
+
+def _group_name(room):
+    # O prefixo legível perde caracteres (unicode, tamanho); o hash da sala é que separa as salas.
+    prefix = _INVALID_GROUP_CHARS.sub('_', room)[:40]
+    return f'chat.{prefix}.{hashlib.sha1(room.encode()).hexdigest()}'
+
+_stats = {
+    'connections': 0,
+    'queue_depth': 0,
+    'queue_depth_max': 0,
+    'sent_frames': 0,
+    'dropped_frames': 0,
+    'rate_limited': 0,
+    'send_latency_ms_sum': 0.0,
+    'send_latency_ms_max': 0.0,
+}
+_stats_lock = threading.Lock()
+
+
+def _count(**deltas):
+    with _stats_lock:
+        for key, delta in deltas.items():
+            _stats[key] += delta
+        if _stats['queue_depth'] > _stats['queue_depth_max']:
+            _stats['queue_depth_max'] = _stats['queue_depth']
+
+
+def fanout_stats():
+    with _stats_lock:
+        data = dict(_stats)
+    data['send_latency_ms_avg'] = data['send_latency_ms_sum'] / data['sent_frames'] if data['sent_frames'] else 0.0
+    return data
+
+
+def reset_fanout_stats():
+    with _stats_lock:
+        for key in _stats:
+            if key != 'connections':
+                _stats[key] = 0
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def allow(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    """
+    Chat por sala (ws/chat/<sala>/; sem sala, 'global').
+
+    Cada ligação tem uma fila de envio limitada: se o cliente não acompanhar,
+    as mensagens mais antigas são descartadas em vez de acumular memória.
+    O `receive` é limitado por um token bucket por ligação.
+    """
+
     async def connect(self):
-        self.room_group_name = 'global_chat'
+        self.room = self.scope['url_route']['kwargs'].get('room', 'global')
+        self.room_group_name = _group_name(self.room)
+        self.outbox = deque(maxlen=settings.CHAT_SEND_QUEUE_SIZE)
+        self.wakeup = asyncio.Event()
+        self.bucket = TokenBucket(settings.CHAT_RATE_LIMIT, settings.CHAT_RATE_BURST)
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
         await self.accept()
+        self.sender = asyncio.ensure_future(self.send_loop())
+        _count(connections=1)
 
     async def disconnect(self, close_code):
+        if hasattr(self, 'sender'):
+            self.sender.cancel()
+            _count(connections=-1, queue_depth=-len(self.outbox))
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
 
     async def receive(self, text_data):
+        if not self.bucket.allow():
+            _count(rate_limited=1)
+            await self.send(text_data=json.dumps({'error': 'rate_limited'}))
+            return
         data = json.loads(text_data)
         message = data['message']
         user = self.scope['user'].username if self.scope['user'].is_authenticated else 'Anonymous'
+        if self.scope['user'].is_authenticated:
+            # Só memória: a gravação é feita em lote pelo buffer write-behind.
+            await sync_to_async(get_chat_store().post)(self.room, self.scope['user'], message)
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 'type': 'chat_message',
                 'message': message,
                 'user': user,
+                'sent_at': time.time(),
             }
         )
 
+    async def dispatch(self, message):
+        # Eventos de fan-out não tocam na base de dados: evita o salto para a
+        # thread síncrona (close_old_connections) que o Channels faz por evento.
+        if message['type'] in ('chat_message', 'chat.message'):
+            await self.chat_message(message)
+        else:
+            await super().dispatch(message)
+
     async def chat_message(self, event):
-        await self.send(text_data=json.dumps({
-            'message': event['message'],
-            'user': event['user'],
-        }))
+        if len(self.outbox) == self.outbox.maxlen:
+            _count(dropped_frames=1, queue_depth=-1)
+        self.outbox.append(event)
+        _count(queue_depth=1)
+        self.wakeup.set()
+
+    async def send_loop(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            while self.outbox:
+                event = self.outbox.popleft()
+                _count(queue_depth=-1)
+                await self.send(text_data=json.dumps({
+                    'message': event['message'],
+                    'user': event['user'],
+                }))
+                latency = (time.time() - event.get('sent_at', time.time())) * 1000
+                with _stats_lock:
+                    _stats['sent_frames'] += 1
+                    _stats['send_latency_ms_sum'] += latency
+                    _stats['send_latency_ms_max'] = max(_stats['send_latency_ms_max'], latency)
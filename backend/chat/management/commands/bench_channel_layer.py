@@ -0,0 +1,133 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from trading_platform.channel_layers import ChannelBroker, UnixSocketChannelLayer
+
+
+def _make_layer(kind, target, capacity):
+    if kind == 'unix':
+        return UnixSocketChannelLayer(path=target, capacity=capacity)
+    from channels_redis.core import RedisChannelLayer
+    return RedisChannelLayer(hosts=target, capacity=capacity)
+
+
+def _serve_broker(path):
+    asyncio.run(ChannelBroker().serve(path))
+
+
+def _worker(kind, target, index, consumers, groups, per_group, ready, results):
+    async def run():
+        layer = _make_layer(kind, target, capacity=per_group + 10)
+        channels = []
+        for i in range(consumers):
+            channel = await layer.new_channel()
+            await layer.group_add(f'bench.{(index * consumers + i) % groups}', channel)
+            channels.append(channel)
+        ready.put(index)
+        latencies = []
+        last = [0.0]
+
+        async def consume(channel):
+            for _ in range(per_group):
+                message = await layer.receive(channel)
+                now = time.time()
+                latencies.append(now - message['sent_at'])
+                last[0] = now
+
+        try:
+            await asyncio.wait_for(asyncio.gather(*(consume(c) for c in channels)), timeout=120)
+        except asyncio.TimeoutError:
+            pass
+        results.put((len(latencies), last[0], latencies))
+
+    asyncio.run(run())
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede o débito e a latência de group_send do channel layer com 1, 4 e 16 processos '
+        'a receber (broker por socket Unix ou Redis).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--layer', choices=['unix', 'redis'], default='unix')
+        parser.add_argument('--redis', help='Endereços Redis separados por vírgulas (omissão: CHANNEL_REDIS_HOSTS).')
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16])
+        parser.add_argument('--consumers', type=int, default=50, help='Canais por processo.')
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--messages', type=int, default=2000, help='group_send por execução.')
+        parser.add_argument('--rate', type=float, default=0, help='group_send por segundo (0 = sem pausas).')
+
+    def handle(self, *args, **options):
+        broker = None
+        if options['layer'] == 'unix':
+            target = os.path.join(tempfile.mkdtemp(), 'channels.sock')
+            broker = multiprocessing.Process(target=_serve_broker, args=(target,), daemon=True)
+            broker.start()
+            while not os.path.exists(target):
+                time.sleep(0.01)
+        else:
+            target = options['redis'].split(',') if options['redis'] else settings.CHANNEL_REDIS_HOSTS
+            if not target:
+                raise CommandError('Indique --redis ou defina CHANNEL_REDIS_HOSTS.')
+        try:
+            for workers in options['workers']:
+                self.stdout.write(json.dumps(self.run(options['layer'], target, workers, options)))
+        finally:
+            if broker is not None:
+                broker.terminate()
+
+    def run(self, kind, target, workers, options):
+        groups, messages, consumers = options['groups'], options['messages'], options['consumers']
+        rate = options['rate']
+        per_group = messages // groups
+        ready, results = multiprocessing.Queue(), multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=_worker, args=(kind, target, i, consumers, groups, per_group, ready, results),
+            )
+            for i in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for _ in processes:
+            ready.get(timeout=60)
+
+        async def publish():
+            layer = _make_layer(kind, target, capacity=messages)
+            for i in range(per_group * groups):
+                await layer.group_send(f'bench.{i % groups}', {'type': 'bench', 'sent_at': time.time()})
+                if rate:
+                    await asyncio.sleep(max(0.0, started + (i + 1) / rate - time.time()))
+
+        started = time.time()
+        asyncio.run(publish())
+        publish_seconds = time.time() - started
+        collected = [results.get(timeout=180) for _ in processes]
+        for process in processes:
+            process.join()
+        delivered = sum(count for count, _, _ in collected)
+        elapsed = max(last for _, last, _ in collected) - started
+        latencies = np.array([value for _, _, values in collected for value in values]) * 1000
+        return {
+            'benchmark': 'channels.group_send',
+            'layer': kind,
+            'workers': workers,
+            'rate': rate or None,
+            'channels': workers * consumers,
+            'group_sends': per_group * groups,
+            'expected': workers * consumers * per_group,
+            'delivered': delivered,
+            'publish_per_sec': round(per_group * groups / publish_seconds, 1),
+            'deliveries_per_sec': round(delivered / elapsed, 1) if elapsed > 0 else None,
+            'latency_ms_p50': round(float(np.percentile(latencies, 50)), 3) if delivered else None,
+            'latency_ms_p99': round(float(np.percentile(latencies, 99)), 3) if delivered else None,
+        }
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import time
+
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+
+from chat.consumers import fanout_stats, reset_fanout_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Simula milhares de clientes WebSocket de chat contra a aplicação ASGI, no próprio processo, '
+        'e mede fan-out, latência e frames descartados.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=1000)
+        parser.add_argument('--rooms', type=int, default=10)
+        parser.add_argument('--senders', type=int, default=20, help='Clientes que enviam mensagens.')
+        parser.add_argument('--messages', type=int, default=5, help='Mensagens por cliente emissor.')
+        parser.add_argument('--slow', type=int, default=0, help='Clientes que nunca leem (testam a backpressure).')
+
+    def handle(self, *args, **options):
+        from trading_platform.asgi import application
+        self.stdout.write(json.dumps(async_to_sync(self.run)(application, **options)))
+
+    async def run(self, application, clients, rooms, senders, messages, slow, **options):
+        reset_fanout_stats()
+        communicators = [
+            WebsocketCommunicator(application, f'/ws/chat/room-{i % rooms}/') for i in range(clients)
+        ]
+        started = time.perf_counter()
+        results = await asyncio.gather(*(c.connect(timeout=60) for c in communicators))
+        connect_seconds = time.perf_counter() - started
+        connected = sum(1 for ok, _ in results if ok)
+
+        started = time.perf_counter()
+        for i in range(messages):
+            await asyncio.gather(*(
+                communicators[s].send_to(text_data=json.dumps({'message': f'{s}:{i}'}))
+                for s in range(min(senders, clients))
+            ))
+        readers = communicators[slow:]
+        per_room = {}
+        for i in range(min(senders, clients)):
+            per_room[i % rooms] = per_room.get(i % rooms, 0) + messages
+
+        async def drain(index, communicator):
+            expected = per_room.get(index % rooms, 0)
+            received = 0
+            while received < expected:
+                try:
+                    await communicator.receive_from(timeout=5)
+                except asyncio.TimeoutError:
+                    break
+                received += 1
+            return received
+
+        delivered = sum(await asyncio.gather(*(drain(slow + i, c) for i, c in enumerate(readers))))
+        fanout_seconds = time.perf_counter() - started
+        await asyncio.gather(*(c.disconnect(timeout=60) for c in communicators))
+        return {
+            'benchmark': 'chat.fanout',
+            'clients': clients,
+            'connected': connected,
+            'rooms': rooms,
+            'connect_seconds': round(connect_seconds, 3),
+            'frames_delivered': delivered,
+            'fanout_seconds': round(fanout_seconds, 3),
+            'frames_per_sec': round(delivered / fanout_seconds, 1) if fanout_seconds else None,
+            'stats': fanout_stats(),
+        }
@@ -0,0 +1,22 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from trading_platform.channel_layers import ChannelBroker
+
+
+class Command(BaseCommand):
+    help = 'Arranca o broker do channel layer por socket Unix (vários workers ASGI numa só máquina, sem Redis).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=settings.CHANNEL_BROKER_SOCKET, help='Socket Unix a servir.')
+
+    def handle(self, *args, **options):
+        if not options['path']:
+            raise CommandError('Indique --path ou defina CHANNEL_BROKER_SOCKET.')
+        self.stdout.write(f"Broker de canais em {options['path']}")
+        try:
+            asyncio.run(ChannelBroker().serve(options['path']))
+        except KeyboardInterrupt:
+            pass
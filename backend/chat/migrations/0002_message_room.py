@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chat", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="message",
+            name="room",
+            field=models.CharField(default="global", max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["room", "-timestamp"], name="chat_message_room_ts_idx"
+            ),
+        ),
+    ]
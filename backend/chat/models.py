@@ -0,0 +1,17 @@
+from django.db import models
+from django.utils import timezone
+from users.models import User
+
+class Message(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_messages')
+    room = models.CharField(max_length=100, default='global')
+    text = models.TextField()
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', '-timestamp'], name='chat_message_room_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user.username}: {self.text[:30]}'
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from trading_platform.fragment_cache import bump
+from .models import Message
+from .store import CHAT_SCOPE
+
+
+@receiver(post_save, sender=Message)
+@receiver(post_delete, sender=Message)
+def invalidate_chat_panel(sender, instance, **kwargs):
+    bump(CHAT_SCOPE)
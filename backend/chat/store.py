@@ -0,0 +1,228 @@
+"""
+Histórico em memória e escrita diferida (write-behind) das mensagens de chat.
+
+As mensagens publicadas pelo WebSocket ou pelo painel HTMX entram num anel
+limitado por sala, que serve as leituras do histórico, e num buffer que é
+gravado com `bulk_create` quando atinge `CHAT_FLUSH_SIZE` mensagens ou a cada
+`CHAT_FLUSH_INTERVAL` segundos. Assim o número de escritas cresce com o número
+de flushes, não com o de mensagens. Um lote que falha volta para a frente do
+buffer e é repetido com backoff; acima de `CHAT_MAX_PENDING` mensagens as mais
+antigas são descartadas.
+
+O anel é local ao processo: a cada `CHAT_HISTORY_SYNC_INTERVAL` segundos é
+recarregado da base de dados (mais as mensagens ainda por gravar), o que
+limita o atraso com que um processo vê mensagens publicadas noutro.
+"""
+import atexit
+import hashlib
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections
+from django.utils import timezone
+
+from trading_platform.fragment_cache import bump
+from .models import Message
+
+logger = logging.getLogger(__name__)
+
+CHAT_SCOPE = 'chat'
+# Espera máxima (segundos) entre tentativas enquanto a base de dados recusa as escritas.
+MAX_BACKOFF = 60.0
+
+
+def history_key(messages):
+    """Resumo do histórico a renderizar, para a chave do fragmento do chat.
+
+    A versão de `CHAT_SCOPE` é partilhada, mas o anel de cada processo só é
+    recarregado a cada `CHAT_HISTORY_SYNC_INTERVAL`: um processo atrasado não
+    pode guardar o seu histórico sob a versão que outro acabou de incrementar.
+    """
+    digest = hashlib.sha1()
+    for message in messages:
+        digest.update(f'{message.user_id}\x1f{message.timestamp.isoformat()}\x1f{message.text}\x1e'.encode())
+    return digest.hexdigest()
+
+
+class WriteBehindBuffer:
+    def __init__(self, flush_size, flush_interval, max_pending=10000):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._failures = 0
+        self._pending = []
+        self._inflight = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.stats = {'messages': 0, 'flushes': 0, 'errors': 0, 'dropped': 0}
+
+    def add(self, message):
+        with self._lock:
+            self._pending.append(message)
+            self._trim()
+            self.stats['messages'] += 1
+            full = len(self._pending) >= self.flush_size
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='chat-write-behind', daemon=True)
+                self._thread.start()
+        if full:
+            self._wakeup.set()
+
+    def _trim(self):
+        # Com `_lock`: só passa do limite se a base de dados estiver a recusar as escritas.
+        excess = len(self._pending) - self.max_pending
+        if excess > 0:
+            del self._pending[:excess]
+            self.stats['dropped'] += excess
+            logger.error('Buffer de chat cheio: %d mensagens descartadas', excess)
+
+    def pending(self, room):
+        with self._lock:
+            return [message for message in self._inflight + self._pending if message.room == room]
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._inflight = batch
+            if not batch:
+                return 0
+            try:
+                Message.objects.bulk_create(batch)
+            except Exception:
+                logger.exception('Falha ao gravar %d mensagens de chat; nova tentativa no próximo flush', len(batch))
+                with self._lock:
+                    # À frente das que chegaram entretanto, para manter a ordem.
+                    self._pending[:0] = batch
+                    self._inflight = []
+                    self._trim()
+                    self.stats['errors'] += 1
+                    self._failures += 1
+                return 0
+            with self._lock:
+                self._inflight = []
+                self.stats['flushes'] += 1
+                self._failures = 0
+            return len(batch)
+
+    def _run(self):
+        while True:
+            if self._failures:
+                # Backoff exponencial: um buffer cheio não antecipa a nova tentativa.
+                time.sleep(min(self.flush_interval * 2 ** min(self._failures, 16), MAX_BACKOFF))
+            else:
+                self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+class RoomHistory:
+    """Anel com as últimas `size` mensagens de cada sala."""
+
+    def __init__(self, size, sync_interval, buffer):
+        self.size = size
+        self.sync_interval = sync_interval
+        self.buffer = buffer
+        self._rooms = {}
+        self._synced_at = {}
+        self._lock = threading.Lock()
+
+    def _stored(self, room):
+        return Message.objects.filter(room=room).select_related('user').order_by('-timestamp')[:self.size]
+
+    def _fresh(self, room, now):
+        with self._lock:
+            if now - self._synced_at.get(room, float('-inf')) < self.sync_interval:
+                return list(self._rooms[room])
+        return None
+
+    def _replace(self, room, stored, now):
+        ring = deque(stored[::-1], maxlen=self.size)
+        ring.extend(self.buffer.pending(room))
+        with self._lock:
+            self._rooms[room] = ring
+            self._synced_at[room] = now
+            return list(ring)
+
+    def recent(self, room):
+        now = time.monotonic()
+        cached = self._fresh(room, now)
+        if cached is not None:
+            return cached
+        return self._replace(room, list(self._stored(room)), now)
+
+    async def arecent(self, room):
+        """Como `recent`, mas recarrega a sala com o ORM assíncrono."""
+        now = time.monotonic()
+        cached = self._fresh(room, now)
+        if cached is not None:
+            return cached
+        return self._replace(room, [message async for message in self._stored(room)], now)
+
+    def append(self, room, message):
+        with self._lock:
+            ring = self._rooms.get(room)
+            if ring is not None:
+                ring.append(message)
+
+
+class ChatStore:
+    def __init__(self, history_size, sync_interval, flush_size, flush_interval, max_pending=10000):
+        self.buffer = WriteBehindBuffer(flush_size, flush_interval, max_pending)
+        self.history = RoomHistory(history_size, sync_interval, self.buffer)
+
+    def post(self, room, user, text):
+        message = Message(room=room, user=user, text=text, timestamp=timezone.now())
+        self.history.append(room, message)
+        self.buffer.add(message)
+        bump(CHAT_SCOPE)
+        return message
+
+    def recent(self, room):
+        return self.history.recent(room)
+
+    async def arecent(self, room):
+        return await self.history.arecent(room)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_chat_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ChatStore(
+                    history_size=settings.CHAT_HISTORY_SIZE,
+                    sync_interval=settings.CHAT_HISTORY_SYNC_INTERVAL,
+                    flush_size=settings.CHAT_FLUSH_SIZE,
+                    flush_interval=settings.CHAT_FLUSH_INTERVAL,
+                    max_pending=settings.CHAT_MAX_PENDING,
+                )
+    return _store
+
+
+def _flush_on_exit():
+    if _store is not None:
+        _store.buffer.flush()
+
+
+def _reset_store(setting, **kwargs):
+    global _store
+    if setting.startswith('CHAT_'):
+        _store = None
+
+
+atexit.register(_flush_on_exit)
+setting_changed.connect(_reset_store)
@@ -0,0 +1,41 @@
+import asyncio
+
+from asgiref.sync import async_to_sync
+
+from trading_platform.channel_layers import ChannelBroker, UnixSocketChannelLayer
+
+
+def test_group_send_reaches_channels_of_other_processes(tmp_path):
+    """
+    Duas instâncias do layer (dois workers) partilham grupos através do broker.
+    """
+    path = str(tmp_path / 'channels.sock')
+
+    async def scenario():
+        broker = asyncio.ensure_future(ChannelBroker().serve(path))
+        while not (tmp_path / 'channels.sock').exists():
+            await asyncio.sleep(0.01)
+        worker_a, worker_b = UnixSocketChannelLayer(path), UnixSocketChannelLayer(path)
+        a, b = await worker_a.new_channel(), await worker_b.new_channel()
+        await worker_a.group_add('room', a)
+        await worker_b.group_add('room', b)
+        await asyncio.sleep(0.05)
+        await worker_a.group_send('room', {'type': 'chat.message', 'text': 'olá'})
+        received = [
+            await asyncio.wait_for(worker_a.receive(a), 1),
+            await asyncio.wait_for(worker_b.receive(b), 1),
+        ]
+        # Um consumidor que termina (receive cancelado) sai dos grupos.
+        pending = asyncio.ensure_future(worker_b.receive(b))
+        await asyncio.sleep(0.01)
+        pending.cancel()
+        await asyncio.sleep(0.05)
+        await worker_a.send(b, {'type': 'direct'})
+        await worker_a.group_send('room', {'type': 'chat.message', 'text': 'de novo'})
+        again = await asyncio.wait_for(worker_a.receive(a), 1)
+        broker.cancel()
+        return received, again
+
+    received, again = async_to_sync(scenario)()
+    assert [message['text'] for message in received] == ['olá', 'olá']
+    assert again['text'] == 'de novo'
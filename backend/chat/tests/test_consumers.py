@@ -0,0 +1,64 @@
+import pytest
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+
+from chat.routing import websocket_urlpatterns
+
+application = URLRouter(websocket_urlpatterns)
+
+
+def _communicator(path):
+    communicator = WebsocketCommunicator(application, path)
+    communicator.scope['user'] = AnonymousUser()
+    return communicator
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('rooms', [
+    ('btc', 'eth'),
+    # Nomes que só diferem em caracteres inválidos num grupo ou depois do 90.º caráter.
+    ('café', 'caf_'),
+    ('a' * 90 + 'x', 'a' * 90 + 'y'),
+])
+def test_messages_stay_in_their_room(rooms):
+    """
+    Uma mensagem publicada numa sala não chega às ligações de outra sala.
+    """
+    async def scenario():
+        alice = _communicator(f'/ws/chat/{rooms[0]}/')
+        bob = _communicator(f'/ws/chat/{rooms[1]}/')
+        assert (await alice.connect())[0] and (await bob.connect())[0]
+        await alice.send_json_to({'message': 'olá'})
+        received = await alice.receive_json_from(timeout=2)
+        silent = await bob.receive_nothing(timeout=0.3)
+        await alice.disconnect()
+        await bob.disconnect()
+        return received, silent
+
+    received, silent = async_to_sync(scenario)()
+    assert received == {'message': 'olá', 'user': 'Anonymous'}
+    assert silent
+
+
+@pytest.mark.django_db
+def test_receive_is_rate_limited(settings):
+    """
+    Acima do burst, o cliente recebe 'rate_limited' em vez de difundir a mensagem.
+    """
+    settings.CHAT_RATE_LIMIT = 0.001
+    settings.CHAT_RATE_BURST = 2
+
+    async def scenario():
+        communicator = _communicator('/ws/chat/')
+        await communicator.connect()
+        for i in range(3):
+            await communicator.send_json_to({'message': str(i)})
+        frames = [await communicator.receive_json_from(timeout=2) for _ in range(3)]
+        await communicator.disconnect()
+        return frames
+
+    frames = async_to_sync(scenario)()
+    assert {'error': 'rate_limited'} in frames
+    assert sorted(f['message'] for f in frames if 'message' in f) == ['0', '1']
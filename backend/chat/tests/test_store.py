@@ -0,0 +1,92 @@
+import pytest
+from django.core.cache import cache
+from django.db import DatabaseError
+from chat import views
+from chat.models import Message
+from chat.store import ChatStore, get_chat_store
+from users.models import User
+
+
+@pytest.fixture
+def store(settings):
+    # Só grava quando o teste chamar flush().
+    settings.CHAT_FLUSH_SIZE = 1000
+    settings.CHAT_FLUSH_INTERVAL = 3600
+    settings.CHAT_HISTORY_SIZE = 3
+    settings.CHAT_HISTORY_SYNC_INTERVAL = 3600
+    cache.clear()
+    return get_chat_store()
+
+
+@pytest.mark.django_db
+def test_posted_messages_are_served_from_ring_and_flushed_in_one_insert(client, store, django_assert_num_queries):
+    """
+    As mensagens aparecem de imediato no histórico e chegam à base de dados num único INSERT.
+    """
+    user = User.objects.create_user(username='talker', password='x')
+    Message.objects.create(user=user, text='antiga')
+    client.force_login(user)
+    for i in range(4):
+        response = client.post('/api/chat/message/htmx/', {'text': f'msg {i}'})
+    assert [m.text for m in store.recent('global')] == ['msg 1', 'msg 2', 'msg 3']
+    assert b'msg 3' in response.content and b'msg 0' not in response.content
+    assert Message.objects.count() == 1
+
+    with django_assert_num_queries(1):
+        assert store.buffer.flush() == 4
+    assert list(Message.objects.order_by('timestamp').values_list('text', flat=True)) == [
+        'antiga', 'msg 0', 'msg 1', 'msg 2', 'msg 3',
+    ]
+
+
+@pytest.mark.django_db
+def test_history_reload_includes_unflushed_messages(store, settings):
+    user = User.objects.create_user(username='talker', password='x')
+    Message.objects.create(user=user, text='gravada')
+    store.post('global', user, 'pendente')
+    store.history.sync_interval = 0
+    assert [m.text for m in store.recent('global')] == ['gravada', 'pendente']
+
+
+@pytest.mark.django_db
+def test_failed_flush_keeps_messages_for_the_next_one(store, monkeypatch):
+    """
+    Um erro da base de dados devolve o lote ao buffer, à frente das mensagens novas; o excesso é descartado.
+    """
+    user = User.objects.create_user(username='talker', password='x')
+    store.buffer.max_pending = 3
+    store.post('global', user, 'primeira')
+    store.post('global', user, 'segunda')
+
+    def failing(batch):
+        raise DatabaseError('base de dados indisponível')
+
+    monkeypatch.setattr(Message.objects, 'bulk_create', failing)
+    assert store.buffer.flush() == 0
+    store.post('global', user, 'terceira')
+    assert [m.text for m in store.buffer.pending('global')] == ['primeira', 'segunda', 'terceira']
+    assert store.buffer.flush() == 0
+    store.post('global', user, 'quarta')
+    monkeypatch.undo()
+
+    assert store.buffer.flush() == 3
+    assert list(Message.objects.order_by('timestamp').values_list('text', flat=True)) == ['segunda', 'terceira', 'quarta']
+    assert store.buffer.stats['dropped'] == 1 and store.buffer.stats['errors'] == 2
+
+
+@pytest.mark.django_db
+def test_stale_ring_does_not_cache_the_panel_for_other_processes(store, rf, monkeypatch):
+    """
+    Outro processo (outro ChatStore) com o anel por recarregar renderiza o painel depois do incremento
+    da versão; quem publicou continua a ver a sua mensagem.
+    """
+    user = User.objects.create_user(username='talker', password='x')
+    stale = ChatStore(history_size=3, sync_interval=3600, flush_size=1000, flush_interval=3600)
+    assert stale.recent('global') == []
+    store.post('global', user, 'nova')
+
+    request = rf.get('/api/chat/panel/htmx/')
+    monkeypatch.setattr(views, 'get_chat_store', lambda: stale)
+    assert b'nova' not in views._chat_panel(request).content
+    monkeypatch.setattr(views, 'get_chat_store', lambda: store)
+    assert b'nova' in views._chat_panel(request).content
@@ -1,11 +1,14 @@
+from django.conf import settings
 from django.urls import path
-from .views import ChatPanelHTMXView, ChatMessageHTMXView
+from . import views, views_async
+
+htmx = views_async if settings.ASYNC_HTMX_VIEWS else views
 
 urlpatterns = [
     # ...existing url patterns...
 ]
 
 urlpatterns += [
-    path('panel/htmx/', ChatPanelHTMXView.as_view(), name='chat-panel-htmx'),
-    path('message/htmx/', ChatMessageHTMXView.as_view(), name='chat-message-htmx'),
-]
\ No newline at end of file
+    path('panel/htmx/', htmx.ChatPanelHTMXView.as_view(), name='chat-panel-htmx'),
+    path('message/htmx/', htmx.ChatMessageHTMXView.as_view(), name='chat-message-htmx'),
+]
@@ -1,19 +1,23 @@
 from django.views import View
-from django.shortcuts import render, redirect
-from django.http import HttpResponse
-from django.template.loader import render_to_string
-from .models import Message
+from trading_platform.fragment_cache import render_cached
+from .store import CHAT_SCOPE, get_chat_store, history_key
+
+DEFAULT_ROOM = 'global'
+
+def _chat_panel(request):
+    messages = get_chat_store().recent(DEFAULT_ROOM)
+    return render_cached(
+        request, 'chat', [CHAT_SCOPE], 'chat/partials/chat_panel.html',
+        lambda: {'messages': messages}, variant=history_key(messages),
+    )
 
 class ChatPanelHTMXView(View):
     def get(self, request):
-        messages = Message.objects.order_by('-timestamp')[:30][::-1]
-        return render(request, 'chat/partials/chat_panel.html', {'messages': messages})
+        return _chat_panel(request)
 
 class ChatMessageHTMXView(View):
     def post(self, request):
         text = request.POST.get('text')
         if text:
-            Message.objects.create(user=request.user, text=text)
-        messages = Message.objects.order_by('-timestamp')[:30][::-1]
-        html = render_to_string('chat/partials/chat_panel.html', {'messages': messages}, request=request)
-        return HttpResponse(html)
\ No newline at end of file
+            get_chat_store().post(DEFAULT_ROOM, request.user, text)
+        return _chat_panel(request)
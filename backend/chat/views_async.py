@@ -0,0 +1,28 @@
+from asgiref.sync import sync_to_async
+from django.views import View
+from trading_platform.async_views import request_user
+from trading_platform.fragment_cache import arender_cached
+from .store import CHAT_SCOPE, get_chat_store, history_key
+from .views import DEFAULT_ROOM
+
+async def _chat_panel(request):
+    messages = await get_chat_store().arecent(DEFAULT_ROOM)
+
+    async def context():
+        return {'messages': messages}
+    return await arender_cached(
+        request, 'chat', [CHAT_SCOPE], 'chat/partials/chat_panel.html', context, variant=history_key(messages),
+    )
+
+class ChatPanelHTMXView(View):
+    async def get(self, request):
+        return await _chat_panel(request)
+
+class ChatMessageHTMXView(View):
+    async def post(self, request):
+        user = await request_user(request)
+        text = request.POST.get('text')
+        if text:
+            # Só memória e a versão da cache; a gravação é diferida pelo buffer.
+            await sync_to_async(get_chat_store().post)(DEFAULT_ROOM, user, text)
+        return await _chat_panel(request)
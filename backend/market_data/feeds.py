@@ -0,0 +1,126 @@
+"""
+Adaptadores de feeds de cotações.
+
+Um feed é qualquer objeto com um método `ticks()` que produz `Tick`s. Os
+adaptadores registados em `FEEDS` podem ser escolhidos pelo nome; qualquer
+outro pode ser indicado pelo caminho Python completo da classe.
+"""
+import csv
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+@dataclass
+class Tick:
+    symbol: str
+    price: Decimal
+    volume: Decimal
+    timestamp: datetime
+
+
+class FeedAdapter:
+    def ticks(self):
+        raise NotImplementedError
+
+
+class ReplayFeed(FeedAdapter):
+    """Reproduz ticks gravados em CSV (symbol,price,volume[,timestamp]) ou NDJSON.
+
+    Com `speed`, respeita o intervalo entre timestamps dividido por esse fator;
+    sem ele, reproduz o ficheiro o mais depressa possível.
+    """
+
+    def __init__(self, path, speed=None, loop=False):
+        self.path = Path(path)
+        self.speed = speed
+        self.loop = loop
+
+    def _rows(self):
+        with self.path.open(newline='') as fh:
+            if self.path.suffix in ('.ndjson', '.jsonl'):
+                for line in fh:
+                    if line.strip():
+                        yield json.loads(line)
+            else:
+                yield from csv.DictReader(fh)
+
+    def _parse(self, row):
+        ts = row.get('timestamp')
+        if not ts:
+            timestamp = timezone.now()
+        else:
+            try:
+                timestamp = datetime.fromtimestamp(float(ts), tz=dt_timezone.utc)
+            except ValueError:
+                timestamp = datetime.fromisoformat(ts)
+        return Tick(row['symbol'], Decimal(str(row['price'])), Decimal(str(row.get('volume') or 0)), timestamp)
+
+    def ticks(self):
+        while True:
+            previous = None
+            for row in self._rows():
+                tick = self._parse(row)
+                if self.speed and previous is not None:
+                    gap = (tick.timestamp - previous).total_seconds() / self.speed
+                    if gap > 0:
+                        time.sleep(gap)
+                previous = tick.timestamp
+                yield tick
+            if not self.loop:
+                return
+
+
+class AlphaVantageFeed(FeedAdapter):
+    """Consulta o endpoint GLOBAL_QUOTE da Alpha Vantage para cada símbolo."""
+
+    url = 'https://www.alphavantage.co/query'
+
+    def __init__(self, symbols, api_key=None, interval=60.0, timeout=(3.05, 10)):
+        self.symbols = list(symbols)
+        self.api_key = api_key or settings.ALPHA_VANTAGE_API_KEY
+        self.interval = interval
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _quote(self, symbol):
+        response = self.session.get(
+            self.url,
+            params={'function': 'GLOBAL_QUOTE', 'symbol': symbol, 'apikey': self.api_key},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        quote = response.json().get('Global Quote') or {}
+        if '05. price' not in quote:
+            return None
+        return Tick(symbol, Decimal(quote['05. price']), Decimal(quote.get('06. volume') or 0), timezone.now())
+
+    def ticks(self):
+        while True:
+            started = time.monotonic()
+            for symbol in self.symbols:
+                try:
+                    tick = self._quote(symbol)
+                except (requests.RequestException, ValueError):
+                    continue
+                if tick is not None:
+                    yield tick
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+
+FEEDS = {
+    'replay': ReplayFeed,
+    'alphavantage': AlphaVantageFeed,
+}
+
+
+def get_feed_class(name):
+    return FEEDS[name] if name in FEEDS else import_string(name)
@@ -0,0 +1,117 @@
+"""
+Pipeline de ingestão de cotações para `MarketTicker`.
+
+Os ticks são agrupados por símbolo (só o último interessa) e gravados num
+único upsert em lote (`INSERT ... ON CONFLICT (symbol) DO UPDATE`) a cada
+intervalo de flush, em vez de um `save()` por tick. O intervalo é medido por
+um temporizador, não pela chegada de ticks.
+"""
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from trading.models import MarketTicker
+
+
+class TickCoalescer:
+    """Guarda o último tick de cada símbolo entre flushes."""
+
+    def __init__(self):
+        self._latest = {}
+        self._received = 0
+        self._lock = threading.Lock()
+
+    def add(self, tick):
+        with self._lock:
+            self._latest[tick.symbol] = tick
+            self._received += 1
+
+    def drain(self):
+        with self._lock:
+            latest, self._latest = self._latest, {}
+            received, self._received = self._received, 0
+        return latest, received
+
+
+class IngestionPipeline:
+    """Recebe ticks de um feed e escreve-os em lote a cada `flush_interval` segundos.
+
+    `listeners` são chamados depois de cada flush com o dicionário
+    símbolo -> último `Tick` gravado (por exemplo, para reavaliar portfólios
+    ou publicar no stream de mercado). `idle_listeners` são chamados, sem
+    argumentos, nos flushes sem ticks novos (por exemplo, para o heartbeat da
+    tabela de preços: a ingestão continua viva com o feed parado).
+    """
+
+    def __init__(self, flush_interval=None, batch_size=1000, listeners=(), idle_listeners=()):
+        if flush_interval is None:
+            flush_interval = settings.MARKET_DATA_FLUSH_INTERVAL
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.listeners = list(listeners)
+        self.idle_listeners = list(idle_listeners)
+        self.coalescer = TickCoalescer()
+        self.stats = {'ticks': 0, 'rows': 0, 'flushes': 0}
+
+    def add(self, tick):
+        self.coalescer.add(tick)
+
+    def flush(self):
+        latest, received = self.coalescer.drain()
+        self.stats['ticks'] += received
+        if not latest:
+            for listener in self.idle_listeners:
+                listener()
+            return set()
+        now = timezone.now()
+        rows = [
+            MarketTicker(symbol=tick.symbol, price=tick.price, volume_24h=tick.volume, last_updated=now)
+            for tick in latest.values()
+        ]
+        with transaction.atomic():
+            MarketTicker.objects.bulk_create(
+                rows, batch_size=self.batch_size, update_conflicts=True,
+                unique_fields=['symbol'], update_fields=['price', 'volume_24h', 'last_updated'],
+            )
+        self.stats['rows'] += len(rows)
+        self.stats['flushes'] += 1
+        for listener in self.listeners:
+            listener(latest)
+        return set(latest)
+
+    def run(self, feed, max_ticks=None):
+        """Consome o feed até ao fim (ou `max_ticks`), com flush a cada `flush_interval`.
+
+        O feed é lido numa thread própria e os flushes (e os listeners) correm
+        nesta: um feed parado à espera do próximo tick não atrasa a gravação
+        dos que já chegaram.
+        """
+        done = threading.Event()
+        state = {'count': 0, 'error': None}
+
+        def consume():
+            try:
+                for tick in feed.ticks():
+                    self.add(tick)
+                    state['count'] += 1
+                    if done.is_set() or (max_ticks is not None and state['count'] >= max_ticks):
+                        break
+            except Exception as e:
+                state['error'] = e
+            finally:
+                done.set()
+
+        reader = threading.Thread(target=consume, name='market-data-feed', daemon=True)
+        reader.start()
+        try:
+            while not done.wait(self.flush_interval):
+                self.flush()
+        finally:
+            # Interrompido (Ctrl+C), a thread do feed pára no próximo tick.
+            done.set()
+            self.flush()
+        if state['error'] is not None:
+            raise state['error']
+        return state['count']
@@ -0,0 +1,55 @@
+import json
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from market_data.feeds import FeedAdapter, Tick
+from market_data.ingest import IngestionPipeline
+
+
+class SyntheticFeed(FeedAdapter):
+    def __init__(self, ticks, symbols):
+        now = timezone.now()
+        rng = random.Random(42)
+        names = [f'SYM{i:05d}' for i in range(symbols)]
+        # Gerados antecipadamente para que o benchmark meça só a ingestão.
+        self._ticks = [
+            Tick(rng.choice(names), Decimal(rng.randint(1, 10_000_000)) / 100, Decimal(rng.randint(0, 10**6)), now)
+            for _ in range(ticks)
+        ]
+
+    def ticks(self):
+        return iter(self._ticks)
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede o débito (ticks/s) sustentado pela ingestão na base de dados configurada '
+        '(SQLite com USE_SQLITE_FOR_TESTS=1, Postgres caso contrário).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ticks', type=int, default=200_000)
+        parser.add_argument('--symbols', type=int, default=500)
+        parser.add_argument('--flush-interval', type=float, default=0.05)
+
+    def handle(self, *args, **options):
+        feed = SyntheticFeed(options['ticks'], options['symbols'])
+        pipeline = IngestionPipeline(flush_interval=options['flush_interval'])
+        started = time.perf_counter()
+        count = pipeline.run(feed)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(json.dumps({
+            'benchmark': 'market_data.ingest',
+            'vendor': connection.vendor,
+            'ticks': count,
+            'symbols': options['symbols'],
+            'flushes': pipeline.stats['flushes'],
+            'rows_written': pipeline.stats['rows'],
+            'seconds': round(elapsed, 4),
+            'ticks_per_sec': round(count / elapsed, 1),
+        }))
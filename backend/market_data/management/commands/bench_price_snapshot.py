@@ -0,0 +1,59 @@
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+
+from market_data.snapshot import PriceSnapshotWriter, get_price_table
+from trading.models import MarketTicker
+from trading.valuation import latest_prices
+
+
+def _per_call(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a leitura dos últimos preços: tabela partilhada (market_data.snapshot) face a MarketTicker, '
+        'por símbolo e para `latest_prices` de N símbolos. Semeia a tabela a partir de MarketTicker num '
+        'ficheiro temporário.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbols', type=int, default=10, help='Símbolos por chamada a latest_prices.')
+        parser.add_argument('--iterations', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        tickers = list(MarketTicker.objects.order_by('pk').values_list('symbol', 'price', 'volume_24h', 'last_updated'))
+        symbols = [row[0] for row in tickers[:options['symbols']]]
+        if not symbols:
+            self.stderr.write('Sem MarketTicker; corra seed_benchmark_data ou a ingestão primeiro.')
+            return
+        iterations = options['iterations']
+        with tempfile.TemporaryDirectory() as directory:
+            path = str(Path(directory) / 'prices')
+            with override_settings(MARKET_SNAPSHOT_PATH=path):
+                writer = PriceSnapshotWriter(capacity=max(len(tickers), 1))
+                writer.load(tickers)
+                table = get_price_table()
+                results = {
+                    'snapshot.get_ns': _per_call(lambda: table.get(symbols[0]), iterations * 10) * 1e9,
+                    'snapshot.latest_prices_us': _per_call(lambda: latest_prices(symbols), iterations) * 1e6,
+                }
+                writer.table.close()
+            with override_settings(MARKET_SNAPSHOT_PATH=''):
+                results['database.latest_prices_us'] = _per_call(lambda: latest_prices(symbols), iterations) * 1e6
+        self.stdout.write(json.dumps({
+            'benchmark': 'market_data.price_snapshot',
+            'vendor': connection.vendor,
+            'symbols': len(symbols),
+            **{name: round(value, 1) for name, value in results.items()},
+            'speedup': round(results['database.latest_prices_us'] / results['snapshot.latest_prices_us'], 1),
+        }))
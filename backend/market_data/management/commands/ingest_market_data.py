@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from market_data.feeds import get_feed_class
+from market_data.ingest import IngestionPipeline
+from market_data.snapshot import PriceSnapshotWriter
+from trading.models import MarketTicker
+from trading.streaming import publish_ticks
+from trading.valuation import revalue_portfolios
+
+
+class Command(BaseCommand):
+    help = 'Ingere cotações de um feed para MarketTicker com escritas em lote.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('feed', help="Nome do feed ('replay', 'alphavantage') ou caminho da classe.")
+        parser.add_argument('--path', help='Ficheiro CSV/NDJSON para o feed de replay.')
+        parser.add_argument('--speed', type=float, help='Fator de velocidade do replay (omitir = sem pausas).')
+        parser.add_argument('--symbol', action='append', dest='symbols', default=[], help='Símbolo a consultar.')
+        parser.add_argument('--flush-interval', type=float)
+        parser.add_argument('--no-revalue', action='store_true', help='Não reavaliar portfólios após cada flush.')
+        parser.add_argument('--no-publish', action='store_true', help='Não publicar os ticks no stream WebSocket.')
+        parser.add_argument(
+            '--no-snapshot', action='store_true', help='Não escrever a tabela de preços partilhada (MARKET_SNAPSHOT_PATH).',
+        )
+
+    def handle(self, *args, **options):
+        feed_class = get_feed_class(options['feed'])
+        if options['feed'] == 'replay':
+            feed = feed_class(options['path'], speed=options['speed'])
+        elif options['feed'] == 'alphavantage':
+            feed = feed_class(options['symbols'])
+        else:
+            feed = feed_class()
+        listeners, idle_listeners = [], []
+        if settings.MARKET_SNAPSHOT_PATH and not options['no_snapshot']:
+            # Primeiro: a reavaliação seguinte já lê os preços novos da tabela.
+            writer = PriceSnapshotWriter()
+            writer.load(MarketTicker.objects.order_by('pk').values_list('symbol', 'price', 'volume_24h', 'last_updated'))
+            listeners.append(writer)
+            idle_listeners.append(writer.heartbeat)
+        if not options['no_revalue']:
+            listeners.append(revalue_portfolios)
+        if not options['no_publish']:
+            listeners.append(lambda latest: publish_ticks(latest.values()))
+        pipeline = IngestionPipeline(
+            flush_interval=options['flush_interval'], listeners=listeners, idle_listeners=idle_listeners,
+        )
+        count = pipeline.run(feed)
+        self.stdout.write(
+            f"{count} ticks recebidos, {pipeline.stats['rows']} linhas gravadas em {pipeline.stats['flushes']} flushes."
+        )
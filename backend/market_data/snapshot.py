@@ -0,0 +1,286 @@
+"""
+Tabela de últimos preços em memória partilhada (mmap) entre processos.
+
+A ingestão escreve; cada worker Django/ASGI mapeia o mesmo ficheiro e lê sem
+locks nem consultas. O ficheiro tem um formato fixo:
+
+    cabeçalho (64 bytes)   magic, capacidade, nº de símbolos, heartbeat
+    símbolos  (32 bytes)   nome UTF-8 de cada posição, só acrescentados
+    registos  (32 bytes)   sequência, preço, volume, atualização (epoch)
+
+Cada registo é protegido por um seqlock: o escritor torna a sequência ímpar,
+escreve os campos e volta a torná-la par; o leitor repete a leitura se a
+sequência for ímpar ou mudar entretanto. Um símbolo novo fica visível quando
+o escritor incrementa o contador do cabeçalho, depois de escrever o nome.
+
+Há um único escritor (`flock` exclusivo em `<ficheiro>.lock`). Os preços são
+float64, como na avaliação dos portfólios. O heartbeat avança a cada flush da
+ingestão, com ou sem ticks novos. Sem ficheiro, ou com o heartbeat mais velho
+que `MARKET_SNAPSHOT_MAX_AGE` (a ingestão parou), os leitores devolvem None e
+quem chama lê `MarketTicker`.
+"""
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.signals import setting_changed
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'PXT1'
+HEADER = struct.Struct('<4sIId')
+HEADER_SIZE = 64
+COUNT_OFFSET = 8
+HEARTBEAT_OFFSET = 16
+SYMBOL_SIZE = 32
+SEQ = struct.Struct('<Q')
+FIELDS = struct.Struct('<ddd')
+RECORD = struct.Struct('<Qddd')
+COUNT = struct.Struct('<I')
+HEARTBEAT = struct.Struct('<d')
+Quote = namedtuple('Quote', 'symbol price volume_24h last_updated')
+# Leituras a tentar enquanto o escritor está a meio de um registo.
+READ_ATTEMPTS = 100
+
+
+def _size(capacity):
+    return HEADER_SIZE + capacity * (SYMBOL_SIZE + RECORD.size)
+
+
+class PriceTable:
+    def __init__(self, path, mm, capacity, lock_fd=None):
+        self.path = path
+        self._mm = mm
+        self.capacity = capacity
+        self._lock_fd = lock_fd
+        self._records = HEADER_SIZE + capacity * SYMBOL_SIZE
+        self._index = {}
+        self._symbols = []
+        self._index_lock = threading.Lock()
+
+    @classmethod
+    def _map(cls, path, access):
+        try:
+            fd = os.open(path, os.O_RDWR if access == mmap.ACCESS_WRITE else os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            mm = mmap.mmap(fd, 0, access=access)
+        except ValueError:
+            return None
+        finally:
+            # O mapeamento mantém o ficheiro aberto.
+            os.close(fd)
+        magic, capacity, _, _ = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or len(mm) != _size(capacity):
+            mm.close()
+            return None
+        return mm
+
+    @classmethod
+    def open(cls, path):
+        """Leitor do ficheiro em `path`, ou None se não existir ou não for uma tabela válida."""
+        mm = cls._map(path, mmap.ACCESS_READ)
+        return None if mm is None else cls(path, mm, HEADER.unpack_from(mm, 0)[1])
+
+    @classmethod
+    def create(cls, path, capacity):
+        """Escritor: reutiliza uma tabela compatível (os leitores mantêm o mapeamento) ou cria uma nova."""
+        lock_fd = os.open(f'{path}.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(lock_fd)
+            raise RuntimeError(f'Outro processo já escreve a tabela de preços {path}.') from None
+        mm = cls._map(path, mmap.ACCESS_WRITE)
+        if mm is not None and HEADER.unpack_from(mm, 0)[1] == capacity:
+            table = cls(path, mm, capacity, lock_fd)
+            table._refresh_index()
+            return table
+        if mm is not None:
+            mm.close()
+        # Um ficheiro novo no lugar do antigo: truncar um ficheiro mapeado faria cair os leitores (SIGBUS).
+        tmp = f'{path}.{os.getpid()}.tmp'
+        fd = os.open(tmp, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, _size(capacity))
+            mm = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)
+        HEADER.pack_into(mm, 0, MAGIC, capacity, 0, 0.0)
+        os.replace(tmp, path)
+        return cls(path, mm, capacity, lock_fd)
+
+    def close(self):
+        self._mm.close()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    # Leitura
+
+    def heartbeat(self):
+        return HEARTBEAT.unpack_from(self._mm, HEARTBEAT_OFFSET)[0]
+
+    def _refresh_index(self):
+        count = min(COUNT.unpack_from(self._mm, COUNT_OFFSET)[0], self.capacity)
+        if count == len(self._symbols):
+            return
+        # Só nos símbolos novos; o lock evita que duas threads os acrescentem em duplicado.
+        with self._index_lock:
+            for slot in range(len(self._symbols), count):
+                offset = HEADER_SIZE + slot * SYMBOL_SIZE
+                symbol = self._mm[offset:offset + SYMBOL_SIZE].rstrip(b'\0').decode()
+                self._symbols.append(symbol)
+                self._index[symbol] = slot
+
+    def _slot(self, symbol):
+        slot = self._index.get(symbol)
+        if slot is None:
+            self._refresh_index()
+            slot = self._index.get(symbol)
+        return slot
+
+    def _read(self, slot):
+        mm, offset = self._mm, self._records + slot * RECORD.size
+        for _ in range(READ_ATTEMPTS):
+            seq, price, volume, updated = RECORD.unpack_from(mm, offset)
+            if seq & 1 == 0 and SEQ.unpack_from(mm, offset)[0] == seq:
+                # Sequência 0: posição reservada, ainda sem preço.
+                return (price, volume, updated) if seq else None
+        return None
+
+    def get(self, symbol):
+        """(preço, volume, atualização) de `symbol`, ou None se não estiver na tabela."""
+        slot = self._slot(symbol)
+        return None if slot is None else self._read(slot)
+
+    def prices(self, symbols):
+        """Símbolo -> preço para os `symbols` presentes na tabela."""
+        prices = {}
+        for symbol in symbols:
+            record = self.get(symbol)
+            if record is not None:
+                prices[symbol] = record[0]
+        return prices
+
+    def rows(self, limit=None):
+        """(símbolo, preço, volume, atualização) pela ordem em que os símbolos entraram."""
+        self._refresh_index()
+        rows = []
+        for slot, symbol in enumerate(self._symbols[:limit]):
+            record = self._read(slot)
+            if record is not None:
+                rows.append((symbol, *record))
+        return rows
+
+    def quotes(self, limit=None):
+        """Como `rows`, com os nomes e tipos de `MarketTicker` (para os templates)."""
+        return [
+            Quote(symbol, Decimal(f'{price:.8f}'), Decimal(f'{volume:.8f}'), datetime.fromtimestamp(updated, dt_timezone.utc))
+            for symbol, price, volume, updated in self.rows(limit)
+        ]
+
+    # Escrita
+
+    def _allocate(self, symbol):
+        name = symbol.encode()
+        count = len(self._symbols)
+        if len(name) > SYMBOL_SIZE or count >= self.capacity:
+            return None
+        offset = HEADER_SIZE + count * SYMBOL_SIZE
+        self._mm[offset:offset + SYMBOL_SIZE] = name.ljust(SYMBOL_SIZE, b'\0')
+        # Só depois do nome: o contador publica o símbolo aos leitores.
+        COUNT.pack_into(self._mm, COUNT_OFFSET, count + 1)
+        self._symbols.append(symbol)
+        self._index[symbol] = count
+        return count
+
+    def write(self, rows, now=None):
+        """Grava (símbolo, preço, volume, atualização) e o heartbeat. Devolve os símbolos que não couberam."""
+        mm, skipped = self._mm, []
+        for symbol, price, volume, updated in rows:
+            slot = self._index.get(symbol)
+            if slot is None:
+                slot = self._allocate(symbol)
+                if slot is None:
+                    skipped.append(symbol)
+                    continue
+            offset = self._records + slot * RECORD.size
+            seq = SEQ.unpack_from(mm, offset)[0]
+            SEQ.pack_into(mm, offset, seq + 1)
+            FIELDS.pack_into(mm, offset + SEQ.size, float(price), float(volume), updated)
+            SEQ.pack_into(mm, offset, seq + 2)
+        HEARTBEAT.pack_into(mm, HEARTBEAT_OFFSET, time.time() if now is None else now)
+        return skipped
+
+
+class PriceSnapshotWriter:
+    """Listener da `IngestionPipeline`: copia cada flush para a tabela, depois de gravado em `MarketTicker`."""
+
+    def __init__(self, path=None, capacity=None):
+        self.table = PriceTable.create(
+            path or settings.MARKET_SNAPSHOT_PATH, capacity or settings.MARKET_SNAPSHOT_CAPACITY,
+        )
+        self._warned = False
+
+    def load(self, tickers):
+        """Semeia a tabela com (símbolo, preço, volume, última atualização) lidos da base de dados."""
+        self._write((symbol, price, volume, updated.timestamp()) for symbol, price, volume, updated in tickers)
+
+    def __call__(self, latest):
+        now = time.time()
+        self._write(((symbol, tick.price, tick.volume, now) for symbol, tick in latest.items()), now)
+
+    def heartbeat(self):
+        """Só o heartbeat: chamado pela ingestão nos flushes sem ticks novos."""
+        self.table.write([])
+
+    def _write(self, rows, now=None):
+        skipped = self.table.write(rows, now)
+        if skipped and not self._warned:
+            self._warned = True
+            logger.warning(
+                'Tabela de preços cheia ou símbolos longos demais; %d símbolos ficam só em MarketTicker.', len(skipped),
+            )
+
+
+_reader = None
+_opened_at = 0.0
+# Intervalo (segundos) entre tentativas de reabrir uma tabela inexistente ou desatualizada.
+REOPEN_INTERVAL = 1.0
+
+
+def get_price_table():
+    """Tabela partilhada deste processo, ou None se desativada, inexistente ou desatualizada."""
+    global _reader, _opened_at
+    path = settings.MARKET_SNAPSHOT_PATH
+    if not path:
+        return None
+    now = time.time()
+    max_age = settings.MARKET_SNAPSHOT_MAX_AGE
+    table = _reader
+    if (table is None or now - table.heartbeat() > max_age) and now - _opened_at > REOPEN_INTERVAL:
+        # Ainda sem tabela, ou o escritor parou: talvez outro a tenha recriado.
+        _opened_at = now
+        table = _reader = PriceTable.open(path)
+    if table is None or now - table.heartbeat() > max_age:
+        return None
+    return table
+
+
+def _reset_reader(setting, **kwargs):
+    global _reader, _opened_at
+    if setting.startswith('MARKET_SNAPSHOT_'):
+        _reader, _opened_at = None, 0.0
+
+
+setting_changed.connect(_reset_reader)
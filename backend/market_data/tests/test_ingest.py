@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+from decimal import Decimal
+from market_data.feeds import ReplayFeed, Tick
+from market_data.ingest import IngestionPipeline
+from trading.models import MarketTicker
+
+
+@pytest.fixture
+def replay_file(tmp_path):
+    path = tmp_path / 'ticks.csv'
+    path.write_text(
+        'symbol,price,volume,timestamp\n'
+        'BTC,100.5,10,2025-06-01T10:00:00+00:00\n'
+        'ETH,20,5,2025-06-01T10:00:01+00:00\n'
+        'BTC,101,11,2025-06-01T10:00:02+00:00\n'
+        'BTC,102.25,12,2025-06-01T10:00:03+00:00\n'
+    )
+    return path
+
+
+@pytest.mark.django_db
+def test_replay_ticks_are_coalesced_into_one_upsert(replay_file, django_assert_max_num_queries):
+    """
+    Vários ticks do mesmo símbolo resultam numa única linha com o último preço.
+    """
+    MarketTicker.objects.create(symbol='ETH', price=1, volume_24h=0)
+    flushed = []
+    pipeline = IngestionPipeline(flush_interval=3600, listeners=[flushed.append])
+    with django_assert_max_num_queries(3):
+        assert pipeline.run(ReplayFeed(replay_file)) == 4
+    assert pipeline.stats == {'ticks': 4, 'rows': 2, 'flushes': 1}
+    assert [{symbol: tick.price for symbol, tick in latest.items()} for latest in flushed] == [
+        {'BTC': Decimal('102.25'), 'ETH': Decimal('20')},
+    ]
+    assert dict(MarketTicker.objects.values_list('symbol', 'price')) == {
+        'BTC': Decimal('102.25'), 'ETH': Decimal('20'),
+    }
+
+
+def test_replay_feed_reads_ndjson(tmp_path):
+    path = tmp_path / 'ticks.ndjson'
+    path.write_text('{"symbol": "BTC", "price": 1.5, "timestamp": 1717236000}\n\n{"symbol": "ETH", "price": "2"}\n')
+    ticks = list(ReplayFeed(path).ticks())
+    assert [(t.symbol, t.price, t.volume) for t in ticks] == [('BTC', Decimal('1.5'), 0), ('ETH', Decimal('2'), 0)]
+    assert ticks[0].timestamp.year == 2024
+
+
+class _StallingFeed:
+    """Dois ticks e depois silêncio até `release` ser sinalizado."""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def ticks(self):
+        yield Tick('BTC', Decimal('100'), Decimal('1'), None)
+        yield Tick('ETH', Decimal('20'), Decimal('1'), None)
+        self.release.wait(5)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_flush_runs_on_a_timer_while_the_feed_is_quiet():
+    """
+    Os ticks já recebidos são gravados ao fim de `flush_interval`, mesmo que o feed não produza mais nenhum.
+    """
+    feed = _StallingFeed()
+    flushed = []
+
+    def listener(latest):
+        flushed.append(set(latest))
+        feed.release.set()
+
+    pipeline = IngestionPipeline(flush_interval=0.05, listeners=[listener])
+    assert pipeline.run(feed) == 2
+    assert flushed == [{'BTC', 'ETH'}]
+    assert MarketTicker.objects.count() == 2
@@ -0,0 +1,130 @@
+import subprocess
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from django.test import Client
+
+from market_data.feeds import Tick
+from market_data.ingest import IngestionPipeline
+from market_data.snapshot import PriceSnapshotWriter, PriceTable, get_price_table
+from trading.models import MarketTicker
+from trading.valuation import latest_prices
+from trading_platform.instrumentation import assert_max_queries
+from users.models import User
+
+WRITER = '''
+import sys
+sys.path.insert(0, {root!r})
+from market_data.snapshot import PriceTable
+table = PriceTable.create({path!r}, 8)
+print('ready', flush=True)
+for i in range(1, 200_001):
+    table.write([('BTC', i, i, i)])
+'''
+
+
+@pytest.fixture
+def snapshot_path(tmp_path, settings):
+    settings.MARKET_SNAPSHOT_PATH = str(tmp_path / 'prices')
+    settings.MARKET_SNAPSHOT_MAX_AGE = 60
+    return settings.MARKET_SNAPSHOT_PATH
+
+
+def test_readers_in_other_processes_never_see_torn_records(snapshot_path):
+    """
+    Outro processo escreve sem parar; cada leitura devolve um registo inteiro (preço, volume e data iguais).
+    """
+    root = str(Path(__file__).resolve().parents[2])
+    writer = subprocess.Popen(
+        [sys.executable, '-c', WRITER.format(root=root, path=snapshot_path)], stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        assert writer.stdout.readline() == 'ready\n'
+        table = PriceTable.open(snapshot_path)
+        seen = set()
+        while writer.poll() is None or len(seen) < 2:
+            record = table.get('BTC')
+            if record is not None:
+                assert record[0] == record[1] == record[2]
+                seen.add(record[0])
+        assert table.get('BTC') == (200_000.0, 200_000.0, 200_000.0)
+        assert len(seen) > 1
+    finally:
+        writer.kill()
+        writer.wait()
+
+
+def test_symbols_are_published_to_open_readers(snapshot_path):
+    """
+    Um leitor já aberto vê os símbolos novos; sem espaço, os símbolos excedentes ficam de fora.
+    """
+    writer = PriceTable.create(snapshot_path, 2)
+    reader = PriceTable.open(snapshot_path)
+    assert writer.write([('BTC', 100, 1, 10.0)]) == []
+    assert reader.prices(['BTC', 'ETH']) == {'BTC': 100.0}
+    assert writer.write([('ETH', 20, 2, 11.0), ('SOL', 5, 3, 12.0), ('BTC', 101, 1, 13.0)]) == ['SOL']
+    assert reader.rows() == [('BTC', 101.0, 1.0, 13.0), ('ETH', 20.0, 2.0, 11.0)]
+    with pytest.raises(RuntimeError):
+        PriceTable.create(snapshot_path, 2)
+    writer.close()
+    # Um escritor novo reutiliza a tabela compatível e os índices já publicados.
+    writer = PriceTable.create(snapshot_path, 2)
+    assert writer.write([('ETH', 21, 2, 14.0)]) == []
+    assert reader.get('ETH') == (21.0, 2.0, 14.0)
+    writer.close()
+
+
+@pytest.mark.django_db
+def test_prices_come_from_the_snapshot_with_database_fallback(snapshot_path, settings, django_assert_num_queries):
+    """
+    Com a ingestão a escrever a tabela, os preços e o painel de cotações não consultam MarketTicker;
+    símbolos em falta ou uma tabela desatualizada voltam à base de dados.
+    """
+    MarketTicker.objects.create(symbol='ETH', price=20, volume_24h=5)
+    MarketTicker.objects.create(symbol='DOGE', price='0.1', volume_24h=1)
+    writer = PriceSnapshotWriter(capacity=16)
+    writer.load(MarketTicker.objects.filter(symbol='ETH').values_list('symbol', 'price', 'volume_24h', 'last_updated'))
+    pipeline = IngestionPipeline(flush_interval=3600, listeners=[writer])
+    pipeline.add(Tick('BTC', Decimal('102.25'), Decimal('12'), None))
+    pipeline.flush()
+
+    with django_assert_num_queries(0):
+        assert latest_prices(['BTC', 'ETH']) == {'BTC': 102.25, 'ETH': 20.0}
+    with django_assert_num_queries(1):
+        assert latest_prices(['BTC', 'DOGE']) == {'BTC': 102.25, 'DOGE': 0.1}
+
+    client = Client()
+    client.force_login(User.objects.create_user(username='viewer', password='x'))
+    with assert_max_queries(2) as executed:  # sessão e utilizador
+        html = client.get('/api/trading/market-ticker/htmx/').content.decode()
+    assert not any('trading_marketticker' in sql for sql in executed)
+    assert 'ETH: 20.00000000' in html and 'BTC: 102.25000000' in html
+
+    # A ingestão parou há dois minutos (reatribuir a definição esquece o leitor já aberto).
+    writer.table.write([], now=time.time() - 120)
+    settings.MARKET_SNAPSHOT_MAX_AGE = 60
+    assert get_price_table() is None
+    with django_assert_num_queries(1):
+        assert latest_prices(['BTC', 'ETH']) == {'BTC': 102.25, 'ETH': 20.0}
+
+
+@pytest.mark.django_db
+def test_flushes_without_ticks_keep_the_heartbeat_fresh(snapshot_path):
+    """
+    Com o feed calado, os flushes do temporizador continuam a escrever o heartbeat: os leitores não voltam
+    a MarketTicker só porque o mercado está parado.
+    """
+    writer = PriceSnapshotWriter(capacity=4)
+    pipeline = IngestionPipeline(flush_interval=3600, listeners=[writer], idle_listeners=[writer.heartbeat])
+    pipeline.add(Tick('BTC', Decimal('100'), Decimal('1'), None))
+    pipeline.flush()
+    writer.table.write([], now=time.time() - 120)
+    assert get_price_table() is None
+
+    with assert_max_queries(0):
+        assert pipeline.flush() == set()
+    assert time.time() - writer.table.heartbeat() < 5
+    assert get_price_table().get('BTC')[0] == 100.0
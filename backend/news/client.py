@@ -0,0 +1,162 @@
+"""
+Camada de acesso à NewsAPI partilhada pelas views de notícias.
+
+Mantém uma cache TTL com stale-while-revalidate, agrupa pedidos concorrentes
+para a mesma chave numa única chamada (single-flight) e reutiliza ligações
+através de uma `requests.Session` com pool e timeouts.
+"""
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from requests.adapters import HTTPAdapter
+
+
+class NewsAPIError(requests.RequestException):
+    pass
+
+
+class _Entry:
+    __slots__ = ('data', 'fresh_until', 'stale_until')
+
+    def __init__(self, data, fresh_until, stale_until):
+        self.data = data
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class NewsClient:
+    def __init__(self, base_url, api_key, ttl=300, stale_ttl=3600, timeout=(3.05, 10), pool_size=10, wait_timeout=None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.timeout = timeout
+        # Quanto espera quem aguarda a chamada de outro pedido; por omissão, os timeouts da chamada e uma margem.
+        if wait_timeout is None:
+            wait_timeout = (sum(timeout) if isinstance(timeout, tuple) else timeout) + 1
+        self.wait_timeout = wait_timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._cache = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'upstream_calls': 0, 'errors': 0}
+
+    def get_articles(self, query='stocks', language='en'):
+        key = (query, language)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and now < entry.fresh_until:
+                self._stats['hits'] += 1
+                return entry.data
+            if entry is not None and now < entry.stale_until:
+                # Serve o valor antigo e revalida em segundo plano.
+                self._stats['stale_hits'] += 1
+                if key not in self._inflight:
+                    call = self._inflight[key] = _Call()
+                    threading.Thread(target=self._refresh, args=(key, call), daemon=True).start()
+                return entry.data
+            self._stats['misses'] += 1
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+        if leader:
+            self._refresh(key, call)
+        elif not call.event.wait(self.wait_timeout):
+            with self._lock:
+                self._stats['errors'] += 1
+            raise NewsAPIError(f'Sem resposta da NewsAPI ao fim de {self.wait_timeout}s.')
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def _refresh(self, key, call):
+        query, language = key
+        done = False
+        try:
+            call.result = self._fetch(query, language)
+            done = True
+        except Exception as e:
+            # Qualquer falha (incluindo uma resposta que não é JSON) chega a quem espera como NewsAPIError.
+            call.error = e if isinstance(e, NewsAPIError) else NewsAPIError(str(e))
+        finally:
+            if not done and call.error is None:
+                call.error = NewsAPIError('Pedido à NewsAPI interrompido.')
+            # Sempre: senão a chave ficaria presa em `_inflight` e quem espera nunca acordaria.
+            with self._lock:
+                self._inflight.pop(key, None)
+                if done:
+                    now = time.monotonic()
+                    self._cache[key] = _Entry(call.result, now + self.ttl, now + self.ttl + self.stale_ttl)
+                else:
+                    self._stats['errors'] += 1
+            call.event.set()
+
+    def _fetch(self, query, language):
+        with self._lock:
+            self._stats['upstream_calls'] += 1
+        response = self.session.get(
+            self.base_url,
+            params={'q': query, 'language': language, 'apiKey': self.api_key},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json().get('articles', [])
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['hits'] + stats['stale_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_news_client():
+    """Devolve o cliente partilhado pelo processo, ou None sem chave configurada."""
+    global _client
+    if not getattr(settings, 'NEWS_API_KEY', None):
+        return None
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = NewsClient(
+                    base_url=settings.NEWS_API_URL,
+                    api_key=settings.NEWS_API_KEY,
+                    ttl=settings.NEWS_CACHE_TTL,
+                    stale_ttl=settings.NEWS_CACHE_STALE_TTL,
+                    timeout=settings.NEWS_API_TIMEOUT,
+                )
+    return _client
+
+
+def _reset_client(setting, **kwargs):
+    global _client
+    if setting.startswith('NEWS_'):
+        _client = None
+
+
+setting_changed.connect(_reset_client)
@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from news.client import NewsAPIError, NewsClient
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    calls = 0
+    delay = 0.0
+    status = 200
+
+    def do_GET(self):
+        type(self).calls += 1
+        time.sleep(self.delay)
+        body = json.dumps({'articles': [{'title': f'artigo {type(self).calls}'}]}).encode()
+        self.send_response(self.status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    handler = type('Handler', (_StubHandler,), {'calls': 0, 'delay': 0.0, 'status': 200})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, handler
+    server.shutdown()
+    server.server_close()
+
+
+def _client(server, **kwargs):
+    return NewsClient(f'http://127.0.0.1:{server.server_port}/v2/everything', 'test-key', **kwargs)
+
+
+def test_concurrent_misses_trigger_single_upstream_call(stub_server):
+    """
+    Vários pedidos simultâneos para a mesma chave resultam numa única chamada.
+    """
+    server, handler = stub_server
+    handler.delay = 0.2
+    client = _client(server)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.get_articles())) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert handler.calls == 1
+    assert len(results) == 10 and all(r == results[0] for r in results)
+    assert client.get_articles() == results[0]
+    stats = client.stats()
+    assert stats['upstream_calls'] == 1 and stats['hits'] == 1 and stats['misses'] == 10
+
+
+def test_stale_entry_is_served_while_revalidating(stub_server):
+    server, handler = stub_server
+    client = _client(server, ttl=0, stale_ttl=60)
+    first = client.get_articles()
+    assert client.get_articles() == first
+    for _ in range(50):
+        if handler.calls == 2:
+            break
+        time.sleep(0.01)
+    assert handler.calls == 2
+    assert client.stats()['stale_hits'] == 1
+
+
+def test_upstream_error_raises(stub_server):
+    server, handler = stub_server
+    handler.status = 500
+    client = _client(server)
+    with pytest.raises(NewsAPIError):
+        client.get_articles()
+    assert client.stats()['errors'] == 1
+
+
+def test_unexpected_errors_release_waiters_and_the_key(stub_server, monkeypatch):
+    """
+    Uma exceção que não é do requests chega a todos como NewsAPIError e a chave volta a poder ser pedida.
+    """
+    server, handler = stub_server
+    handler.delay = 0.2
+    client = _client(server)
+    original = client.session.get
+
+    def broken(*args, **kwargs):
+        original(*args, **kwargs)
+        raise ValueError('JSON inválido')
+
+    monkeypatch.setattr(client.session, 'get', broken)
+    errors = []
+
+    def fetch():
+        try:
+            client.get_articles()
+        except NewsAPIError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=fetch) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert len(errors) == 3 and not client._inflight
+    monkeypatch.setattr(client.session, 'get', original)
+    assert client.get_articles() == [{'title': 'artigo 2'}]
+
+
+def test_waiters_give_up_after_wait_timeout(stub_server):
+    server, handler = stub_server
+    handler.delay = 0.5
+    client = _client(server, wait_timeout=0.05)
+    leader = threading.Thread(target=client.get_articles)
+    leader.start()
+    while not client._inflight:
+        time.sleep(0.01)
+    with pytest.raises(NewsAPIError):
+        client.get_articles()
+    leader.join()
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class TradingConfig(AppConfig):
+    name = 'trading'
+
+    def ready(self):
+        from . import signals  # noqa: F401
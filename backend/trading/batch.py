@@ -0,0 +1,97 @@
+"""
+Envio de ordens em lote (cestos, escadas de cotações).
+
+`submit_batch` valida todas as ordens, verifica o risco do lote de uma vez
+(`RiskEngine.check_batch`: cada ordem aceite conta para as seguintes),
+grava-as com um único `bulk_create` e entrega o lote ao motor de matching
+numa só chamada. As ordens em `cancel` saem do livro antes das novas, para que
+uma escada recotada caiba no limite que a anterior ocupava. Cancelamentos e
+ordens novas ficam na mesma transação.
+
+Com `atomic`, uma ordem recusada ou um cancelamento falhado (ordem executada
+entretanto) recusa o lote inteiro e nada é alterado.
+"""
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .matching import RESTING_STATUSES, get_engine
+from .models import Order
+from .risk import get_risk_engine
+from .serializers import OrderSerializer
+
+CREATED = 'created'
+REJECTED = 'rejected'
+# Válida, mas não enviada porque outra ordem de um lote atómico foi recusada.
+SKIPPED = 'skipped'
+
+
+def _validate(user, items):
+    # Um serializer para todo o lote, como o filho de um ListSerializer: os campos constroem-se uma vez.
+    serializer = OrderSerializer()
+    results = []
+    for item in items:
+        try:
+            data = serializer.run_validation(item)
+        except ValidationError as exc:
+            results.append({'status': REJECTED, 'errors': exc.detail})
+        else:
+            results.append({'status': CREATED, 'order': Order(user=user, **data)})
+    return results
+
+
+def _cancel(engine, user, ids):
+    # Devolve (ids cancelados, id -> motivo dos que não o foram).
+    orders = Order.objects.in_bulk(ids) if ids else {}
+    cancelled, errors = [], {}
+    for pk in ids:
+        order = orders.get(pk)
+        if order is None or order.user_id != user.pk:
+            errors[pk] = 'Ordem não encontrada.'
+        elif order.status not in RESTING_STATUSES or not engine.cancel(order):
+            errors[pk] = f'A ordem já está {order.status}.'
+        else:
+            cancelled.append(pk)
+    return cancelled, errors
+
+
+def submit_batch(user, orders, cancel=(), atomic=True):
+    """
+    Devolve (resultados por item, ordens criadas, ids cancelados, id -> motivo
+    dos cancelamentos falhados). Cada resultado tem `status` e, conforme o
+    caso, `order` ou `errors`.
+    """
+    risk = get_risk_engine()
+    engine = get_engine()
+    results = _validate(user, orders)
+    created, rolled_back = [], False
+    with risk.order_lock(user.pk), transaction.atomic():
+        # Primeiro os cancelamentos (condicionais: uma ordem executada entretanto falha): o risco
+        # das ordens novas já conta só com o que foi de facto libertado.
+        cancelled, cancel_errors = _cancel(engine, user, list(dict.fromkeys(cancel)))
+        valid = [result for result in results if result['status'] == CREATED]
+        reasons = risk.check_batch(
+            user.pk, [(r['order'].asset, r['order'].order_type, r['order'].quantity, r['order'].price) for r in valid],
+        )
+        for result, reason in zip(valid, reasons):
+            if reason:
+                del result['order']
+                result.update(status=REJECTED, errors={'risk': [reason]})
+        if atomic and (cancel_errors or any(result['status'] == REJECTED for result in results)):
+            # Nada fica feito, nem os cancelamentos.
+            transaction.set_rollback(True)
+            rolled_back = bool(cancelled)
+            for result in results:
+                if result['status'] == CREATED:
+                    del result['order']
+                    result['status'] = SKIPPED
+            cancelled = []
+        else:
+            created = [result['order'] for result in results if result['status'] == CREATED]
+            if created:
+                Order.objects.bulk_create(created)
+                # Um só lote para o motor: agrupa por símbolo e grava as execuções na mesma transação.
+                engine.submit(created)
+    if rolled_back:
+        # Os cancelamentos desfeitos já tinham libertado exposição em memória: o risco é relido da base de dados.
+        risk.invalidate(user.pk)
+    return results, created, cancelled, cancel_errors
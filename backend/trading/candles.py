@@ -0,0 +1,103 @@
+"""
+Velas OHLCV incrementais construídas a partir das execuções.
+
+Cada lote de negociações é agregado em memória por (símbolo, intervalo,
+período) e fundido com as velas existentes em três consultas, sem voltar a
+ler o histórico de `Trade`. Assume-se que as negociações chegam por ordem
+cronológica: o fecho de uma vela é sempre o da última negociação recebida.
+"""
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import transaction
+
+from .models import Candle
+
+INTERVALS = {'1m': 60, '5m': 300, '1h': 3600, '1d': 86400}
+
+
+def execution_trades(trades):
+    """Uma negociação por execução: das duas pontas do motor (ligadas ao livro de execuções), a compradora.
+
+    As negociações avulsas, sem execução no livro, contam todas.
+    """
+    return trades.exclude(fill__side='sell')
+
+
+def bucket_start(timestamp, seconds):
+    epoch = int(timestamp.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, tz=dt_timezone.utc)
+
+
+def aggregate(trades):
+    """Agrega (símbolo, timestamp, preço, quantidade) em velas por chave."""
+    buckets = {}
+    for symbol, timestamp, price, quantity in sorted(trades, key=lambda trade: trade[1]):
+        price, quantity = Decimal(price), Decimal(quantity)
+        for interval, seconds in INTERVALS.items():
+            key = (symbol, interval, bucket_start(timestamp, seconds))
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [price, price, price, price, quantity, 1]
+            else:
+                if price > bucket[1]:
+                    bucket[1] = price
+                if price < bucket[2]:
+                    bucket[2] = price
+                bucket[3] = price
+                bucket[4] += quantity
+                bucket[5] += 1
+    return buckets
+
+
+def record_trades(trades):
+    """Funde um lote de negociações nas velas de todos os intervalos."""
+    buckets = aggregate(trades)
+    if not buckets:
+        return 0
+    with transaction.atomic():
+        # Garante que todas as velas existem (trade_count=0 marca as recém-criadas)
+        # e depois bloqueia-as para fundir sem perder escritas concorrentes.
+        Candle.objects.bulk_create(
+            [
+                Candle(symbol=symbol, interval=interval, bucket_start=start,
+                       open=o, high=h, low=l, close=c, volume=0, trade_count=0)
+                for (symbol, interval, start), (o, h, l, c, _, _) in buckets.items()
+            ],
+            ignore_conflicts=True,
+        )
+        symbols = {key[0] for key in buckets}
+        starts = {key[2] for key in buckets}
+        candles = Candle.objects.select_for_update().filter(symbol__in=symbols, bucket_start__in=starts)
+        updated = []
+        for candle in candles:
+            bucket = buckets.get((candle.symbol, candle.interval, candle.bucket_start))
+            if bucket is None:
+                continue
+            o, h, l, c, volume, count = bucket
+            if candle.trade_count == 0:
+                candle.open, candle.high, candle.low = o, h, l
+            else:
+                candle.high = max(candle.high, h)
+                candle.low = min(candle.low, l)
+            candle.close = c
+            candle.volume += volume
+            candle.trade_count += count
+            updated.append(candle)
+        Candle.objects.bulk_update(updated, ['open', 'high', 'low', 'close', 'volume', 'trade_count'])
+    return len(updated)
+
+
+def get_candles(symbol, interval, start=None, end=None, limit=None):
+    """Velas de um símbolo por ordem cronológica, lidas pelo índice único.
+
+    Com `limit`, devolve as `limit` velas mais recentes do período.
+    """
+    queryset = Candle.objects.filter(symbol=symbol, interval=interval)
+    if start is not None:
+        queryset = queryset.filter(bucket_start__gte=start)
+    if end is not None:
+        queryset = queryset.filter(bucket_start__lt=end)
+    if limit is not None:
+        return list(queryset.order_by('-bucket_start')[:limit])[::-1]
+    return list(queryset.order_by('bucket_start'))
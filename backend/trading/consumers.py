@@ -0,0 +1,122 @@
+import asyncio
+import json
+import math
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+
+from .models import MarketTicker
+from .streaming import group_name, tick_payload
+
+SYMBOL_MAX_LENGTH = MarketTicker._meta.get_field('symbol').max_length
+
+
+class MarketDataConsumer(AsyncWebsocketConsumer):
+    """
+    Stream de cotações com conflação por símbolo.
+
+    O cliente envia {"action": "subscribe", "symbols": [...], "max_rate": n}.
+    Entre dois envios só é guardado o último tick de cada símbolo, e todos os
+    símbolos pendentes seguem num único frame, no máximo `max_rate` vezes por
+    segundo: um cliente lento recebe o preço mais recente, não uma fila.
+    Mensagens inválidas, ou acima de `MARKET_STREAM_MAX_SYMBOLS` símbolos,
+    recebem {"type": "error", "detail": ...} e não alteram a subscrição.
+    """
+
+    async def connect(self):
+        self.symbols = set()
+        self.pending = {}
+        self.interval = 1.0 / settings.MARKET_STREAM_MAX_RATE
+        self.wakeup = asyncio.Event()
+        await self.accept()
+        self.flusher = asyncio.ensure_future(self.flush_loop())
+
+    async def disconnect(self, close_code):
+        self.flusher.cancel()
+        for symbol in self.symbols:
+            await self.channel_layer.group_discard(group_name(symbol), self.channel_name)
+
+    def _parse(self, text_data):
+        # Devolve (ação, símbolos, max_rate) ou levanta ValueError com a mensagem para o cliente.
+        try:
+            data = json.loads(text_data)
+        except ValueError:
+            raise ValueError('Mensagem JSON inválida.') from None
+        if not isinstance(data, dict):
+            raise ValueError('A mensagem tem de ser um objeto JSON.')
+        action = data.get('action')
+        if action not in (None, 'subscribe', 'unsubscribe'):
+            raise ValueError('Ação desconhecida.')
+        symbols = data.get('symbols', [])
+        # Uma string não é uma lista de símbolos: 'BTC' não pode virar {'B', 'T', 'C'}.
+        if not isinstance(symbols, list) or not all(
+            isinstance(symbol, str) and 0 < len(symbol) <= SYMBOL_MAX_LENGTH for symbol in symbols
+        ):
+            raise ValueError('`symbols` tem de ser uma lista de símbolos.')
+        max_rate = data.get('max_rate')
+        # json.loads aceita NaN e Infinity; bool é um int para o isinstance.
+        if max_rate is not None and (
+            isinstance(max_rate, bool) or not isinstance(max_rate, (int, float))
+            or not math.isfinite(max_rate) or max_rate <= 0
+        ):
+            raise ValueError('`max_rate` tem de ser um número positivo.')
+        return action, set(symbols), max_rate
+
+    async def receive(self, text_data):
+        try:
+            action, symbols, max_rate = self._parse(text_data)
+        except ValueError as e:
+            await self.send(text_data=json.dumps({'type': 'error', 'detail': str(e)}))
+            return
+        if max_rate is not None:
+            rate = min(max_rate, settings.MARKET_STREAM_MAX_RATE)
+            self.interval = 1.0 / max(rate, 0.1)
+        if action == 'subscribe':
+            new = symbols - self.symbols
+            if len(self.symbols) + len(new) > settings.MARKET_STREAM_MAX_SYMBOLS:
+                await self.send(text_data=json.dumps({
+                    'type': 'error', 'detail': f'No máximo {settings.MARKET_STREAM_MAX_SYMBOLS} símbolos por ligação.',
+                }))
+                return
+            self.symbols |= new
+            for symbol in new:
+                await self.channel_layer.group_add(group_name(symbol), self.channel_name)
+            for tick in await self.snapshot(new):
+                self.pending.setdefault(tick['symbol'], tick)
+            self.wakeup.set()
+        elif action == 'unsubscribe':
+            for symbol in symbols & self.symbols:
+                await self.channel_layer.group_discard(group_name(symbol), self.channel_name)
+                self.pending.pop(symbol, None)
+            self.symbols -= symbols
+
+    @database_sync_to_async
+    def snapshot(self, symbols):
+        if not symbols:
+            return []
+        rows = MarketTicker.objects.filter(symbol__in=symbols).values_list('symbol', 'price', 'volume_24h', 'last_updated')
+        return [tick_payload(*row) for row in rows]
+
+    async def dispatch(self, message):
+        # Ticks não tocam na base de dados: evita o salto para a thread
+        # síncrona (close_old_connections) que o Channels faz por evento.
+        if message['type'] == 'market.tick':
+            await self.market_tick(message)
+        else:
+            await super().dispatch(message)
+
+    async def market_tick(self, event):
+        tick = event['tick']
+        if tick['symbol'] in self.symbols:
+            self.pending[tick['symbol']] = tick
+            self.wakeup.set()
+
+    async def flush_loop(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            if self.pending:
+                ticks, self.pending = list(self.pending.values()), {}
+                await self.send(text_data=json.dumps({'type': 'ticks', 'ticks': ticks}))
+            await asyncio.sleep(self.interval)
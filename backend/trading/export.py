@@ -0,0 +1,121 @@
+"""
+Exportação em streaming de negociações, ordens e posições.
+
+As linhas são lidas com `values_list().iterator()` (cursor no servidor em
+Postgres) e codificadas diretamente para NDJSON ou CSV em blocos, sem
+instanciar modelos nem serializers; a memória usada não depende do número
+de linhas exportadas.
+
+Servida por ASGI, a resposta recebe `aexport_stream`: um iterador síncrono
+obrigaria o Django a consumi-lo por inteiro antes de enviar o primeiro byte.
+"""
+import csv
+import io
+import json
+
+from asgiref.sync import sync_to_async
+
+from .models import Order, Position, Trade
+
+EXPORTS = {
+    'trades': (Trade, ['id', 'symbol', 'side', 'quantity', 'price', 'timestamp']),
+    'orders': (Order, ['id', 'asset', 'order_type', 'quantity', 'price', 'filled_quantity', 'status', 'created_at']),
+    'positions': (Position, ['id', 'asset', 'quantity', 'open_price', 'open_time', 'close_price', 'close_time', 'is_open']),
+}
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def _text(value):
+    return str(value) if value is not None else None
+
+
+def column_converters(model, fields):
+    """Conversores por coluna, decididos uma vez pelo tipo do campo e não por valor."""
+    converters = []
+    for name in fields:
+        internal_type = model._meta.get_field(name).get_internal_type()
+        if internal_type == 'DecimalField':
+            converters.append(_text)
+        elif internal_type in ('DateTimeField', 'DateField'):
+            converters.append(_iso)
+        else:
+            converters.append(None)
+    return converters
+
+
+def _plain_rows(rows, converters):
+    pairs = [(i, convert) for i, convert in enumerate(converters) if convert is not None]
+    for row in rows:
+        row = list(row)
+        for i, convert in pairs:
+            row[i] = convert(row[i])
+        yield row
+
+
+def iter_rows(queryset, fields, chunk_size=2000):
+    return queryset.order_by('id').values_list(*fields).iterator(chunk_size=chunk_size)
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def encode_ndjson(rows, fields, chunk_size=2000):
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    for chunk in _chunks(rows, chunk_size):
+        yield ''.join(dumps(dict(zip(fields, row))) + '\n' for row in chunk).encode()
+
+
+def encode_csv(rows, fields, chunk_size=2000):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for chunk in _chunks(rows, chunk_size):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+ENCODERS = {
+    'ndjson': encode_ndjson,
+    'csv': encode_csv,
+}
+
+
+def export_stream(resource, fmt, queryset=None, chunk_size=2000):
+    """Gerador de blocos de bytes para `resource` no formato `fmt`."""
+    model, fields = EXPORTS[resource]
+    if queryset is None:
+        queryset = model.objects.all()
+    rows = _plain_rows(iter_rows(queryset, fields, chunk_size), column_converters(model, fields))
+    return ENCODERS[fmt](rows, fields, chunk_size)
+
+
+async def aexport_stream(resource, fmt, queryset=None, chunk_size=2000):
+    """Como `export_stream`, para ASGI: cada bloco é produzido na thread síncrona e enviado logo."""
+    stream = export_stream(resource, fmt, queryset, chunk_size)
+    next_block = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (block := await next_block(stream, None)) is not None:
+            yield block
+    finally:
+        # Fecha o cursor na mesma thread que o abriu, mesmo que o cliente desligue a meio.
+        await sync_to_async(stream.close, thread_sensitive=True)()
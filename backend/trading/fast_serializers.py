@@ -0,0 +1,125 @@
+"""
+Serialização rápida das listagens da API de trading.
+
+`compile_serializer` lê os campos de um `ModelSerializer` uma vez e devolve
+um plano: as colunas a pedir com `values_list` e a conversão de cada uma,
+escolhida pelo tipo do campo DRF e não por valor. O resultado é o mesmo que o
+do serializer (decimais quantizados como texto, datas ISO 8601 com `Z`), sem
+instanciar modelos nem chamar `to_representation` campo a campo. Serializers
+com campos que o plano não sabe reproduzir devolvem None e seguem pelo DRF.
+"""
+import decimal
+from functools import lru_cache
+
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.fields import ISO_8601
+from rest_framework.settings import api_settings
+
+# Campos cuja representação é o próprio valor lido da base de dados.
+IDENTITY_FIELDS = (
+    serializers.IntegerField, serializers.CharField, serializers.BooleanField, serializers.ChoiceField,
+)
+
+
+def _decimal_converter(field):
+    if (
+        not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        or field.localize or field.normalize_output
+    ):
+        return None
+    if field.decimal_places is None:
+        return lambda value: f'{decimal.Decimal(str(value).strip()):f}'
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        # Instâncias por gravar podem ter o valor por omissão do campo (por exemplo, 0).
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return f'{value.quantize(exponent, rounding=rounding, context=context):f}'
+    return convert
+
+
+def _datetime_converter(field):
+    if getattr(field, 'format', api_settings.DATETIME_FORMAT).lower() != ISO_8601 or hasattr(field, 'timezone'):
+        return None
+
+    def convert(value, tz):
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+class CompiledSerializer:
+    def __init__(self, keys, columns, decimals, datetimes):
+        self.keys = keys
+        self.columns = columns
+        self.decimals = decimals
+        self.datetimes = datetimes
+
+    def values_list(self, queryset, *extra):
+        """Linhas nomeadas com as colunas do plano, seguidas de `extra` (por exemplo, o cursor)."""
+        return queryset.values_list(*self.columns, *(name for name in extra if name not in self.columns), named=True)
+
+    def serialize_objects(self, objects):
+        """Como `serialize`, para instâncias já carregadas (por exemplo, acabadas de criar)."""
+        columns = self.columns
+        return self.serialize([getattr(obj, column) for column in columns] for obj in objects)
+
+    def serialize(self, rows):
+        tz = timezone.get_current_timezone()
+        decimals, datetimes, keys = self.decimals, self.datetimes, self.keys
+        data = []
+        for row in rows:
+            row = list(row)
+            for i, convert in decimals:
+                if row[i] is not None:
+                    row[i] = convert(row[i])
+            for i, convert in datetimes:
+                if row[i] is not None:
+                    row[i] = convert(row[i], tz)
+            # As colunas extra ficam no fim e o zip deixa-as de fora.
+            data.append(dict(zip(keys, row)))
+        return data
+
+
+@lru_cache(maxsize=None)
+def _compile(serializer_class, fields):
+    model = serializer_class.Meta.model
+    keys, columns, decimals, datetimes = [], [], [], []
+    serializer = serializer_class(fields=fields) if fields else serializer_class()
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+            column = model._meta.get_field(field.source).attname
+        elif isinstance(field, serializers.DecimalField):
+            convert = _decimal_converter(field)
+            if convert is None:
+                return None
+            decimals.append((len(columns), convert))
+            column = field.source
+        elif isinstance(field, serializers.DateTimeField):
+            convert = _datetime_converter(field)
+            if convert is None:
+                return None
+            datetimes.append((len(columns), convert))
+            column = field.source
+        elif isinstance(field, IDENTITY_FIELDS) and not isinstance(field, serializers.ModelField):
+            column = field.source
+        else:
+            return None
+        if '.' in column or column == '*':
+            return None
+        keys.append(name)
+        columns.append(column)
+    return CompiledSerializer(keys, columns, decimals, datetimes)
+
+
+def compile_serializer(serializer_class, fields=None):
+    """Plano de `serializer_class` (com `fields`, se indicado), ou None se não for compilável."""
+    return _compile(serializer_class, frozenset(fields) if fields else None)
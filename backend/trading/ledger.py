@@ -0,0 +1,258 @@
+"""
+Livro de execuções e posições derivadas por FIFO.
+
+Cada execução fica numa linha `OrderFill` (só de acréscimo), ligada à ordem,
+à negociação e à posição a que se aplicou. As posições de (utilizador,
+símbolo) são mantidas de forma incremental: os lotes em aberto são casados
+por ordem de chegada com as execuções do lado oposto, o que dá o preço médio
+e o PnL realizado. Quando a quantidade volta a zero a posição é fechada (com
+preço de fecho e PnL); se passar para o lado oposto, abre-se outra.
+
+O estado FIFO é guardado em `PositionSnapshot` a cada
+`LEDGER_SNAPSHOT_INTERVAL` execuções. Reconstruir um (utilizador, símbolo)
+parte do snapshot e só reaplica as execuções posteriores.
+
+A linha de `PositionSnapshot` é também o lock de (utilizador, símbolo): quem
+grava execuções (o motor de matching, `close_position`) bloqueia-a até ao
+commit, pelo que dois processos nunca aplicam execuções sobre o mesmo estado.
+"""
+from collections import deque
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from trading_platform.db_routing import mark_written
+from trading_platform.fragment_cache import bump, user_scope
+from .models import Order, OrderFill, Position, PositionSnapshot
+from .risk import get_risk_engine
+from .valuation import latest_prices
+
+ZERO = Decimal('0')
+
+
+class LotBook:
+    """Lotes FIFO [quantidade com sinal, preço] e PnL realizado da posição aberta."""
+
+    def __init__(self, lots=(), realized=ZERO, position_id=None, last_fill_id=0):
+        self.lots = deque([Decimal(quantity), Decimal(price)] for quantity, price in lots)
+        self.realized = Decimal(realized)
+        self.position_id = position_id
+        self.last_fill_id = last_fill_id
+        self.pending = 0
+
+    @property
+    def net(self):
+        return sum((lot[0] for lot in self.lots), ZERO)
+
+    @property
+    def average_price(self):
+        size = sum((abs(lot[0]) for lot in self.lots), ZERO)
+        return sum((abs(lot[0]) * lot[1] for lot in self.lots), ZERO) / size if size else ZERO
+
+    def apply(self, side, quantity, price, commission=ZERO):
+        """Aplica uma execução. Devolve (fechou a posição, abriu uma posição)."""
+        had_lots = bool(self.lots)
+        long_before = had_lots and self.lots[0][0] > 0
+        signed = quantity if side == 'buy' else -quantity
+        self.realized -= commission
+        while signed and self.lots and (self.lots[0][0] > 0) != (signed > 0):
+            lot = self.lots[0]
+            matched = min(abs(signed), abs(lot[0]))
+            direction = 1 if lot[0] > 0 else -1
+            self.realized += matched * (price - lot[1]) * direction
+            lot[0] -= matched * direction
+            signed += matched * direction
+            if not lot[0]:
+                self.lots.popleft()
+        if signed:
+            self.lots.append([signed, price])
+        flipped = had_lots and bool(self.lots) and (self.lots[0][0] > 0) != long_before
+        closed = had_lots and (not self.lots or flipped)
+        opened = bool(self.lots) and (not had_lots or flipped)
+        return closed, opened
+
+    def serialized_lots(self):
+        return [[str(quantity), str(price)] for quantity, price in self.lots]
+
+
+REPLAY_FIELDS = ('id', 'side', 'quantity', 'price', 'commission', 'position_id')
+
+
+def _replay(state, fill_id, side, quantity, price, commission, position_id):
+    closed, opened = state.apply(side, quantity, price, commission)
+    if closed:
+        state.realized = ZERO
+        state.position_id = None
+    if opened:
+        state.position_id = position_id
+    state.last_fill_id = fill_id
+    state.pending += 1
+
+
+def lock_keys(keys):
+    """Bloqueia (até ao commit) o estado de cada (user_id, símbolo). Dentro de uma transação."""
+    keys = sorted(set(keys))
+    # Um snapshot vazio equivale a nenhum: cria os que faltam para haver linha a bloquear.
+    PositionSnapshot.objects.bulk_create(
+        [PositionSnapshot(user_id=user_id, symbol=symbol) for user_id, symbol in keys], ignore_conflicts=True,
+    )
+    return load_states(keys, lock=True)
+
+
+def load_states(keys, lock=False):
+    """Estado FIFO de cada (user_id, símbolo): snapshot mais as execuções seguintes."""
+    keys = set(keys)
+    if not keys:
+        return {}
+    states = {key: LotBook() for key in keys}
+    user_ids = {user_id for user_id, _ in keys}
+    symbols = {symbol for _, symbol in keys}
+    snapshots = PositionSnapshot.objects.filter(user_id__in=user_ids, symbol__in=symbols)
+    if lock:
+        # Sempre pela mesma ordem, para que duas transações não esperem uma pela outra.
+        snapshots = snapshots.select_for_update().order_by('user_id', 'symbol')
+    for snapshot in snapshots:
+        key = (snapshot.user_id, snapshot.symbol)
+        if key in states:
+            states[key] = LotBook(snapshot.lots, snapshot.realized_pnl, snapshot.position_id, snapshot.last_fill_id)
+    tail = Q()
+    for key, state in states.items():
+        tail |= Q(user_id=key[0], symbol=key[1], id__gt=state.last_fill_id)
+    for user_id, symbol, *fill in OrderFill.objects.filter(tail).order_by('id').values_list(
+        'user_id', 'symbol', *REPLAY_FIELDS,
+    ):
+        _replay(states[(user_id, symbol)], *fill)
+    return states
+
+
+def replay(user_id, symbol):
+    """Reconstrói o estado a partir de todas as execuções, ignorando o snapshot."""
+    state = LotBook()
+    for fill in OrderFill.objects.filter(user_id=user_id, symbol=symbol).order_by('id').values_list(*REPLAY_FIELDS):
+        _replay(state, *fill)
+    return state
+
+
+def record_fills(fills):
+    """Grava um lote de `OrderFill` (por gravar) e atualiza posições e snapshots.
+
+    Deve correr dentro de uma transação. Devolve as posições criadas ou
+    alteradas, a passar a `publish` depois do commit.
+    """
+    if not fills:
+        return []
+    by_key = {}
+    for fill in fills:
+        by_key.setdefault((fill.user_id, fill.symbol), []).append(fill)
+    states = lock_keys(by_key)
+    current = Position.objects.in_bulk([state.position_id for state in states.values() if state.position_id])
+    new_positions, changed = [], {}
+    for key, key_fills in by_key.items():
+        state = states[key]
+        position = current.get(state.position_id)
+        for fill in key_fills:
+            closed, opened = state.apply(fill.side, fill.quantity, fill.price, fill.commission)
+            if closed and position is not None:
+                position.realized_pnl = state.realized
+                position.close_price = fill.price
+                position.close_time = fill.created_at
+                position.is_open = False
+                changed[id(position)] = position
+                fill.position = position
+                state.realized = ZERO
+                position = None
+            if opened:
+                position = Position(
+                    user_id=key[0], asset=key[1], quantity=ZERO, open_price=fill.price, realized_pnl=ZERO,
+                )
+                new_positions.append(position)
+            if position is not None:
+                position.quantity = state.net
+                position.open_price = state.average_price
+                position.realized_pnl = state.realized
+                changed[id(position)] = position
+                fill.position = position
+            state.pending += 1
+    # As posições novas precisam de id antes de as execuções as referenciarem.
+    Position.objects.bulk_create(new_positions)
+    created = {id(position) for position in new_positions}
+    updated = [position for key, position in changed.items() if key not in created]
+    fields = ['quantity', 'open_price', 'realized_pnl', 'is_open', 'close_price', 'close_time']
+    if len(updated) == 1:
+        # O CASE de bulk_update custa mais do que um UPDATE simples.
+        Position.objects.filter(pk=updated[0].pk).update(**{field: getattr(updated[0], field) for field in fields})
+    else:
+        Position.objects.bulk_update(updated, fields)
+    OrderFill.objects.bulk_create(fills)
+    snapshots = []
+    for key, key_fills in by_key.items():
+        state = states[key]
+        state.position_id = key_fills[-1].position_id if state.lots else None
+        if state.pending >= settings.LEDGER_SNAPSHOT_INTERVAL:
+            snapshots.append(PositionSnapshot(
+                user_id=key[0], symbol=key[1], last_fill_id=key_fills[-1].pk, lots=state.serialized_lots(),
+                realized_pnl=state.realized, position_id=state.position_id,
+            ))
+    PositionSnapshot.objects.bulk_create(
+        snapshots, update_conflicts=True, unique_fields=['user', 'symbol'],
+        update_fields=['last_fill_id', 'lots', 'realized_pnl', 'position', 'updated_at'],
+    )
+    return list(changed.values())
+
+
+def publish(positions):
+    """Propaga as posições alteradas por `record_fills`: risco, cache dos painéis e réplicas.
+
+    As escritas em lote não disparam sinais; chamar depois do commit.
+    """
+    risk = get_risk_engine()
+    for position in positions:
+        risk.on_position(position)
+    users = {position.user_id for position in positions}
+    bump(*(user_scope(user_id) for user_id in users))
+    mark_written(*users)
+
+
+def close_position(position, price=None):
+    """Fecha `position` ao preço indicado ou ao último preço de mercado, registando o PnL.
+
+    Uma posição gerida pelo livro é fechada com uma ordem de sentido oposto e a
+    respetiva execução; uma posição aberta à mão é fechada diretamente.
+    """
+    if price is None:
+        mark = latest_prices([position.asset]).get(position.asset)
+        price = Decimal(str(mark)) if mark is not None else position.open_price
+    price = Decimal(price)
+    with transaction.atomic():
+        if position.fills.exists():
+            # Relida com o estado bloqueado: outro pedido ou o motor podem tê-la fechado ou alterado.
+            lock_keys([(position.user_id, position.asset)])
+            position = Position.objects.select_for_update().get(pk=position.pk)
+            if not position.is_open:
+                return position
+            quantity = abs(position.quantity)
+            side = 'sell' if position.quantity > 0 else 'buy'
+            order = Order.objects.create(
+                user_id=position.user_id, asset=position.asset, order_type=side, quantity=quantity,
+                price=price, status='filled', filled_quantity=quantity,
+            )
+            positions = record_fills([OrderFill(
+                order=order, user_id=position.user_id, symbol=position.asset, side=side,
+                quantity=quantity, price=price, created_at=timezone.now(),
+            )])
+        else:
+            position = Position.objects.select_for_update().get(pk=position.pk)
+            if not position.is_open:
+                return position
+            position.close_price = price
+            position.close_time = timezone.now()
+            position.realized_pnl = (price - position.open_price) * position.quantity
+            position.is_open = False
+            position.save()
+            return position
+    publish(positions)
+    position.refresh_from_db()
+    return position
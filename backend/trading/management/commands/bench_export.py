@@ -0,0 +1,52 @@
+import json
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from trading.export import EXPORTS, export_stream
+from trading.models import Trade
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Mede o débito (linhas/s) e o pico de memória da exportação em streaming.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resource', choices=sorted(EXPORTS), default='trades')
+        parser.add_argument('--seed', type=int, default=0, help='Criar N negociações sintéticas antes de medir.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, resource, seed, chunk_size, **options):
+        if seed:
+            user, _ = User.objects.get_or_create(username='bench-export')
+            now = timezone.now()
+            Trade.objects.bulk_create(
+                (Trade(user=user, symbol='BTC', quantity=Decimal('0.5'), price=Decimal(100 + i % 50),
+                       side='buy' if i % 2 else 'sell', timestamp=now) for i in range(seed)),
+                batch_size=5000,
+            )
+        model, _ = EXPORTS[resource]
+        rows = model.objects.count()
+        for fmt in ('ndjson', 'csv'):
+            started = time.perf_counter()
+            size = sum(len(block) for block in export_stream(resource, fmt, model.objects.all(), chunk_size))
+            elapsed = time.perf_counter() - started
+            # Segunda passagem só para o pico de memória: o tracemalloc distorce o tempo.
+            tracemalloc.start()
+            for _ in export_stream(resource, fmt, model.objects.all(), chunk_size):
+                pass
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.stdout.write(json.dumps({
+                'benchmark': f'trading.export.{resource}.{fmt}',
+                'vendor': connection.vendor,
+                'rows': rows,
+                'bytes': size,
+                'seconds': round(elapsed, 4),
+                'rows_per_sec': round(rows / elapsed, 1) if elapsed else None,
+                'peak_memory_kb': round(peak / 1024, 1),
+            }))
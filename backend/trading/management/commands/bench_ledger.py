@@ -0,0 +1,88 @@
+import json
+import random
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from trading.ledger import load_states, record_fills, replay
+from trading.models import Order, OrderFill
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a ingestão em lote no livro de execuções (execuções/s por tamanho de lote) e a reconstrução '
+        'do estado a partir do snapshot face à reaplicação completa. Tudo é revertido no fim.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fills', type=int, default=5000, help='Execuções por tamanho de lote.')
+        parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 1000])
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--symbols', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        symbols = [f'SYM{i}' for i in range(options['symbols'])]
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                User(username=f'bench-ledger-{i}') for i in range(options['users'])
+            )
+            orders = {
+                (order.user_id, order.asset): order.pk
+                for order in Order.objects.bulk_create(
+                    Order(user=user, asset=symbol, order_type='buy', quantity=1, price=1, status='filled')
+                    for user in users for symbol in symbols
+                )
+            }
+            prices = dict.fromkeys(symbols, 100.0)
+
+            def fill():
+                user, symbol = rng.choice(users), rng.choice(symbols)
+                prices[symbol] = max(1.0, prices[symbol] * (1 + rng.gauss(0, 0.01)))
+                return OrderFill(
+                    order_id=orders[(user.pk, symbol)], user_id=user.pk, symbol=symbol,
+                    side=rng.choice(('buy', 'sell')), quantity=Decimal(rng.randint(1, 10)),
+                    price=Decimal(f'{prices[symbol]:.4f}'), created_at=timezone.now(),
+                )
+
+            for size in options['batch_sizes']:
+                batches = -(-options['fills'] // size)
+                elapsed = 0.0
+                for _ in range(batches):
+                    batch = [fill() for _ in range(size)]
+                    started = time.perf_counter()
+                    with transaction.atomic():
+                        record_fills(batch)
+                    elapsed += time.perf_counter() - started
+                self.stdout.write(json.dumps({
+                    'benchmark': 'trading.ledger.ingest',
+                    'vendor': connection.vendor,
+                    'batch_size': size,
+                    'fills': batches * size,
+                    'seconds': round(elapsed, 4),
+                    'fills_per_sec': round(batches * size / elapsed, 1) if elapsed else None,
+                }))
+
+            key = (users[0].pk, symbols[0])
+            started = time.perf_counter()
+            state = load_states([key])[key]
+            snapshot_ms = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            full = replay(*key)
+            replay_ms = (time.perf_counter() - started) * 1000
+            self.stdout.write(json.dumps({
+                'benchmark': 'trading.ledger.rebuild',
+                'snapshot_interval': settings.LEDGER_SNAPSHOT_INTERVAL,
+                'history_fills': full.pending,
+                'tail_fills': state.pending,
+                'snapshot_ms': round(snapshot_ms, 3),
+                'full_replay_ms': round(replay_ms, 3),
+                'consistent': (list(state.lots), state.realized) == (list(full.lots), full.realized),
+            }))
+            transaction.set_rollback(True)
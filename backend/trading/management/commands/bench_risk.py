@@ -0,0 +1,54 @@
+import json
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from trading.risk import RiskEngine, UserRisk
+
+
+class Command(BaseCommand):
+    help = 'Mede a latência de RiskEngine.check (p50/p99) com estado em memória, sem base de dados.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--symbols', type=int, default=20, help='Símbolos com posição por utilizador.')
+        parser.add_argument('--checks', type=int, default=200000)
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        engine = RiskEngine(resync_interval=float('inf'))
+        universe = [f'SYM{i}' for i in range(options['symbols'] * 5)]
+        engine.update_marks({symbol: rng.uniform(10, 1000) for symbol in universe})
+        for user_id in range(options['users']):
+            account = UserRisk(max_position_size=30000, max_margin=30000, margin_rate=0.1)
+            for symbol in rng.sample(universe, options['symbols']):
+                account.symbols[symbol] = [rng.uniform(-50, 50), rng.uniform(0, 10), rng.uniform(0, 10), 0.0]
+            engine._accounts[user_id] = account
+
+        requests = [
+            (rng.randrange(options['users']), rng.choice(universe), rng.choice(('buy', 'sell')),
+             rng.uniform(0.1, 5), rng.uniform(10, 1000))
+            for _ in range(options['checks'])
+        ]
+        latencies = np.empty(len(requests))
+        rejected = 0
+        clock = time.perf_counter_ns
+        for i, (user_id, symbol, side, quantity, price) in enumerate(requests):
+            started = clock()
+            if engine.check(user_id, symbol, side, quantity, price):
+                rejected += 1
+            latencies[i] = clock() - started
+        latencies /= 1000
+        self.stdout.write(json.dumps({
+            'benchmark': 'trading.risk_check',
+            'users': options['users'],
+            'symbols_per_user': options['symbols'],
+            'checks': len(requests),
+            'rejected': rejected,
+            'p50_us': round(float(np.percentile(latencies, 50)), 2),
+            'p99_us': round(float(np.percentile(latencies, 99)), 2),
+            'max_us': round(float(latencies.max()), 2),
+        }))
@@ -0,0 +1,75 @@
+import json
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from trading.fast_serializers import compile_serializer
+from trading.models import Order
+from trading.renderers import MessagePackRenderer, ORJSONRenderer, msgpack, orjson
+from trading.serializers import OrderSerializer
+from rest_framework.renderers import JSONRenderer
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a serialização de listagens de ordens com N linhas por resposta: ModelSerializer do DRF face '
+        'ao serializer compilado, com os renderers JSON, orjson e msgpack. Cria as ordens em falta numa '
+        'transação revertida no fim.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 50_000])
+        parser.add_argument('--repeat', type=int, default=3, help='Melhor de N execuções.')
+
+    def handle(self, *args, **options):
+        renderers = {'json': JSONRenderer()}
+        if orjson is not None:
+            renderers['orjson'] = ORJSONRenderer()
+        if msgpack is not None:
+            renderers['msgpack'] = MessagePackRenderer()
+        plan = compile_serializer(OrderSerializer)
+        with transaction.atomic():
+            missing = max(options['rows']) - Order.objects.count()
+            if missing > 0:
+                user = User.objects.create(username='bench-serialization')
+                Order.objects.bulk_create(
+                    (Order(user=user, asset='BTC', order_type='buy', quantity=Decimal(i % 100) / 10,
+                           price=Decimal(f'{100 + i % 50}.1234'), status='filled') for i in range(missing)),
+                    batch_size=5000,
+                )
+            for rows in options['rows']:
+                # Um queryset novo por execução: a cache de resultados falsearia as medições.
+                def queryset():
+                    return Order.objects.order_by('-id')[:rows]
+                modes = {
+                    'drf': lambda: OrderSerializer(queryset(), many=True).data,
+                    'compiled': lambda: plan.serialize(plan.values_list(queryset())),
+                }
+                for mode, serialize in modes.items():
+                    for name, renderer in renderers.items():
+                        best = None
+                        for _ in range(options['repeat']):
+                            started = time.perf_counter()
+                            data = serialize()
+                            serialized = time.perf_counter()
+                            body = renderer.render({'next': None, 'results': data})
+                            finished = time.perf_counter()
+                            if best is None or finished - started < best[0]:
+                                best = (finished - started, serialized - started, finished - serialized, len(body))
+                        total, serialize_s, render_s, size = best
+                        self.stdout.write(json.dumps({
+                            'benchmark': 'trading.api.serialization',
+                            'vendor': connection.vendor,
+                            'rows': rows,
+                            'serializer': mode,
+                            'renderer': name,
+                            'query_serialize_ms': round(serialize_s * 1000, 1),
+                            'render_ms': round(render_s * 1000, 1),
+                            'total_ms': round(total * 1000, 1),
+                            'rows_per_sec': round(rows / total),
+                            'bytes': size,
+                        }))
+            transaction.set_rollback(True)
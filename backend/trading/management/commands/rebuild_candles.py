@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from trading.candles import execution_trades, record_trades
+from trading.models import Candle, Trade
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói as velas a partir do histórico de Trade (só para carga inicial ou reparação).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbol', action='append', dest='symbols')
+        parser.add_argument('--chunk-size', type=int, default=10_000)
+
+    def handle(self, *args, symbols=None, chunk_size=10_000, **options):
+        candles = Candle.objects.all()
+        trades = execution_trades(Trade.objects.all()).order_by('timestamp', 'id')
+        if symbols:
+            candles = candles.filter(symbol__in=symbols)
+            trades = trades.filter(symbol__in=symbols)
+        candles.delete()
+        batch, total = [], 0
+        for row in trades.values_list('symbol', 'timestamp', 'price', 'quantity').iterator(chunk_size=chunk_size):
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                record_trades(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            record_trades(batch)
+            total += len(batch)
+        self.stdout.write(f'{total} negociações agregadas.')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from trading.valuation import revalue_portfolios
+
+
+class Command(BaseCommand):
+    help = 'Recalcula o valor de mercado de todos os portfólios numa única passagem.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--symbol', action='append', dest='symbols', help='Reavaliar só quem detém este símbolo.')
+
+    def handle(self, *args, symbols=None, **options):
+        users = revalue_portfolios(symbols)
+        self.stdout.write(f'{len(users)} portfólios atualizados.')
@@ -0,0 +1,421 @@
+"""
+Motor de matching em memória com prioridade preço-tempo.
+
+Cada símbolo tem um livro com níveis de preço ordenados e uma fila FIFO por
+nível. O matching acontece inteiramente em memória; só as execuções (Trade
+e o livro `OrderFill`, que atualiza as posições) e as mudanças de estado das
+ordens são gravadas, em lote, numa transação.
+
+Cada processo (workers ASGI, `run_automations`) tem os seus livros, mas o
+dono de cada símbolo é a base de dados: quem altera um livro fá-lo numa
+transação que incrementa `OrderBook.sequence`, com a linha bloqueada até ao
+commit. Se a sequência anterior não for a do livro em memória, outro
+processo alterou-o entretanto e o livro é reconstruído a partir das ordens em
+repouso antes de casar; a mesma ordem nunca é executada por dois processos.
+"""
+import bisect
+import contextlib
+import threading
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .candles import record_trades
+from .ledger import publish, record_fills
+from .models import Order, OrderBook, OrderFill, Trade
+from .risk import get_risk_engine
+
+BUY = 'buy'
+SELL = 'sell'
+
+STATUS_PENDING = 'pending'
+STATUS_PARTIAL = 'partial'
+STATUS_FILLED = 'filled'
+STATUS_CANCELLED = 'cancelled'
+RESTING_STATUSES = (STATUS_PENDING, STATUS_PARTIAL)
+
+ZERO = Decimal('0')
+
+
+@dataclass
+class Fill:
+    symbol: str
+    price: Decimal
+    quantity: Decimal
+    taker_order_id: int
+    taker_user_id: int
+    taker_side: str
+    maker_order_id: int
+    maker_user_id: int
+    timestamp: datetime
+
+    @property
+    def buyer_user_id(self):
+        return self.taker_user_id if self.taker_side == BUY else self.maker_user_id
+
+    @property
+    def seller_user_id(self):
+        return self.maker_user_id if self.taker_side == BUY else self.taker_user_id
+
+    @property
+    def buyer_order_id(self):
+        return self.taker_order_id if self.taker_side == BUY else self.maker_order_id
+
+    @property
+    def seller_order_id(self):
+        return self.maker_order_id if self.taker_side == BUY else self.taker_order_id
+
+
+class BookOrder:
+    __slots__ = ('order_id', 'user_id', 'side', 'price', 'quantity', 'remaining')
+
+    def __init__(self, order_id, user_id, side, price, quantity, remaining=None):
+        self.order_id = order_id
+        self.user_id = user_id
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+        self.remaining = quantity if remaining is None else remaining
+
+    @property
+    def filled(self):
+        return self.quantity - self.remaining
+
+    @property
+    def status(self):
+        if self.remaining <= 0:
+            return STATUS_FILLED
+        return STATUS_PARTIAL if self.remaining < self.quantity else STATUS_PENDING
+
+    @classmethod
+    def from_order(cls, order):
+        return cls(
+            order.pk, order.user_id, order.order_type, Decimal(order.price),
+            Decimal(order.quantity), Decimal(order.quantity) - Decimal(order.filled_quantity or 0),
+        )
+
+
+class PriceLevel:
+    __slots__ = ('price', 'orders', 'total')
+
+    def __init__(self, price):
+        self.price = price
+        self.orders = deque()
+        self.total = ZERO
+
+
+class BookSide:
+    """Um lado do livro. As chaves ficam ordenadas para que a melhor seja a primeira."""
+
+    def __init__(self, side):
+        self.side = side
+        self._sign = -1 if side == BUY else 1
+        self._keys = []
+        self._levels = {}
+
+    def best(self):
+        return self._levels[self._keys[0]] if self._keys else None
+
+    def add(self, entry):
+        key = self._sign * entry.price
+        level = self._levels.get(key)
+        if level is None:
+            level = self._levels[key] = PriceLevel(entry.price)
+            bisect.insort(self._keys, key)
+        level.orders.append(entry)
+        level.total += entry.remaining
+
+    def remove_level(self, level):
+        key = self._sign * level.price
+        del self._levels[key]
+        del self._keys[bisect.bisect_left(self._keys, key)]
+
+    def level_for(self, price):
+        return self._levels.get(self._sign * price)
+
+    def levels(self, depth=None):
+        keys = self._keys if depth is None else self._keys[:depth]
+        return [self._levels[key] for key in keys]
+
+
+class Book:
+    """Livro de ordens de um símbolo. Não é thread-safe: o motor serializa o acesso."""
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.bids = BookSide(BUY)
+        self.asks = BookSide(SELL)
+        self.orders = {}
+        self.loaded = set()
+        # `OrderBook.sequence` a que o livro corresponde; None enquanto uma alteração não tem commit.
+        self.sequence = None
+
+    def _crosses(self, entry, level):
+        if entry.side == BUY:
+            return level.price <= entry.price
+        return level.price >= entry.price
+
+    def match(self, entry, now=None):
+        """Casa `entry` contra o lado oposto e deixa o resto no livro.
+
+        Retorna a lista de execuções e as ordens do livro que foram tocadas.
+        """
+        now = now or timezone.now()
+        opposite = self.asks if entry.side == BUY else self.bids
+        fills = []
+        touched = []
+        while entry.remaining > 0:
+            level = opposite.best()
+            if level is None or not self._crosses(entry, level):
+                break
+            queue = level.orders
+            while entry.remaining > 0 and queue:
+                maker = queue[0]
+                if maker.remaining <= 0:
+                    # Ordem cancelada: removida de forma preguiçosa.
+                    queue.popleft()
+                    continue
+                quantity = min(entry.remaining, maker.remaining)
+                entry.remaining -= quantity
+                maker.remaining -= quantity
+                level.total -= quantity
+                fills.append(Fill(
+                    self.symbol, level.price, quantity,
+                    entry.order_id, entry.user_id, entry.side,
+                    maker.order_id, maker.user_id, now,
+                ))
+                touched.append(maker)
+                if maker.remaining <= 0:
+                    queue.popleft()
+                    self.orders.pop(maker.order_id, None)
+            if not queue:
+                opposite.remove_level(level)
+        if entry.remaining > 0:
+            (self.bids if entry.side == BUY else self.asks).add(entry)
+            self.orders[entry.order_id] = entry
+        return fills, touched
+
+    def cancel(self, order_id):
+        entry = self.orders.pop(order_id, None)
+        if entry is None:
+            return None
+        side = self.bids if entry.side == BUY else self.asks
+        level = side.level_for(entry.price)
+        if level is not None:
+            level.total -= entry.remaining
+            if level.total <= 0:
+                side.remove_level(level)
+        entry.remaining = ZERO
+        return entry
+
+    def depth(self, levels=10):
+        return {
+            'bids': [(level.price, level.total) for level in self.bids.levels(levels)],
+            'asks': [(level.price, level.total) for level in self.asks.levels(levels)],
+        }
+
+
+class MatchingEngine:
+    """Mantém um `Book` por símbolo e persiste os resultados do matching."""
+
+    def __init__(self):
+        self._books = {}
+        self._locks = defaultdict(threading.Lock)
+        self._locks_lock = threading.Lock()
+
+    def symbols(self):
+        return sorted(self._books)
+
+    def _lock(self, symbol):
+        with self._locks_lock:
+            return self._locks[symbol]
+
+    def _load(self, symbol, exclude=()):
+        # Ordens em repouso vindas da base de dados são reprocessadas por ordem
+        # de chegada, de modo que um livro cruzado herdado seja resolvido.
+        # Devolve o livro e as execuções desse reprocessamento, por gravar.
+        book = Book(symbol)
+        resting = list(
+            Order.objects.filter(asset=symbol, status__in=RESTING_STATUSES)
+            .exclude(pk__in=exclude).order_by('created_at', 'id')
+        )
+        fills, touched = [], {}
+        for order in resting:
+            book.loaded.add(order.pk)
+            entry = BookOrder.from_order(order)
+            if entry.remaining <= 0:
+                continue
+            new_fills, makers = book.match(entry)
+            fills.extend(new_fills)
+            for maker in makers:
+                touched[maker.order_id] = maker
+            if new_fills:
+                touched[entry.order_id] = entry
+        # As ordens carregadas (incluindo as acabadas de gravar) não passam por
+        # `submit`: o risco destes utilizadores é relido da base de dados.
+        for user_id in {order.user_id for order in resting}:
+            get_risk_engine().invalidate(user_id)
+        return book, fills, touched.values()
+
+    @contextlib.contextmanager
+    def _writing(self, symbols, exclude=()):
+        """Transação com os livros de `symbols` bloqueados na base de dados e em dia com ela.
+
+        Devolve símbolo -> livro e as posições a publicar depois do commit.
+        """
+        symbols = sorted(set(symbols))
+        books, positions = {}, []
+        try:
+            with transaction.atomic(), contextlib.ExitStack() as locks:
+                # Um a um e por ordem: duas transações nunca esperam uma pela outra em sentidos opostos.
+                for symbol in symbols:
+                    if not OrderBook.objects.filter(symbol=symbol).update(sequence=F('sequence') + 1):
+                        OrderBook.objects.bulk_create([OrderBook(symbol=symbol)], ignore_conflicts=True)
+                        OrderBook.objects.filter(symbol=symbol).update(sequence=F('sequence') + 1)
+                sequences = dict(OrderBook.objects.filter(symbol__in=symbols).values_list('symbol', 'sequence'))
+                for symbol in symbols:
+                    locks.enter_context(self._lock(symbol))
+                    book = self._books.get(symbol)
+                    if book is None or book.sequence != sequences[symbol] - 1:
+                        book, fills, touched = self._load(symbol, exclude)
+                        if fills:
+                            positions.extend(self._persist(fills, touched))
+                        self._books[symbol] = book
+                    book.sequence = None
+                    books[symbol] = book
+                yield books, positions
+        except Exception:
+            # O livro em memória pode ter avançado sem a base de dados; descarta-o
+            # para que seja reconstruído a partir dela no próximo acesso.
+            for symbol in symbols:
+                self._books.pop(symbol, None)
+            raise
+
+        def committed():
+            for symbol, book in books.items():
+                book.sequence = sequences[symbol]
+        # Só depois do commit da transação exterior, se houver: com rollback o livro fica por recarregar.
+        transaction.on_commit(committed)
+        if positions:
+            publish(positions)
+
+    def submit(self, orders):
+        """Casa um lote de `Order` e grava execuções e estados numa transação."""
+        fills = []
+        touched = {}
+        accepted = []
+        by_symbol = {}
+        for order in orders:
+            by_symbol.setdefault(order.asset, []).append(order)
+        if not by_symbol:
+            return fills
+        try:
+            with self._writing(by_symbol, exclude=[order.pk for order in orders]) as (books, positions):
+                for symbol, symbol_orders in by_symbol.items():
+                    book = books[symbol]
+                    for order in symbol_orders:
+                        if order.pk in book.orders or order.pk in book.loaded:
+                            continue
+                        if order.status not in RESTING_STATUSES:
+                            continue
+                        entry = BookOrder.from_order(order)
+                        if entry.remaining <= 0 or entry.price <= 0:
+                            continue
+                        accepted.append((symbol, entry))
+                        new_fills, makers = book.match(entry)
+                        fills.extend(new_fills)
+                        for maker in makers:
+                            touched[maker.order_id] = maker
+                        if new_fills:
+                            touched[entry.order_id] = entry
+                            order.filled_quantity = entry.filled
+                            order.status = entry.status
+                if fills:
+                    positions.extend(self._persist(fills, touched.values()))
+        except Exception:
+            for _, entry in accepted:
+                get_risk_engine().invalidate(entry.user_id)
+            raise
+        risk = get_risk_engine()
+        for symbol, entry in accepted:
+            risk.on_order_accepted(entry.user_id, symbol, entry.side, entry.quantity)
+        risk.on_fills(fills)
+        return fills
+
+    def cancel(self, order):
+        """Cancela `order` se ainda estiver em repouso. Devolve False se já foi executada ou cancelada."""
+        with self._writing([order.asset]) as (books, _):
+            # Condicional: a ordem pode ter sido executada desde que `order` foi lida.
+            if not Order.objects.filter(pk=order.pk, status__in=RESTING_STATUSES).update(status=STATUS_CANCELLED):
+                order.refresh_from_db(fields=['status', 'filled_quantity'])
+                return False
+            book = books[order.asset]
+            entry = book.orders.get(order.pk)
+            remaining = entry.remaining if entry is not None else ZERO
+            book.cancel(order.pk)
+            order.status = STATUS_CANCELLED
+        if remaining > 0:
+            get_risk_engine().on_order_released(order.user_id, order.asset, order.order_type, remaining)
+        return True
+
+    def depth(self, symbol, levels=10):
+        sequence = OrderBook.objects.filter(symbol=symbol).values_list('sequence', flat=True).first() or 0
+        fills = ()
+        with self._lock(symbol):
+            book = self._books.get(symbol)
+            if book is None or book.sequence != sequence:
+                # Só leitura: recarrega sem bloquear o livro na base de dados.
+                book, fills, _ = self._load(symbol)
+                if not fills:
+                    book.sequence = sequence
+                    self._books[symbol] = book
+            if not fills:
+                return book.depth(levels)
+        # Um livro cruzado herdado tem execuções por gravar: resolve-se como numa escrita.
+        with self._writing([symbol]) as (books, _):
+            return books[symbol].depth(levels)
+
+    def _persist(self, fills, touched):
+        trades = []
+        for fill in fills:
+            trades.append(Trade(
+                user_id=fill.buyer_user_id, symbol=fill.symbol, quantity=fill.quantity,
+                price=fill.price, side=BUY, timestamp=fill.timestamp,
+            ))
+            trades.append(Trade(
+                user_id=fill.seller_user_id, symbol=fill.symbol, quantity=fill.quantity,
+                price=fill.price, side=SELL, timestamp=fill.timestamp,
+            ))
+        updates = [
+            Order(pk=entry.order_id, filled_quantity=entry.filled, status=entry.status)
+            for entry in touched
+        ]
+        with transaction.atomic():
+            Trade.objects.bulk_create(trades)
+            Order.objects.bulk_update(updates, ['filled_quantity', 'status'])
+            record_trades([(fill.symbol, fill.timestamp, fill.price, fill.quantity) for fill in fills])
+            # Uma linha do livro de execuções por negociação (compra e venda).
+            return record_fills([
+                OrderFill(
+                    order_id=order_id, trade=trade, user_id=trade.user_id, symbol=fill.symbol,
+                    side=trade.side, quantity=fill.quantity, price=fill.price, created_at=fill.timestamp,
+                )
+                for fill, buy, sell in zip(fills, trades[::2], trades[1::2])
+                for order_id, trade in ((fill.buyer_order_id, buy), (fill.seller_order_id, sell))
+            ])
+
+    def reset(self):
+        with self._locks_lock:
+            self._books.clear()
+
+
+_engine = MatchingEngine()
+
+
+def get_engine():
+    return _engine
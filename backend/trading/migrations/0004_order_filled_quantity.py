@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("trading", "0003_marketticker_orderbook_portfolio_trade"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="filled_quantity",
+            field=models.DecimalField(decimal_places=8, default=0, max_digits=20),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("trading", "0004_order_filled_quantity"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Candle",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("symbol", models.CharField(max_length=20)),
+                (
+                    "interval",
+                    models.CharField(
+                        choices=[
+                            ("1m", "1 minuto"),
+                            ("5m", "5 minutos"),
+                            ("1h", "1 hora"),
+                            ("1d", "1 dia"),
+                        ],
+                        max_length=3,
+                    ),
+                ),
+                ("bucket_start", models.DateTimeField()),
+                ("open", models.DecimalField(decimal_places=8, max_digits=18)),
+                ("high", models.DecimalField(decimal_places=8, max_digits=18)),
+                ("low", models.DecimalField(decimal_places=8, max_digits=18)),
+                ("close", models.DecimalField(decimal_places=8, max_digits=18)),
+                (
+                    "volume",
+                    models.DecimalField(decimal_places=8, default=0, max_digits=28),
+                ),
+                ("trade_count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("symbol", "interval", "bucket_start"),
+                        name="unique_candle_bucket",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("trading", "0005_candle"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"], name="order_user_created_at_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="position",
+            index=models.Index(
+                fields=["user", "-open_time", "-id"], name="position_user_open_time_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,141 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("trading", "0007_risk_settings"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="position",
+            name="realized_pnl",
+            field=models.DecimalField(decimal_places=8, default=0, max_digits=20),
+        ),
+        migrations.CreateModel(
+            name="OrderFill",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("symbol", models.CharField(max_length=50)),
+                (
+                    "side",
+                    models.CharField(
+                        choices=[("buy", "Buy"), ("sell", "Sell")], max_length=4
+                    ),
+                ),
+                ("quantity", models.DecimalField(decimal_places=8, max_digits=20)),
+                ("price", models.DecimalField(decimal_places=8, max_digits=20)),
+                (
+                    "commission",
+                    models.DecimalField(decimal_places=8, default=0, max_digits=20),
+                ),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "order",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="fills",
+                        to="trading.order",
+                    ),
+                ),
+                (
+                    "position",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="fills",
+                        to="trading.position",
+                    ),
+                ),
+                (
+                    "trade",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="fill",
+                        to="trading.trade",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="fills",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "symbol", "id"],
+                        name="orderfill_user_symbol_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="PositionSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("symbol", models.CharField(max_length=50)),
+                ("last_fill_id", models.BigIntegerField(default=0)),
+                ("lots", models.JSONField(default=list)),
+                (
+                    "realized_pnl",
+                    models.DecimalField(decimal_places=8, default=0, max_digits=20),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "position",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="trading.position",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="position_snapshots",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "symbol"), name="unique_position_snapshot"
+                    )
+                ],
+            },
+        ),
+    ]
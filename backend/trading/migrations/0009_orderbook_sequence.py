@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("trading", "0008_fill_ledger"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="orderbook",
+            name="sequence",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name="orderbook",
+            name="symbol",
+            field=models.CharField(max_length=50, unique=True),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("trading", "0009_orderbook_sequence"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="orderfill",
+            name="order",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.RESTRICT,
+                related_name="fills",
+                to="trading.order",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="orderfill",
+            name="position",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.RESTRICT,
+                related_name="fills",
+                to="trading.position",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="orderfill",
+            name="trade",
+            field=models.OneToOneField(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.RESTRICT,
+                related_name="fill",
+                to="trading.trade",
+            ),
+        ),
+    ]
@@ -1,3 +1,4 @@
+from decimal import Decimal
 from django.db import models
 from users.models import User
 from django.utils import timezone
@@ -11,6 +12,12 @@ class Position(models.Model):
     close_price = models.DecimalField(max_digits=20, decimal_places=8, null=True, blank=True)
     close_time = models.DateTimeField(null=True, blank=True)
     is_open = models.BooleanField(default=True)
+    realized_pnl = models.DecimalField(max_digits=20, decimal_places=8, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-open_time', '-id'], name='position_user_open_time_idx'),
+        ]
 
 class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
@@ -20,6 +27,12 @@ class Order(models.Model):
     price = models.DecimalField(max_digits=20, decimal_places=8)
     created_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, default='pending')
+    filled_quantity = models.DecimalField(max_digits=20, decimal_places=8, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_at_idx'),
+        ]
 
 class MarketTicker(models.Model):
     symbol = models.CharField(max_length=20, unique=True)
@@ -47,8 +60,90 @@ class Portfolio(models.Model):
         return f'Portfólio de {self.user.username} - Valor: {self.total_value}'
 
 class OrderBook(models.Model):
-    symbol = models.CharField(max_length=20, unique=True)
+    symbol = models.CharField(max_length=50, unique=True)
+    # Incrementada (com a linha bloqueada até ao commit) por cada alteração ao
+    # livro do símbolo; os processos comparam-na com o livro que têm em memória.
+    sequence = models.PositiveBigIntegerField(default=0)
     buy_orders = models.ManyToManyField(Order, related_name='buy_order_book')
     sell_orders = models.ManyToManyField(Order, related_name='sell_order_book')
     def __str__(self):
         return f'Livro de Ordens para {self.symbol}'
+
+class Candle(models.Model):
+    INTERVAL_CHOICES = [('1m', '1 minuto'), ('5m', '5 minutos'), ('1h', '1 hora'), ('1d', '1 dia')]
+    symbol = models.CharField(max_length=20)
+    interval = models.CharField(max_length=3, choices=INTERVAL_CHOICES)
+    bucket_start = models.DateTimeField()
+    open = models.DecimalField(max_digits=18, decimal_places=8)
+    high = models.DecimalField(max_digits=18, decimal_places=8)
+    low = models.DecimalField(max_digits=18, decimal_places=8)
+    close = models.DecimalField(max_digits=18, decimal_places=8)
+    volume = models.DecimalField(max_digits=28, decimal_places=8, default=0)
+    trade_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Também serve de índice para leituras por símbolo, intervalo e período.
+            models.UniqueConstraint(fields=['symbol', 'interval', 'bucket_start'], name='unique_candle_bucket'),
+        ]
+
+    def __str__(self):
+        return f'{self.symbol} {self.interval} @ {self.bucket_start}'
+
+class RiskSettings(models.Model):
+    # Limites por utilizador (tabela risk_settings no Supabase). Campos vazios = sem limite.
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='risk_settings')
+    max_position_size = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True)
+    max_margin = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True)
+    margin_rate = models.DecimalField(max_digits=5, decimal_places=4, default=Decimal('0.1'))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'Risco de {self.user}'
+
+
+class OrderFill(models.Model):
+    # Livro de execuções só de acréscimo (tabela order_fills no Supabase): uma
+    # linha por ordem executada em cada negociação. As posições derivam daqui.
+    # Ordens, negociações e posições com execuções não se apagam sozinhas
+    # (RESTRICT); apagar o utilizador apaga o livro inteiro com ele.
+    order = models.ForeignKey(Order, on_delete=models.RESTRICT, related_name='fills')
+    trade = models.OneToOneField(Trade, on_delete=models.RESTRICT, null=True, blank=True, related_name='fill')
+    position = models.ForeignKey(Position, on_delete=models.RESTRICT, null=True, blank=True, related_name='fills')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='fills')
+    symbol = models.CharField(max_length=50)
+    side = models.CharField(max_length=4, choices=[('buy', 'Buy'), ('sell', 'Sell')])
+    quantity = models.DecimalField(max_digits=20, decimal_places=8)
+    price = models.DecimalField(max_digits=20, decimal_places=8)
+    commission = models.DecimalField(max_digits=20, decimal_places=8, default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'symbol', 'id'], name='orderfill_user_symbol_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('OrderFill é só de acréscimo; registe uma nova execução.')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f'Fill {self.side} de {self.quantity} {self.symbol} @ {self.price}'
+
+
+class PositionSnapshot(models.Model):
+    # Estado FIFO de (utilizador, símbolo) até `last_fill_id`: reconstruir parte
+    # daqui e só reaplica as execuções seguintes.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='position_snapshots')
+    symbol = models.CharField(max_length=50)
+    last_fill_id = models.BigIntegerField(default=0)
+    lots = models.JSONField(default=list)
+    realized_pnl = models.DecimalField(max_digits=20, decimal_places=8, default=0)
+    position = models.ForeignKey(Position, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'symbol'], name='unique_position_snapshot'),
+        ]
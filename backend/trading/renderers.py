@@ -0,0 +1,52 @@
+"""
+Renderers da API de trading escolhidos por negociação de conteúdo.
+
+O JSON é codificado com orjson quando está instalado (mesmo media type que o
+`JSONRenderer` do DRF); `application/msgpack` (ou `?format=msgpack`) fica
+disponível quando o msgpack está instalado. Sem estas dependências mantém-se
+o comportamento do DRF.
+"""
+from rest_framework.renderers import BaseRenderer, BrowsableAPIRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Decimais, datas e afins que não venham já convertidos pelo serializer.
+_default = JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        # Indentação pedida no Accept ou API navegável: o renderer do DRF trata disso.
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=_default)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default)
+
+
+def trading_renderers():
+    renderers = [ORJSONRenderer if orjson is not None else JSONRenderer, BrowsableAPIRenderer]
+    if msgpack is not None:
+        renderers.append(MessagePackRenderer)
+    return renderers
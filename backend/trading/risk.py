@@ -0,0 +1,276 @@
+"""
+Verificação de risco pré-negociação em memória.
+
+Por utilizador e símbolo o motor guarda a quantidade líquida das posições
+abertas (as execuções chegam às posições pelo livro `trading.ledger`) e as quantidades reservadas por ordens ainda não
+executadas de cada lado. A exposição de um símbolo é a do pior caso, com
+todas as compras ou todas as vendas em aberto executadas, ao último preço
+conhecido. A margem usada é a exposição bruta vezes `margin_rate`.
+
+O estado de cada utilizador é lido da base de dados no primeiro acesso e
+depois mantido por eventos: o motor de matching reserva cada ordem aceite e
+liberta-a nas execuções e cancelamentos, e os sinais de `Position` e
+`RiskSettings` aplicam as alterações. Assim, verificar uma ordem não volta a
+somar as posições na base de dados. Para limitar desvios (por exemplo,
+eventos de outro processo), o estado é relido a cada `RISK_RESYNC_INTERVAL`
+segundos.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+
+from .models import Order, Position, RiskSettings
+from .valuation import latest_prices
+
+RESTING_STATUSES = ('pending', 'partial')
+
+
+def _float_or_none(value):
+    return None if value is None else float(value)
+
+
+NET, BIDS, ASKS, PRICE = range(4)
+
+
+class UserRisk:
+    """Limites e, por símbolo, [líquido, compras em aberto, vendas em aberto, último preço]."""
+
+    __slots__ = ('lock', 'max_position_size', 'max_margin', 'margin_rate', 'symbols', 'positions', 'loaded_at')
+
+    def __init__(self, max_position_size=None, max_margin=None, margin_rate=0.1):
+        self.lock = threading.Lock()
+        self.max_position_size = max_position_size
+        self.max_margin = max_margin
+        self.margin_rate = margin_rate
+        self.symbols = {}
+        self.positions = {}
+        self.loaded_at = time.monotonic()
+
+    def entry(self, symbol, price=0.0):
+        entry = self.symbols.get(symbol)
+        if entry is None:
+            entry = self.symbols[symbol] = [0.0, 0.0, 0.0, price]
+        elif not entry[PRICE]:
+            entry[PRICE] = price
+        return entry
+
+
+class RiskEngine:
+    def __init__(self, resync_interval=60.0):
+        self.resync_interval = resync_interval
+        self.marks = {}
+        self._accounts = {}
+        self._order_locks = defaultdict(threading.Lock)
+        self._lock = threading.Lock()
+
+    # Estado
+
+    def account(self, user_id):
+        account = self._accounts.get(user_id)
+        if account is None or time.monotonic() - account.loaded_at > self.resync_interval:
+            account = self._accounts[user_id] = self._load(user_id)
+        return account
+
+    def _load(self, user_id):
+        limits = RiskSettings.objects.filter(user_id=user_id).first()
+        if limits is None:
+            account = UserRisk(settings.RISK_DEFAULT_MAX_POSITION_SIZE, settings.RISK_DEFAULT_MAX_MARGIN)
+        else:
+            account = UserRisk(
+                _float_or_none(limits.max_position_size), _float_or_none(limits.max_margin),
+                float(limits.margin_rate),
+            )
+        positions = (
+            Position.objects.filter(user_id=user_id, is_open=True)
+            .annotate(qty=Cast('quantity', FloatField()), cost=Cast('open_price', FloatField()))
+            .values_list('pk', 'asset', 'qty', 'cost')
+        )
+        for pk, asset, quantity, cost in positions:
+            account.positions[pk] = (asset, quantity)
+            account.entry(asset, cost)[NET] += quantity
+        orders = (
+            Order.objects.filter(user_id=user_id, status__in=RESTING_STATUSES)
+            .annotate(
+                remaining=Cast(F('quantity') - F('filled_quantity'), FloatField()),
+                limit=Cast('price', FloatField()),
+            )
+            .values_list('asset', 'order_type', 'remaining', 'limit')
+        )
+        for asset, side, remaining, price in orders:
+            account.entry(asset, price)[BIDS if side == 'buy' else ASKS] += remaining
+        if account.symbols:
+            self.marks.update(latest_prices(list(account.symbols)))
+        return account
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._accounts.pop(user_id, None)
+
+    def reset(self):
+        with self._lock:
+            self._accounts.clear()
+            self.marks.clear()
+
+    def order_lock(self, user_id):
+        """Serializa verificação e envio das ordens de um utilizador.
+
+        O estado é protegido por `UserRisk.lock`, segurado só por instantes; este
+        lock cobre a janela entre `check` e a reserva feita pelo motor de matching.
+        """
+        with self._lock:
+            return self._order_locks[user_id]
+
+    # Verificação
+
+    def _exposure(self, symbol, entry, bids, asks):
+        net = entry[NET]
+        return max(abs(net + bids), abs(net - asks)) * (self.marks.get(symbol) or entry[PRICE])
+
+    def _gross(self, account):
+        marks = self.marks
+        return sum(
+            max(abs(net + bids), abs(net - asks)) * (marks.get(symbol) or price)
+            for symbol, (net, bids, asks, price) in account.symbols.items()
+        )
+
+    def _reason(self, account, symbol, side, quantity, price):
+        # Com `account.lock` segurado.
+        entry = account.entry(symbol, price)
+        bids, asks = entry[BIDS], entry[ASKS]
+        if side == 'buy':
+            bids += quantity
+        else:
+            asks += quantity
+        exposure = self._exposure(symbol, entry, bids, asks)
+        if account.max_position_size is not None and exposure > account.max_position_size:
+            return f'Exposição em {symbol} ({exposure:.2f}) acima do limite ({account.max_position_size:.2f}).'
+        if account.max_margin is not None:
+            gross = self._gross(account) - self._exposure(symbol, entry, entry[BIDS], entry[ASKS]) + exposure
+            margin = gross * account.margin_rate
+            if margin > account.max_margin:
+                return f'Margem necessária ({margin:.2f}) acima do limite ({account.max_margin:.2f}).'
+        return None
+
+    def check(self, user_id, symbol, side, quantity, price):
+        """Devolve o motivo da rejeição, ou None se a ordem cabe nos limites."""
+        account = self.account(user_id)
+        with account.lock:
+            return self._reason(account, symbol, side, float(quantity), float(price))
+
+    def check_batch(self, user_id, orders, released=()):
+        """Verifica um lote de (símbolo, lado, quantidade, preço) de uma vez.
+
+        Cada ordem aceite conta para as seguintes e as de `released` (símbolo,
+        lado, quantidade por executar), que vão ser canceladas, deixam de
+        contar. Devolve um motivo ou None por ordem; nada fica reservado.
+        """
+        account = self.account(user_id)
+        reasons, applied = [], []
+
+        def reserve(symbol, side, quantity):
+            entry = account.entry(symbol)
+            index = BIDS if side == 'buy' else ASKS
+            entry[index] += quantity
+            applied.append((entry, index, quantity))
+
+        with account.lock:
+            try:
+                for symbol, side, quantity in released:
+                    reserve(symbol, side, -float(quantity))
+                for symbol, side, quantity, price in orders:
+                    reason = self._reason(account, symbol, side, float(quantity), float(price))
+                    if reason is None:
+                        reserve(symbol, side, float(quantity))
+                    reasons.append(reason)
+            finally:
+                for entry, index, quantity in applied:
+                    entry[index] -= quantity
+        return reasons
+
+    def snapshot(self, user_id):
+        account = self.account(user_id)
+        with account.lock:
+            exposure = {
+                symbol: self._exposure(symbol, entry, entry[BIDS], entry[ASKS])
+                for symbol, entry in sorted(account.symbols.items())
+            }
+        gross = sum(exposure.values())
+        return {
+            'exposure': exposure,
+            'gross_exposure': gross,
+            'margin_used': gross * account.margin_rate,
+            'max_position_size': account.max_position_size,
+            'max_margin': account.max_margin,
+        }
+
+    # Eventos (só atualizam utilizadores já carregados)
+
+    def _loaded(self, user_id):
+        return self._accounts.get(user_id)
+
+    def on_order_accepted(self, user_id, symbol, side, quantity):
+        account = self._loaded(user_id)
+        if account is not None:
+            with account.lock:
+                account.entry(symbol)[BIDS if side == 'buy' else ASKS] += float(quantity)
+
+    def on_order_released(self, user_id, symbol, side, quantity):
+        self.on_order_accepted(user_id, symbol, side, -float(quantity))
+
+    def on_fills(self, fills):
+        for fill in fills:
+            quantity, price = float(fill.quantity), float(fill.price)
+            self.marks[fill.symbol] = price
+            for user_id, side in ((fill.taker_user_id, fill.taker_side), (fill.maker_user_id, None)):
+                account = self._loaded(user_id)
+                if account is None:
+                    continue
+                if side is None:
+                    side = 'sell' if fill.taker_side == 'buy' else 'buy'
+                with account.lock:
+                    entry = account.entry(fill.symbol, price)
+                    entry[BIDS if side == 'buy' else ASKS] -= quantity
+
+    def on_position(self, position, deleted=False):
+        account = self._loaded(position.user_id)
+        if account is None:
+            return
+        with account.lock:
+            previous = account.positions.pop(position.pk, None)
+            if previous is not None:
+                account.entry(previous[0])[NET] -= previous[1]
+            if not deleted and position.is_open:
+                quantity = float(position.quantity)
+                account.positions[position.pk] = (position.asset, quantity)
+                account.entry(position.asset, float(position.open_price))[NET] += quantity
+
+    def update_marks(self, prices):
+        for symbol, price in prices.items():
+            self.marks[symbol] = float(price)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_risk_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RiskEngine(settings.RISK_RESYNC_INTERVAL)
+    return _engine
+
+
+def _reset_engine(setting, **kwargs):
+    global _engine
+    if setting.startswith('RISK_'):
+        _engine = None
+
+
+setting_changed.connect(_reset_engine)
@@ -1,12 +1,46 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Position, Order
 
-class PositionSerializer(serializers.ModelSerializer):
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    Aceita `fields` para devolver só um subconjunto das colunas.
+    """
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class PositionSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Position
         fields = '__all__'
+        # O PnL realizado é calculado pelo livro de execuções.
+        read_only_fields = ('user', 'realized_pnl')
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Order
         fields = '__all__'
+        # Estado e quantidade executada são geridos pelo motor de matching.
+        read_only_fields = ('user', 'status', 'filled_quantity')
+
+class OrderBatchSerializer(serializers.Serializer):
+    """
+    Pedido de `orders/batch/`: ordens a criar, ids de ordens a cancelar antes
+    e se uma ordem recusada recusa o lote inteiro.
+    """
+    orders = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    cancel = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    atomic = serializers.BooleanField(default=True)
+
+    def validate_orders(self, value):
+        if len(value) > settings.ORDER_BATCH_MAX_SIZE:
+            raise serializers.ValidationError(f'No máximo {settings.ORDER_BATCH_MAX_SIZE} ordens por lote.')
+        return value
+
+    def validate(self, attrs):
+        if not attrs['orders'] and not attrs['cancel']:
+            raise serializers.ValidationError('Indique ordens a criar ou a cancelar.')
+        return attrs
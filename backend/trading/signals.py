@@ -0,0 +1,42 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from trading_platform.db_routing import mark_written
+from trading_platform.fragment_cache import bump, user_scope
+from .candles import record_trades
+from .models import Portfolio, Position, RiskSettings, Trade
+from .risk import get_risk_engine
+
+
+@receiver(post_save, sender=Trade)
+def update_candles(sender, instance, created, **kwargs):
+    # O motor grava as duas pontas com bulk_create (sem post_save) e regista as velas ele
+    # próprio: aqui só chegam negociações avulsas, cada uma a sua execução.
+    if created:
+        record_trades([(instance.symbol, instance.timestamp, instance.price, instance.quantity)])
+
+
+@receiver(post_save, sender=Position)
+@receiver(post_delete, sender=Position)
+@receiver(post_save, sender=Portfolio)
+@receiver(post_delete, sender=Portfolio)
+def invalidate_user_panels(sender, instance, **kwargs):
+    bump(user_scope(instance.user_id))
+    # Um painel lido de uma réplica atrasada ficaria em cache com a versão nova.
+    mark_written(instance.user_id)
+
+
+@receiver(post_save, sender=Position)
+def update_risk_on_position_save(sender, instance, **kwargs):
+    get_risk_engine().on_position(instance)
+
+
+@receiver(post_delete, sender=Position)
+def update_risk_on_position_delete(sender, instance, **kwargs):
+    get_risk_engine().on_position(instance, deleted=True)
+
+
+@receiver(post_save, sender=RiskSettings)
+@receiver(post_delete, sender=RiskSettings)
+def reload_risk_limits(sender, instance, **kwargs):
+    get_risk_engine().invalidate(instance.user_id)
@@ -0,0 +1,39 @@
+"""
+Publicação de cotações para os consumidores WebSocket de mercado.
+
+Cada símbolo tem o seu grupo no channel layer; a conflação por cliente é
+feita no `MarketDataConsumer`.
+"""
+import re
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+_INVALID_GROUP_CHARS = re.compile(r'[^A-Za-z0-9._-]')
+
+
+def group_name(symbol):
+    return 'market.' + _INVALID_GROUP_CHARS.sub('_', symbol)
+
+
+def tick_payload(symbol, price, volume, timestamp):
+    return {
+        'symbol': symbol,
+        'price': str(price),
+        'volume': str(volume),
+        'ts': timestamp.isoformat() if timestamp else None,
+    }
+
+
+async def apublish_ticks(ticks):
+    layer = get_channel_layer()
+    for tick in ticks:
+        await layer.group_send(group_name(tick.symbol), {
+            'type': 'market.tick',
+            'tick': tick_payload(tick.symbol, tick.price, tick.volume, tick.timestamp),
+        })
+
+
+def publish_ticks(ticks):
+    """Envia um tick por símbolo para o respetivo grupo (chamar após o flush)."""
+    async_to_sync(apublish_ticks)(list(ticks))
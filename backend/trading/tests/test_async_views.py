@@ -0,0 +1,86 @@
+import importlib
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.urls import clear_url_caches
+
+import automation.urls
+import chat.urls
+import trading.urls
+import trading_platform.urls
+from automation.models import Automation
+from trading.models import MarketTicker, Position, Trade
+from trading.tests.test_dashboard import _assert_all_panels, _seed
+from users.models import User
+
+# A raiz por último: os seus `include` guardam os padrões já resolvidos das apps.
+URLCONFS = (trading.urls, chat.urls, automation.urls, trading_platform.urls)
+
+PANELS = [
+    '/api/trading/positions/htmx/', '/api/trading/portfolio/htmx/', '/api/trading/recent-trades/htmx/',
+    '/api/trading/market-ticker/htmx/', '/api/trading/performance-chart/htmx/', '/api/automation/panel/htmx/',
+    '/api/chat/panel/htmx/',
+]
+
+
+def _use_async_views(settings, enabled):
+    settings.ASYNC_HTMX_VIEWS = enabled
+    for module in URLCONFS:
+        importlib.reload(module)
+    clear_url_caches()
+
+
+@pytest.fixture
+def async_views(settings):
+    settings.CHAT_HISTORY_SYNC_INTERVAL = 0
+    _use_async_views(settings, True)
+    yield
+    _use_async_views(settings, False)
+
+
+@pytest.mark.django_db
+def test_async_panels_match_sync_panels(client, async_client, settings):
+    """
+    As views assíncronas devolvem o mesmo HTML que as síncronas, e as suas consultas contam no Server-Timing.
+    """
+    settings.CHAT_HISTORY_SYNC_INTERVAL = 0
+    user = _seed()
+    MarketTicker.objects.create(symbol='BTC', price=110, volume_24h=1)
+    Trade.objects.create(user=user, symbol='BTC', quantity=1, price=110, side='buy')
+    client.force_login(user)
+    async_client.force_login(user)
+    sync = {path: client.get(path).content for path in PANELS}
+    cache.clear()
+    try:
+        _use_async_views(settings, True)
+        for path in PANELS:
+            response = async_to_sync(async_client.get)(path)
+            assert response.content == sync[path], path
+            assert 'db;dur=' in response['Server-Timing'] and 'desc="0 queries"' not in response['Server-Timing']
+        _assert_all_panels(async_to_sync(async_client.get)('/api/trading/dashboard/panels/htmx/'))
+    finally:
+        _use_async_views(settings, False)
+
+
+@pytest.mark.django_db
+def test_async_writes(async_client, async_views):
+    user = _seed()
+    MarketTicker.objects.create(symbol='BTC', price=110, volume_24h=1)
+    async_client.force_login(user)
+    position = Position.objects.get(user=user)
+    automation = Automation.objects.get(user=user)
+
+    response = async_to_sync(async_client.post)(f'/api/trading/positions/{position.pk}/close/')
+    assert response.status_code == 200 and 'BTC' not in response.content.decode()
+    position.refresh_from_db()
+    assert not position.is_open and position.close_price == 110
+    # Posição de outro utilizador: 404, como na view síncrona.
+    other = User.objects.create_user(username='other', password='x')
+    other = Position.objects.create(user=other, asset='ETH', quantity=1, open_price=10)
+    assert async_to_sync(async_client.post)(f'/api/trading/positions/{other.pk}/close/').status_code == 404
+
+    response = async_to_sync(async_client.post)(f'/api/automation/toggle/{automation.pk}/')
+    assert response.status_code == 200
+    automation.refresh_from_db()
+    assert automation.status == 'inactive'
@@ -0,0 +1,74 @@
+import io
+
+import pytest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from django.core.management import call_command
+from trading.candles import get_candles, record_trades
+from trading.matching import get_engine
+from trading.models import Candle, Order, Trade
+from users.models import User
+
+T0 = datetime(2025, 6, 1, 10, 0, 30, tzinfo=timezone.utc)
+
+
+@pytest.mark.django_db
+def test_trades_are_merged_incrementally_into_buckets():
+    """
+    Lotes sucessivos atualizam as velas existentes sem reler as negociações.
+    """
+    record_trades([('BTC', T0, 100, 1), ('BTC', T0 + timedelta(seconds=10), 105, 2)])
+    record_trades([('BTC', T0 + timedelta(seconds=20), 95, 1), ('BTC', T0 + timedelta(minutes=1), 99, 1)])
+
+    first, second = get_candles('BTC', '1m')
+    assert (first.open, first.high, first.low, first.close) == (100, 105, 95, 95)
+    assert (first.volume, first.trade_count) == (Decimal('4'), 3)
+    assert second.bucket_start == datetime(2025, 6, 1, 10, 1, tzinfo=timezone.utc)
+    (hour,) = get_candles('BTC', '1h')
+    assert (hour.open, hour.high, hour.low, hour.close, hour.trade_count) == (100, 105, 95, 99, 4)
+    assert Candle.objects.filter(interval='1d').count() == 1
+
+
+@pytest.mark.django_db
+def test_standalone_trades_update_candles_and_range_query():
+    """
+    Cada negociação avulsa é uma execução, seja qual for o lado.
+    """
+    user = User.objects.create_user(username='trader', password='x')
+    Trade.objects.create(user=user, symbol='ETH', quantity=1, price=10, side='buy', timestamp=T0)
+    Trade.objects.create(user=user, symbol='ETH', quantity=1, price=11, side='sell', timestamp=T0)
+    Trade.objects.create(user=user, symbol='ETH', quantity=1, price=12, side='buy', timestamp=T0 + timedelta(minutes=5))
+
+    candles = get_candles('ETH', '5m', start=T0 - timedelta(minutes=1), end=T0 + timedelta(hours=1))
+    assert [(c.close, c.trade_count) for c in candles] == [(11, 2), (12, 1)]
+    assert [c.close for c in get_candles('ETH', '5m', limit=1)] == [12]
+
+
+@pytest.mark.django_db
+def test_performance_chart_renders_candle_closes(client):
+    user = User.objects.create_user(username='viewer', password='x')
+    record_trades([('BTC', T0, 100, 1), ('BTC', T0 + timedelta(hours=1), 110, 1)])
+    client.force_login(user)
+    response = client.get('/api/trading/performance-chart/htmx/?symbol=BTC')
+    assert response.status_code == 200
+    assert b'points="0.0,90.0 300.0,10.0"' in response.content
+
+
+@pytest.mark.django_db
+def test_rebuild_counts_engine_executions_once_and_standalone_sells():
+    """
+    As duas pontas de uma execução do motor contam uma vez (pelo livro de execuções); uma venda avulsa conta.
+    """
+    get_engine().reset()
+    buyer = User.objects.create_user(username='buyer', password='x')
+    seller = User.objects.create_user(username='seller', password='x')
+    get_engine().submit([Order.objects.create(user=seller, asset='ETH', order_type='sell', quantity=2, price=10)])
+    get_engine().submit([Order.objects.create(user=buyer, asset='ETH', order_type='buy', quantity=2, price=10)])
+    Trade.objects.create(user=seller, symbol='ETH', quantity=1, price=11, side='sell')
+    before = list(Candle.objects.filter(interval='1d').values_list('volume', 'trade_count', 'close'))
+
+    call_command('rebuild_candles', stdout=io.StringIO())
+    get_engine().reset()
+    assert Trade.objects.count() == 3
+    assert before == [(Decimal('3'), 2, Decimal('11'))]
+    assert list(Candle.objects.filter(interval='1d').values_list('volume', 'trade_count', 'close')) == before
@@ -0,0 +1,61 @@
+import pytest
+from automation.models import Automation
+from chat.models import Message
+from trading import views
+from trading.models import Position
+from trading.views import DASHBOARD_PANELS
+from users.models import User
+
+
+def _seed():
+    user = User.objects.create_user(username='dash', password='x')
+    Position.objects.create(user=user, asset='BTC', quantity=1, open_price=100)
+    Automation.objects.create(user=user, name='DCA semanal', status='active')
+    Message.objects.create(user=user, text='olá a todos')
+    return user
+
+
+def _assert_all_panels(response):
+    assert response.status_code == 200
+    body = response.content.decode()
+    for container, _, _ in DASHBOARD_PANELS:
+        assert f'<div id="{container}" hx-swap-oob="innerHTML">' in body
+    assert 'BTC' in body and 'DCA semanal' in body and 'olá a todos' in body
+    names = [name for _, name, _ in DASHBOARD_PANELS] + ['total']
+    # O middleware de instrumentação acrescenta as suas entradas depois das da view.
+    timing = [part.split(';')[0] for part in response['Server-Timing'].split(', ')]
+    assert timing[:len(names)] == names
+
+
+@pytest.mark.django_db
+def test_dashboard_panels_render_in_one_request(client, settings):
+    """
+    Todos os painéis chegam num único pedido, com o tempo de cada um no Server-Timing.
+    """
+    settings.DASHBOARD_PANEL_WORKERS = 1
+    settings.CHAT_HISTORY_SYNC_INTERVAL = 0
+    client.force_login(_seed())
+    _assert_all_panels(client.get('/api/trading/dashboard/panels/htmx/'))
+
+
+@pytest.mark.django_db
+def test_dashboard_panels_stay_sequential_without_a_pool(client, settings, monkeypatch):
+    """
+    Sem pool nem PgBouncer, uma ligação por painel custaria mais do que o paralelismo poupa.
+    """
+    settings.DASHBOARD_PANEL_WORKERS = 4
+    settings.DB_POOL_SIZE = 0
+    settings.DB_PGBOUNCER = False
+    settings.CHAT_HISTORY_SYNC_INTERVAL = 0
+    monkeypatch.setattr(views, '_get_panel_executor', lambda: pytest.fail('threads sem pool'))
+    client.force_login(_seed())
+    _assert_all_panels(client.get('/api/trading/dashboard/panels/htmx/'))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_dashboard_panels_render_concurrently(client, settings):
+    settings.DASHBOARD_PANEL_WORKERS = 4
+    settings.DB_PGBOUNCER = True
+    settings.CHAT_HISTORY_SYNC_INTERVAL = 0
+    client.force_login(_seed())
+    _assert_all_panels(client.get('/api/trading/dashboard/panels/htmx/'))
@@ -0,0 +1,56 @@
+import csv
+import io
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from trading.models import Trade
+from users.models import User
+
+
+@pytest.mark.django_db
+def test_trades_export_streams_user_rows_as_ndjson_and_csv():
+    """
+    A exportação devolve só as negociações do utilizador, com decimais exatos.
+    """
+    owner = User.objects.create_user(username='owner', password='x')
+    other = User.objects.create_user(username='other', password='x')
+    for i in range(3):
+        Trade.objects.create(user=owner, symbol='BTC', quantity='0.1', price=f'100.{i}', side='sell')
+    Trade.objects.create(user=other, symbol='ETH', quantity=1, price=1, side='sell')
+    client = APIClient()
+    client.force_authenticate(owner)
+
+    response = client.get('/api/trading/export/trades.ndjson')
+    assert response.streaming and response['Content-Type'] == 'application/x-ndjson'
+    rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+    assert [row['price'] for row in rows] == ['100.00000000', '100.10000000', '100.20000000']
+    assert {row['symbol'] for row in rows} == {'BTC'}
+
+    response = client.get('/api/trading/export/trades.csv')
+    table = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+    assert table[0] == ['id', 'symbol', 'side', 'quantity', 'price', 'timestamp']
+    assert len(table) == 4
+    assert client.get('/api/trading/export/users.csv').status_code == 404
+
+
+@pytest.mark.django_db
+def test_export_streams_asynchronously_under_asgi(async_client):
+    """
+    Sob ASGI a resposta tem um iterador assíncrono: os blocos são enviados à medida que são lidos.
+    """
+    owner = User.objects.create_user(username='owner', password='x')
+    for i in range(5):
+        Trade.objects.create(user=owner, symbol='BTC', quantity=1, price=100 + i, side='buy')
+    token = RefreshToken.for_user(owner).access_token
+
+    async def scenario():
+        response = await async_client.get('/api/trading/export/trades.ndjson', headers={'Authorization': f'Bearer {token}'})
+        assert response.streaming and response.is_async
+        return [block async for block in response.streaming_content]
+
+    blocks = async_to_sync(scenario)()
+    rows = [json.loads(line) for line in b''.join(blocks).splitlines()]
+    assert [row['price'] for row in rows] == [f'{100 + i}.00000000' for i in range(5)]
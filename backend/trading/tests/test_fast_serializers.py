@@ -0,0 +1,62 @@
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from trading.fast_serializers import compile_serializer
+from trading.models import Order, Position
+from trading.serializers import OrderSerializer
+from users.models import User
+
+
+@pytest.fixture
+def api():
+    user = User.objects.create_user(username='trader', password='x')
+    for i in range(5):
+        Position.objects.create(user=user, asset=f'A{i}', quantity=Decimal('1.5'), open_price=Decimal('100.123456789'))
+        Order.objects.create(user=user, asset=f'A{i}', order_type='sell', quantity=Decimal(i), price=Decimal('0.00000001'))
+    Position.objects.filter(asset='A0').update(
+        is_open=False, close_price=Decimal('99'), close_time=timezone.now(), realized_pnl=Decimal('-1.1'),
+    )
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', [
+    '/api/trading/positions/?page_size=3', '/api/trading/orders/', '/api/trading/orders/?fields=price,created_at',
+])
+def test_fast_list_matches_drf_serializer(api, settings, url):
+    """
+    O serializer compilado devolve exatamente o mesmo que o ModelSerializer, incluindo a ordem das chaves.
+    """
+    settings.API_FAST_SERIALIZATION = False
+    expected = api.get(url)
+    settings.API_FAST_SERIALIZATION = True
+    fast = api.get(url)
+    assert fast.status_code == expected.status_code == 200
+    assert fast.json() == expected.json()
+    assert [list(row) for row in fast.json()['results']] == [list(row) for row in expected.json()['results']]
+
+
+@pytest.mark.django_db
+def test_msgpack_by_content_negotiation(api):
+    msgpack = pytest.importorskip('msgpack')
+    response = api.get('/api/trading/orders/', HTTP_ACCEPT='application/msgpack')
+    assert response['Content-Type'] == 'application/msgpack'
+    assert msgpack.unpackb(response.content) == api.get('/api/trading/orders/').json()
+    assert api.get('/api/trading/orders/?format=msgpack')['Content-Type'] == 'application/msgpack'
+
+
+def test_uncompilable_serializer_falls_back():
+    class Annotated(OrderSerializer):
+        notional = serializers.SerializerMethodField()
+
+        def get_notional(self, order):
+            return order.quantity * order.price
+
+    assert compile_serializer(Annotated) is None
+    assert compile_serializer(OrderSerializer, {'price'}).keys == ['price']
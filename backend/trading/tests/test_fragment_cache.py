@@ -0,0 +1,48 @@
+import pytest
+from django.core.cache import cache
+from automation.models import Automation
+from trading.models import Position
+from trading_platform import fragment_cache
+from users.models import User
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    cache.clear()
+    fragment_cache.reset_stats()
+
+
+@pytest.mark.django_db
+def test_positions_panel_is_served_from_cache_until_a_position_changes(client, django_assert_num_queries):
+    """
+    O painel só volta à base de dados depois de um sinal de alteração da posição.
+    """
+    user = User.objects.create_user(username='cached', password='x')
+    position = Position.objects.create(user=user, asset='BTC', quantity=1, open_price=100)
+    client.force_login(user)
+    url = '/api/trading/positions/htmx/'
+
+    first = client.get(url).content
+    with django_assert_num_queries(2):  # sessão e utilizador, nenhuma consulta de posições
+        assert client.get(url).content == first
+
+    position.quantity = 3
+    position.save()
+    assert b'Quantidade: 3' in client.get(url).content
+    stats = fragment_cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 2)
+    assert stats['render_ms_saved'] > 0
+
+
+@pytest.mark.django_db
+def test_toggle_automation_invalidates_only_that_user(client):
+    owner = User.objects.create_user(username='owner', password='x')
+    other = User.objects.create_user(username='other', password='x')
+    automation = Automation.objects.create(user=owner, name='Grid', status='inactive')
+    Automation.objects.create(user=other, name='DCA', status='active')
+    other_version = fragment_cache.get_versions([fragment_cache.user_scope(other.pk)])
+
+    client.force_login(owner)
+    response = client.post(f'/api/automation/toggle/{automation.pk}/')
+    assert b'Desativar' in response.content
+    assert fragment_cache.get_versions([fragment_cache.user_scope(other.pk)]) == other_version
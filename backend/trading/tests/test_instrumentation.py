@@ -0,0 +1,59 @@
+import pytest
+from trading.models import Position
+from trading_platform.instrumentation import (
+    DB_QUERIES, REQUEST_DURATION, TEMPLATE_DURATION, QueryBudgetExceeded, assert_max_queries, reset_metrics,
+)
+from users.models import User
+
+
+@pytest.fixture
+def trader(client):
+    reset_metrics()
+    user = User.objects.create_user(username='trader', password='x')
+    for i in range(5):
+        Position.objects.create(user=user, asset=f'SYM{i}', quantity=1, open_price=10)
+    client.force_login(user)
+    return user
+
+
+@pytest.mark.django_db
+def test_server_timing_and_metrics_endpoint(client, trader, settings):
+    """
+    Cada pedido traz SQL, templates e view no Server-Timing e entra nos histogramas por nome de URL.
+    """
+    response = client.get('/api/trading/positions/htmx/')
+    timing = [part.split(';')[0] for part in response['Server-Timing'].split(', ')]
+    assert timing == ['db', 'tpl', 'view', 'app']
+    assert 'queries"' in response['Server-Timing']
+    # O backend de templates mede a renderização sem substituir Template.render.
+    assert TEMPLATE_DURATION.series['positions-list-htmx'][1] > 0
+
+    body = client.get('/metrics').content.decode()
+    assert 'http_request_duration_seconds_count{view="positions-list-htmx"} 1' in body
+    assert 'http_request_db_queries_bucket{view="positions-list-htmx",le="+Inf"} 1' in body
+    assert 'fragment_cache_misses ' in body and 'chat_fanout_' in body
+
+    settings.METRICS_ALLOWED_IPS = ['10.0.0.0/8']
+    assert client.get('/metrics').status_code == 403
+
+
+@pytest.mark.django_db
+def test_unsampled_requests_only_count_duration(client, trader, settings):
+    settings.INSTRUMENTATION_SAMPLE_RATE = 0
+    response = client.get('/api/trading/positions/htmx/')
+    assert not response.has_header('Server-Timing')
+    assert 'positions-list-htmx' in REQUEST_DURATION.series
+    assert 'positions-list-htmx' not in DB_QUERIES.series
+
+
+@pytest.mark.django_db
+def test_query_budget(client, trader):
+    """
+    O painel de posições não faz consultas por posição; acima do orçamento a falha lista as consultas.
+    """
+    with assert_max_queries(4):
+        client.get('/api/trading/positions/htmx/')
+    with pytest.raises(QueryBudgetExceeded, match='4 consultas, orçamento de 2'):
+        with assert_max_queries(2):
+            for position in Position.objects.filter(user=trader)[:3]:
+                Position.objects.get(pk=position.pk)
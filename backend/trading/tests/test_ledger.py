@@ -0,0 +1,128 @@
+import pytest
+from decimal import Decimal
+from django.test import Client
+from rest_framework.test import APIClient
+from trading.ledger import LotBook, close_position, load_states, replay
+from trading.matching import MatchingEngine
+from trading.models import MarketTicker, Order, OrderFill, Position, PositionSnapshot
+from users.models import User
+
+
+def _cross(engine, buyer, seller, quantity, price, asset='BTC'):
+    maker = Order.objects.create(user=seller, asset=asset, order_type='sell', quantity=quantity, price=price)
+    taker = Order.objects.create(user=buyer, asset=asset, order_type='buy', quantity=quantity, price=price)
+    engine.submit([maker])
+    engine.submit([taker])
+
+
+def test_fifo_netting_realizes_pnl_per_lot():
+    """
+    As vendas casam primeiro com o lote mais antigo; passar por zero fecha e abre do lado oposto.
+    """
+    book = LotBook()
+    book.apply('buy', Decimal('2'), Decimal('100'))
+    book.apply('buy', Decimal('2'), Decimal('110'))
+    assert book.average_price == Decimal('105')
+    assert book.apply('sell', Decimal('3'), Decimal('120')) == (False, False)
+    assert book.realized == Decimal('50')  # 2 * 20 + 1 * 10
+    assert book.apply('sell', Decimal('2'), Decimal('100')) == (True, True)
+    assert book.net == Decimal('-1')
+    assert book.realized == Decimal('40')
+
+
+@pytest.mark.django_db
+def test_matching_fills_feed_ledger_and_positions():
+    """
+    Cada execução grava uma linha por ordem; as posições de ambas as pontas derivam do livro.
+    """
+    engine = MatchingEngine()
+    alice = User.objects.create_user(username='alice', password='x')
+    bob = User.objects.create_user(username='bob', password='x')
+    _cross(engine, alice, bob, '3', '100')
+    _cross(engine, bob, alice, '5', '110')
+
+    assert OrderFill.objects.count() == 4
+    assert all(fill.trade.user_id == fill.user_id for fill in OrderFill.objects.select_related('trade'))
+    closed = Position.objects.get(user=alice, is_open=False)
+    assert (closed.quantity, closed.close_price, closed.realized_pnl) == (3, 110, 30)
+    short = Position.objects.get(user=alice, is_open=True)
+    assert (short.quantity, short.open_price) == (-2, 110)
+    assert Position.objects.get(user=bob, is_open=False).realized_pnl == -30
+    assert Position.objects.get(user=bob, is_open=True).quantity == 2
+
+
+@pytest.mark.django_db
+def test_snapshot_plus_tail_matches_full_replay(settings):
+    """
+    Reconstruir a partir do snapshot e das execuções seguintes dá o mesmo estado que reaplicar tudo.
+    """
+    settings.LEDGER_SNAPSHOT_INTERVAL = 3
+    engine = MatchingEngine()
+    alice = User.objects.create_user(username='alice', password='x')
+    bob = User.objects.create_user(username='bob', password='x')
+    for i, (buyer, seller) in enumerate([(alice, bob)] * 4 + [(bob, alice)] * 3):
+        _cross(engine, buyer, seller, '1', str(100 + i))
+
+    snapshot = PositionSnapshot.objects.get(user=alice, symbol='BTC')
+    assert 0 < snapshot.last_fill_id < OrderFill.objects.filter(user=alice).latest('id').pk
+    state = load_states([(alice.pk, 'BTC')])[(alice.pk, 'BTC')]
+    full = replay(alice.pk, 'BTC')
+    assert state.pending < full.pending
+    assert (list(state.lots), state.realized, state.position_id) == (list(full.lots), full.realized, full.position_id)
+    position = Position.objects.get(pk=state.position_id)
+    assert (position.quantity, position.realized_pnl) == (state.net, state.realized)
+
+
+@pytest.mark.django_db
+def test_close_position_records_close_price_and_pnl():
+    """
+    Fechar pela interface grava o preço de fecho e o PnL realizado ao último preço conhecido.
+    """
+    engine = MatchingEngine()
+    alice = User.objects.create_user(username='alice', password='x')
+    bob = User.objects.create_user(username='bob', password='x')
+    _cross(engine, alice, bob, '2', '100')
+    MarketTicker.objects.create(symbol='BTC', price=125, volume_24h=0)
+    manual = Position.objects.create(user=alice, asset='ETH', quantity=4, open_price=10)
+    client = Client()
+    client.force_login(alice)
+
+    position = Position.objects.get(user=alice, asset='BTC')
+    assert client.post(f'/api/trading/positions/{position.pk}/close/').status_code == 200
+    position.refresh_from_db()
+    assert (position.is_open, position.close_price, position.realized_pnl) == (False, 125, 50)
+    assert OrderFill.objects.filter(position=position).count() == 2
+
+    assert client.post(f'/api/trading/positions/{manual.pk}/close/').status_code == 200
+    manual.refresh_from_db()
+    assert (manual.is_open, manual.close_price, manual.realized_pnl) == (False, 10, 0)
+    # Um segundo fecho com a instância antiga não cria outra ordem de fecho.
+    stale = Position.objects.get(user=alice, asset='BTC')
+    stale.is_open = True
+    close_position(stale)
+    assert OrderFill.objects.filter(user=alice, symbol='BTC').count() == 2
+
+
+@pytest.mark.django_db
+def test_ledger_rows_are_deleted_only_with_their_user():
+    """
+    Ordens e posições com execuções não se apagam pela API (409); apagar o utilizador leva o livro com ele.
+    """
+    engine = MatchingEngine()
+    alice = User.objects.create_user(username='alice', password='x')
+    bob = User.objects.create_user(username='bob', password='x')
+    _cross(engine, alice, bob, '1', '100')
+    manual = Position.objects.create(user=alice, asset='ETH', quantity=1, open_price=10)
+    client = APIClient()
+    client.force_authenticate(alice)
+
+    order = Order.objects.get(user=alice)
+    position = Position.objects.get(user=alice, asset='BTC')
+    assert client.delete(f'/api/trading/orders/{order.pk}/').status_code == 409
+    assert client.delete(f'/api/trading/positions/{position.pk}/').status_code == 409
+    assert client.delete(f'/api/trading/positions/{manual.pk}/').status_code == 204
+
+    alice.delete()
+    assert not OrderFill.objects.filter(user_id=alice.pk).exists()
+    assert not Order.objects.filter(user_id=alice.pk).exists()
+    assert OrderFill.objects.filter(user=bob).count() == 1
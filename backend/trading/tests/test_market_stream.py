@@ -0,0 +1,71 @@
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from market_data.feeds import Tick
+from trading.consumers import MarketDataConsumer
+from trading.models import MarketTicker
+from trading.streaming import apublish_ticks
+
+TS = datetime(2025, 6, 1, 10, 0, tzinfo=timezone.utc)
+
+
+@pytest.mark.django_db
+def test_ticks_are_conflated_per_symbol_into_batched_frames(settings):
+    """
+    Uma rajada de ticks chega como um frame com o último preço de cada símbolo subscrito.
+    """
+    settings.MARKET_STREAM_MAX_RATE = 5
+    MarketTicker.objects.create(symbol='BTC', price=99, volume_24h=1)
+
+    async def scenario():
+        communicator = WebsocketCommunicator(MarketDataConsumer.as_asgi(), '/ws/market/')
+        connected, _ = await communicator.connect()
+        assert connected
+        await communicator.send_json_to({'action': 'subscribe', 'symbols': ['BTC', 'ETH']})
+        snapshot = await communicator.receive_json_from()
+        await apublish_ticks([Tick('BTC', Decimal(p), Decimal(1), TS) for p in ('100', '101', '102')])
+        await apublish_ticks([Tick('ETH', Decimal('20'), Decimal(1), TS), Tick('SOL', Decimal('5'), Decimal(1), TS)])
+        frame = await communicator.receive_json_from(timeout=2)
+        assert await communicator.receive_nothing(timeout=0.3)
+        await communicator.disconnect()
+        return snapshot, frame
+
+    snapshot, frame = async_to_sync(scenario)()
+    assert [t['price'] for t in snapshot['ticks']] == ['99.00000000']
+    assert {t['symbol']: t['price'] for t in frame['ticks']} == {'BTC': '102', 'ETH': '20'}
+
+
+@pytest.mark.django_db
+def test_invalid_subscriptions_are_rejected(settings):
+    """
+    Mensagens mal formadas recebem um erro e não alteram a subscrição; o número de símbolos é limitado.
+    """
+    settings.MARKET_STREAM_MAX_SYMBOLS = 2
+    MarketTicker.objects.create(symbol='BTC', price=99, volume_24h=1)
+
+    async def scenario():
+        communicator = WebsocketCommunicator(MarketDataConsumer.as_asgi(), '/ws/market/')
+        await communicator.connect()
+        errors = []
+        for message in (
+            ['BTC'],
+            {'action': 'subscribe', 'symbols': 'BTC'},
+            {'action': 'subscribe', 'symbols': [1]},
+            {'action': 'subscribe', 'symbols': ['BTC'], 'max_rate': 'NaN'},
+            {'action': 'subscribe', 'symbols': ['BTC', 'ETH', 'SOL']},
+        ):
+            await communicator.send_json_to(message)
+            errors.append((await communicator.receive_json_from())['type'])
+        await communicator.send_to(text_data='{"action": "subscribe", "symbols": ["BTC"], "max_rate": NaN}')
+        errors.append((await communicator.receive_json_from())['type'])
+        await communicator.send_json_to({'action': 'subscribe', 'symbols': ['BTC']})
+        frame = await communicator.receive_json_from()
+        await communicator.disconnect()
+        return errors, frame
+
+    errors, frame = async_to_sync(scenario)()
+    assert errors == ['error'] * 6
+    assert [t['symbol'] for t in frame['ticks']] == ['BTC']
@@ -0,0 +1,84 @@
+import pytest
+from decimal import Decimal
+from trading.matching import Book, BookOrder, MatchingEngine
+from trading.models import Order, Trade
+from users.models import User
+
+
+def _entry(order_id, side, price, quantity, user_id=1):
+    return BookOrder(order_id, user_id, side, Decimal(price), Decimal(quantity))
+
+
+def test_price_time_priority():
+    """
+    O melhor preço é executado primeiro e, no mesmo nível, a ordem mais antiga.
+    """
+    book = Book('BTCUSD')
+    book.match(_entry(1, 'sell', '101', '1'))
+    book.match(_entry(2, 'sell', '100', '1'))
+    book.match(_entry(3, 'sell', '100', '1'))
+    fills, _ = book.match(_entry(4, 'buy', '101', '2.5'))
+    assert [(f.maker_order_id, f.price, f.quantity) for f in fills] == [
+        (2, Decimal('100'), Decimal('1')),
+        (3, Decimal('100'), Decimal('1')),
+        (1, Decimal('101'), Decimal('0.5')),
+    ]
+    assert book.depth() == {'bids': [], 'asks': [(Decimal('101'), Decimal('0.5'))]}
+
+
+def test_non_crossing_order_rests_and_cancel_removes_level():
+    book = Book('BTCUSD')
+    fills, _ = book.match(_entry(1, 'buy', '99', '1'))
+    book.match(_entry(2, 'sell', '100', '1'))
+    assert fills == []
+    assert book.depth() == {
+        'bids': [(Decimal('99'), Decimal('1'))],
+        'asks': [(Decimal('100'), Decimal('1'))],
+    }
+    book.cancel(1)
+    assert book.depth()['bids'] == []
+
+
+@pytest.mark.django_db
+def test_submit_persists_trades_and_order_status():
+    buyer = User.objects.create_user(username='buyer', password='x')
+    seller = User.objects.create_user(username='seller', password='x')
+    engine = MatchingEngine()
+    ask = Order.objects.create(user=seller, asset='ETHUSD', order_type='sell', quantity=2, price=50)
+    engine.submit([ask])
+    bid = Order.objects.create(user=buyer, asset='ETHUSD', order_type='buy', quantity=3, price=51)
+    fills = engine.submit([bid])
+
+    assert len(fills) == 1 and fills[0].price == Decimal('50')
+    ask.refresh_from_db()
+    bid.refresh_from_db()
+    assert (ask.status, ask.filled_quantity) == ('filled', Decimal('2'))
+    assert (bid.status, bid.filled_quantity) == ('partial', Decimal('2'))
+    assert set(Trade.objects.values_list('user__username', 'side')) == {('buyer', 'buy'), ('seller', 'sell')}
+    assert engine.depth('ETHUSD')['bids'] == [(Decimal('51'), Decimal('1'))]
+
+
+@pytest.mark.django_db
+def test_engines_in_different_processes_never_match_the_same_order(django_capture_on_commit_callbacks):
+    """
+    Dois motores (dois workers) sobre a mesma base de dados: o segundo vê a ordem que o primeiro
+    pôs no livro e, depois de executada, o primeiro já não a volta a casar.
+    """
+    buyer = User.objects.create_user(username='buyer', password='x')
+    seller = User.objects.create_user(username='seller', password='x')
+    worker, automations = MatchingEngine(), MatchingEngine()
+    with django_capture_on_commit_callbacks(execute=True):
+        ask = Order.objects.create(user=seller, asset='ETHUSD', order_type='sell', quantity=1, price=50)
+        worker.submit([ask])
+        assert worker.depth('ETHUSD')['asks'] == [(Decimal('50'), Decimal('1'))]
+    with django_capture_on_commit_callbacks(execute=True):
+        first = Order.objects.create(user=buyer, asset='ETHUSD', order_type='buy', quantity=1, price=50)
+        assert len(automations.submit([first])) == 1
+    with django_capture_on_commit_callbacks(execute=True):
+        second = Order.objects.create(user=buyer, asset='ETHUSD', order_type='buy', quantity=1, price=50)
+        assert worker.submit([second]) == []
+
+    assert Trade.objects.count() == 2
+    second.refresh_from_db()
+    assert second.status == 'pending'
+    assert worker.depth('ETHUSD') == automations.depth('ETHUSD') == {'bids': [(Decimal('50'), Decimal('1'))], 'asks': []}
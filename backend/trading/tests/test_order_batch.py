@@ -0,0 +1,146 @@
+import pytest
+from rest_framework.test import APIClient
+
+from trading.matching import get_engine
+from trading.models import Order, RiskSettings
+from trading.risk import get_risk_engine
+from trading_platform.instrumentation import assert_max_queries
+from users.models import User
+
+
+@pytest.fixture
+def trader():
+    get_engine().reset()
+    get_risk_engine().reset()
+    yield User.objects.create_user(username='trader', password='x')
+    # Os ids voltam a ser usados depois do rollback: não deixar livros nem limites para os testes seguintes.
+    get_engine().reset()
+    get_risk_engine().reset()
+
+
+def _client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def _ladder(side, prices, quantity='1', asset='BTC'):
+    return [{'asset': asset, 'order_type': side, 'quantity': quantity, 'price': price} for price in prices]
+
+
+@pytest.mark.django_db
+def test_batch_inserts_once_and_matches_against_the_book(trader):
+    """
+    O lote é gravado com um só INSERT e entregue ao motor de matching; cada resultado segue a ordem do pedido.
+    """
+    maker = User.objects.create_user(username='maker', password='x')
+    resting = Order.objects.create(user=maker, asset='BTC', order_type='sell', quantity=1, price=101)
+    get_engine().submit([resting])
+
+    with assert_max_queries(50) as executed:
+        response = _client(trader).post(
+            '/api/trading/orders/batch/', {'orders': _ladder('buy', ['99', '100', '102'])}, format='json',
+        )
+    assert response.status_code == 201
+    assert [result['status'] for result in response.data['results']] == ['created'] * 3
+    orders = [result['order'] for result in response.data['results']]
+    assert [order['price'] for order in orders] == ['99.00000000', '100.00000000', '102.00000000']
+    assert [order['status'] for order in orders] == ['pending', 'pending', 'filled']
+    assert sum(sql.startswith('INSERT INTO "trading_order"') for sql in executed) == 1
+    assert get_engine().depth('BTC')['bids'] == [(100, 1), (99, 1)]
+
+
+@pytest.mark.django_db
+def test_risk_is_checked_cumulatively_and_atomic_rejects_the_whole_batch(trader):
+    """
+    Cada ordem aceite conta para as seguintes: a terceira passa o limite. Atómico, nada é criado;
+    sem `atomic`, as duas primeiras são criadas e a resposta é 207.
+    """
+    RiskSettings.objects.create(user=trader, max_position_size=250)
+    client = _client(trader)
+    payload = {'orders': _ladder('buy', ['100', '100', '100']) + [{'asset': 'BTC', 'order_type': 'buy'}]}
+
+    response = client.post('/api/trading/orders/batch/', payload, format='json')
+    assert response.status_code == 400
+    assert [result['status'] for result in response.data['results']] == ['skipped', 'skipped', 'rejected', 'rejected']
+    assert 'risk' in response.data['results'][2]['errors']
+    assert 'quantity' in response.data['results'][3]['errors']
+    assert not Order.objects.filter(user=trader).exists()
+    # A verificação não deixa reservas para trás.
+    assert get_risk_engine().snapshot(trader.pk)['exposure'] == {'BTC': 0.0}
+
+    response = client.post('/api/trading/orders/batch/', {**payload, 'atomic': False}, format='json')
+    assert response.status_code == 207
+    assert [result['status'] for result in response.data['results']] == ['created', 'created', 'rejected', 'rejected']
+    assert Order.objects.filter(user=trader).count() == 2
+    assert get_risk_engine().snapshot(trader.pk)['exposure'] == {'BTC': 200.0}
+
+
+@pytest.mark.django_db
+def test_requote_cancels_the_previous_ladder_first(trader):
+    """
+    Recotar uma escada que ocupa todo o limite: as ordens canceladas deixam de contar para as novas.
+    """
+    RiskSettings.objects.create(user=trader, max_position_size=300)
+    client = _client(trader)
+    first = client.post('/api/trading/orders/batch/', {'orders': _ladder('buy', ['98', '99', '100'])}, format='json')
+    old_ids = [result['order']['id'] for result in first.data['results']]
+
+    assert client.post('/api/trading/orders/batch/', {'orders': _ladder('buy', ['97'])}, format='json').status_code == 400
+    response = client.post(
+        '/api/trading/orders/batch/', {'orders': _ladder('buy', ['95', '96', '97']), 'cancel': old_ids}, format='json',
+    )
+    assert response.status_code == 201
+    assert sorted(response.data['cancelled']) == sorted(old_ids)
+    assert set(Order.objects.filter(pk__in=old_ids).values_list('status', flat=True)) == {'cancelled'}
+    assert [price for price, _ in get_engine().depth('BTC')['bids']] == [97, 96, 95]
+
+
+@pytest.mark.django_db
+def test_delete_cancels_through_the_engine_and_orders_are_not_editable(trader):
+    """
+    DELETE cancela a ordem e tira-a do livro; uma ordem executada dá 409 e PUT/PATCH não existem.
+    """
+    client = _client(trader)
+    order_id = client.post('/api/trading/orders/batch/', {'orders': _ladder('buy', ['99'])}, format='json').data['results'][0]['order']['id']
+
+    assert client.patch(f'/api/trading/orders/{order_id}/', {'price': '1'}, format='json').status_code == 405
+    response = client.delete(f'/api/trading/orders/{order_id}/')
+    assert response.status_code == 200 and response.data['status'] == 'cancelled'
+    assert Order.objects.get(pk=order_id).status == 'cancelled'
+    assert get_engine().depth('BTC')['bids'] == []
+    assert get_risk_engine().snapshot(trader.pk)['exposure'].get('BTC', 0.0) == 0.0
+    assert client.delete(f'/api/trading/orders/{order_id}/').status_code == 409
+
+
+@pytest.mark.django_db
+def test_cancelling_an_order_filled_in_the_meantime_fails_per_id(trader):
+    """
+    Um cancelamento de uma ordem já executada falha (mesmo com a ordem lida antes da execução) e é
+    reportado em `cancel_errors`. Atómico, nem os outros cancelamentos nem as ordens novas ficam feitos.
+    """
+    client = _client(trader)
+    ids = [r['order']['id'] for r in client.post(
+        '/api/trading/orders/batch/', {'orders': _ladder('buy', ['99', '100'])}, format='json',
+    ).data['results']]
+    stale = Order.objects.get(pk=ids[1])
+    maker = User.objects.create_user(username='maker', password='x')
+    get_engine().submit([Order.objects.create(user=maker, asset='BTC', order_type='sell', quantity=1, price=100)])
+    assert not get_engine().cancel(stale)
+    assert stale.status == 'filled' and Order.objects.get(pk=ids[1]).status == 'filled'
+    exposure = get_risk_engine().snapshot(trader.pk)['exposure']
+
+    payload = {'orders': _ladder('buy', ['98']), 'cancel': ids + [ids[0] + 1000]}
+    response = client.post('/api/trading/orders/batch/', payload, format='json')
+    assert response.status_code == 400
+    assert set(response.data['cancel_errors']) == {str(ids[1]), str(ids[0] + 1000)} and response.data['cancelled'] == []
+    assert [result['status'] for result in response.data['results']] == ['skipped']
+    assert Order.objects.get(pk=ids[0]).status == 'pending'
+    assert get_engine().depth('BTC')['bids'] == [(99, 1)]
+    assert get_risk_engine().snapshot(trader.pk)['exposure'] == exposure
+
+    response = client.post('/api/trading/orders/batch/', {**payload, 'atomic': False}, format='json')
+    assert response.status_code == 207
+    assert response.data['cancelled'] == [ids[0]]
+    assert set(response.data['cancel_errors']) == {str(ids[1]), str(ids[0] + 1000)}
+    assert get_engine().depth('BTC')['bids'] == [(98, 1)]
@@ -12,3 +12,43 @@ def test_get_positions_unauthenticated():
     url = '/api/trading/positions/'
     response = client.get(url)
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+def test_positions_are_user_scoped_and_keyset_paginated():
+    """
+    A lista só inclui posições do utilizador e é percorrida por cursor, da mais recente para a mais antiga.
+    """
+    from trading.models import Position
+    from users.models import User
+    owner = User.objects.create_user(username='owner', password='x')
+    other = User.objects.create_user(username='other', password='x')
+    ids = [Position.objects.create(user=owner, asset=f'A{i}', quantity=1, open_price=1).id for i in range(5)]
+    Position.objects.create(user=other, asset='OTHER', quantity=1, open_price=1)
+    client = APIClient()
+    client.force_authenticate(owner)
+
+    seen, url = [], '/api/trading/positions/?page_size=2&fields=id,asset'
+    while url:
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        seen += response.data['results']
+        url = response.data['next']
+    assert [row['id'] for row in seen] == ids[::-1]
+    assert set(seen[0]) == {'id', 'asset'}
+    assert client.get(f'/api/trading/positions/{ids[0] + 5}/').status_code == status.HTTP_404_NOT_FOUND
+    assert client.get('/api/trading/positions/?cursor=lixo').status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_created_order_belongs_to_authenticated_user():
+    from users.models import User
+    owner = User.objects.create_user(username='owner', password='x')
+    other = User.objects.create_user(username='other', password='x')
+    client = APIClient()
+    client.force_authenticate(owner)
+    response = client.post('/api/trading/orders/', {
+        'user': other.id, 'asset': 'BTC', 'order_type': 'buy', 'quantity': '1', 'price': '100', 'status': 'filled',
+    })
+    assert response.status_code == status.HTTP_201_CREATED
+    assert (response.data['user'], response.data['status']) == (owner.id, 'pending')
@@ -0,0 +1,77 @@
+import pytest
+from django.core.cache import cache
+from django.db import connections
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from trading.models import MarketTicker, Position
+from users.models import User
+
+
+class Recorder:
+    def __init__(self):
+        self.sql = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.sql.append(sql)
+        return execute(sql, params, many, context)
+
+    def reads(self, table):
+        return [sql for sql in self.sql if sql.startswith('SELECT') and f'"{table}"' in sql]
+
+
+@pytest.fixture
+def routed(settings):
+    cache.clear()
+    settings.DATABASE_REPLICAS = ['replica_1']
+    user = User.objects.create_user(username='trader', password='x')
+    MarketTicker.objects.create(symbol='SYM', price=10, volume_24h=100)
+    position = Position.objects.create(user=user, asset='SYM', quantity=1, open_price=10)
+    # As escritas da preparação não contam para a leitura das próprias escritas.
+    cache.clear()
+    return user, position
+
+
+def recorded(client_call):
+    default, replica = Recorder(), Recorder()
+    with connections['default'].execute_wrapper(default), connections['replica_1'].execute_wrapper(replica):
+        response = client_call()
+    assert response.status_code < 400
+    return default, replica
+
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica_1'])
+def test_htmx_reads_use_replica_until_own_write(client, routed):
+    """
+    Os painéis só de leitura vão à réplica; depois de fechar uma posição, o utilizador lê da base principal.
+    """
+    user, position = routed
+    client.force_login(user)
+    default, replica = recorded(lambda: client.get('/api/trading/positions/htmx/'))
+    assert replica.reads('trading_position') and not default.reads('trading_position')
+    default, replica = recorded(lambda: client.get('/api/trading/market-ticker/htmx/'))
+    assert replica.reads('trading_marketticker')
+
+    recorded(lambda: client.post(f'/api/trading/positions/{position.pk}/close/'))
+    default, replica = recorded(lambda: client.get('/api/trading/market-ticker/htmx/'))
+    assert default.reads('trading_marketticker') and not replica.sql
+
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica_1'])
+def test_viewset_reads_use_replica_and_writes_stick(client, routed):
+    user, position = routed
+    auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'}
+    default, replica = recorded(lambda: client.get(f'/api/trading/positions/{position.pk}/', **auth))
+    assert replica.reads('trading_position') and not default.reads('trading_position')
+
+    recorded(lambda: client.post('/api/trading/orders/', {
+        'asset': 'SYM', 'order_type': 'buy', 'quantity': '1', 'price': '5',
+    }, **auth))
+    default, replica = recorded(lambda: client.get('/api/trading/orders/', **auth))
+    assert default.reads('trading_order') and not replica.sql
+
+
+@pytest.mark.django_db
+def test_without_replicas_everything_reads_default(client, routed, settings):
+    settings.DATABASE_REPLICAS = []
+    client.force_login(routed[0])
+    assert client.get('/api/trading/positions/htmx/').status_code == 200
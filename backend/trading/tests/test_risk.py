@@ -0,0 +1,63 @@
+import pytest
+from rest_framework import status
+from rest_framework.test import APIClient
+from trading.matching import get_engine
+from trading.models import Order, Position, RiskSettings
+from trading.risk import get_risk_engine
+from users.models import User
+
+
+@pytest.fixture
+def risk():
+    get_engine().reset()
+    get_risk_engine().reset()
+    return get_risk_engine()
+
+
+def _order(client, side, quantity, price='100', asset='BTC'):
+    return client.post('/api/trading/orders/', {
+        'asset': asset, 'order_type': side, 'quantity': quantity, 'price': price,
+    })
+
+
+@pytest.mark.django_db
+def test_orders_beyond_position_limit_are_rejected(risk):
+    """
+    Ordens em aberto e execuções contam para a exposição do símbolo; acima do limite a ordem é recusada.
+    """
+    trader = User.objects.create_user(username='trader', password='x')
+    other = User.objects.create_user(username='other', password='x')
+    RiskSettings.objects.create(user=trader, max_position_size=1000)
+    client = APIClient()
+    client.force_authenticate(trader)
+
+    assert _order(client, 'buy', '5').status_code == status.HTTP_201_CREATED
+    rejected = _order(client, 'buy', '6')
+    assert rejected.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'risk' in rejected.data
+    assert Order.objects.filter(user=trader).count() == 1
+
+    # A execução passa a reserva para a posição líquida: a exposição mantém-se.
+    seller = Order.objects.create(user=other, asset='BTC', order_type='sell', quantity=5, price=100)
+    get_engine().submit([seller])
+    assert risk.snapshot(trader.pk)['exposure'] == {'BTC': 500.0}
+    assert _order(client, 'buy', '6').status_code == status.HTTP_400_BAD_REQUEST
+    # Vender reduz a exposição e é aceite.
+    assert _order(client, 'sell', '5', price='120').status_code == status.HTTP_201_CREATED
+
+
+@pytest.mark.django_db
+def test_margin_follows_position_changes_incrementally(risk):
+    """
+    Fechar uma posição liberta margem sem voltar a ler as posições da base de dados.
+    """
+    trader = User.objects.create_user(username='trader', password='x')
+    RiskSettings.objects.create(user=trader, max_margin=50, margin_rate='0.1')
+    position = Position.objects.create(user=trader, asset='BTC', quantity=3, open_price=100)
+
+    assert risk.check(trader.pk, 'ETH', 'buy', 3, 100)
+    assert risk.check(trader.pk, 'ETH', 'buy', 1, 100) is None
+    position.is_open = False
+    position.save()
+    assert risk.snapshot(trader.pk)['margin_used'] == 0
+    assert risk.check(trader.pk, 'ETH', 'buy', 3, 100) is None
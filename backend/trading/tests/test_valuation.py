@@ -0,0 +1,47 @@
+import pytest
+from decimal import Decimal
+from trading.models import MarketTicker, Portfolio, Position
+from trading.valuation import revalue_portfolios, value_portfolio
+from users.models import User
+
+
+@pytest.fixture
+def positions():
+    alice = User.objects.create_user(username='alice', password='x')
+    bob = User.objects.create_user(username='bob', password='x')
+    MarketTicker.objects.create(symbol='BTC', price=110, volume_24h=0)
+    MarketTicker.objects.create(symbol='ETH', price=20, volume_24h=0)
+    Position.objects.create(user=alice, asset='BTC', quantity=1, open_price=100)
+    Position.objects.create(user=alice, asset='BTC', quantity=2, open_price=105)
+    Position.objects.create(user=alice, asset='ETH', quantity=-3, open_price=25)
+    Position.objects.create(user=alice, asset='XYZ', quantity=1, open_price=7)
+    Position.objects.create(user=bob, asset='ETH', quantity=10, open_price=10)
+    Position.objects.create(user=bob, asset='BTC', quantity=5, open_price=1, is_open=False)
+    return alice, bob
+
+
+@pytest.mark.django_db
+def test_value_portfolio_aggregates_per_asset(positions):
+    """
+    Valor, PnL e exposição são agregados por ativo; ativos sem cotação ficam ao preço de abertura.
+    """
+    alice, _ = positions
+    rows = {row['name']: row for row in value_portfolio(alice)}
+    assert rows['BTC']['quantity'] == 3
+    assert rows['BTC']['current_value'] == 330
+    assert rows['BTC']['unrealized_pnl'] == 20
+    assert rows['ETH']['current_value'] == -60 and rows['ETH']['exposure'] == 60
+    assert rows['ETH']['unrealized_pnl'] == 15
+    assert rows['XYZ']['current_value'] == 7 and rows['XYZ']['unrealized_pnl'] == 0
+
+
+@pytest.mark.django_db
+def test_revalue_portfolios_updates_all_users(positions):
+    alice, bob = positions
+    assert sorted(revalue_portfolios()) == sorted([alice.id, bob.id])
+    assert Portfolio.objects.get(user=alice).total_value == Decimal('277.00')
+    assert Portfolio.objects.get(user=bob).total_value == Decimal('200.00')
+
+    MarketTicker.objects.filter(symbol='ETH').update(price=30)
+    assert revalue_portfolios(['ETH']) == sorted([alice.id, bob.id])
+    assert Portfolio.objects.get(user=bob).total_value == Decimal('300.00')
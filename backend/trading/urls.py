@@ -1,19 +1,27 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PositionViewSet, OrderViewSet, TradingDashboardView, PositionsListHTMXView, ClosePositionView, OrderBookHTMXView, PortfolioHTMXView, RecentTradesHTMXView, PerformanceChartHTMXView, MarketTickerHTMXView
+from . import views, views_async
+from .views import PositionViewSet, OrderViewSet, TradingDashboardView, ExportView
 
 router = DefaultRouter()
 router.register(r'positions', PositionViewSet)
 router.register(r'orders', OrderViewSet)
 
+# As views HTMX assíncronas têm os mesmos nomes; escolhidas ao carregar as URLs.
+htmx = views_async if settings.ASYNC_HTMX_VIEWS else views
+
 urlpatterns = [
-    path('', include(router.urls)),
+    path('export/<str:resource>.<str:fmt>', ExportView.as_view(), name='trading-export'),
     path('dashboard/', TradingDashboardView.as_view(), name='trading_dashboard'),
-    path('positions/htmx/', PositionsListHTMXView.as_view(), name='positions-list-htmx'),
-    path('positions/<int:position_id>/close/', ClosePositionView.as_view(), name='close_position'),
-    path('orderbook/htmx/', OrderBookHTMXView.as_view(), name='orderbook-htmx'),
-    path('portfolio/htmx/', PortfolioHTMXView.as_view(), name='portfolio-htmx'),
-    path('recent-trades/htmx/', RecentTradesHTMXView.as_view(), name='recent-trades-htmx'),
-    path('performance-chart/htmx/', PerformanceChartHTMXView.as_view(), name='performance-chart-htmx'),
-    path('market-ticker/htmx/', MarketTickerHTMXView.as_view(), name='market-ticker-htmx'),
+    path('dashboard/panels/htmx/', htmx.DashboardPanelsHTMXView.as_view(), name='dashboard-panels-htmx'),
+    path('positions/htmx/', htmx.PositionsListHTMXView.as_view(), name='positions-list-htmx'),
+    path('positions/<int:position_id>/close/', htmx.ClosePositionView.as_view(), name='close_position'),
+    path('orderbook/htmx/', htmx.OrderBookHTMXView.as_view(), name='orderbook-htmx'),
+    path('portfolio/htmx/', htmx.PortfolioHTMXView.as_view(), name='portfolio-htmx'),
+    path('recent-trades/htmx/', htmx.RecentTradesHTMXView.as_view(), name='recent-trades-htmx'),
+    path('performance-chart/htmx/', htmx.PerformanceChartHTMXView.as_view(), name='performance-chart-htmx'),
+    path('market-ticker/htmx/', htmx.MarketTickerHTMXView.as_view(), name='market-ticker-htmx'),
+    # Depois das rotas HTMX: 'positions/<pk>/' do router apanharia 'positions/htmx/'.
+    path('', include(router.urls)),
 ]
@@ -0,0 +1,137 @@
+"""
+Avaliação mark-to-market vetorizada das posições abertas.
+
+As posições são carregadas como colunas NumPy (o cast para float é feito na
+base de dados, sem criar objetos Decimal por linha) e avaliadas numa única
+passagem contra o último preço de cada símbolo (`latest_prices`).
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from market_data.snapshot import get_price_table
+from trading_platform.fragment_cache import bump, user_scope
+from .models import MarketTicker, Portfolio, Position
+
+CENTS = Decimal('0.01')
+
+
+def _as_float(field):
+    return Cast(field, FloatField())
+
+
+def load_open_positions(**filters):
+    """Devolve (user_ids, assets, quantities, open_prices) como arrays."""
+    rows = list(
+        Position.objects.filter(is_open=True, **filters)
+        .annotate(qty=_as_float('quantity'), cost=_as_float('open_price'))
+        .values_list('user_id', 'asset', 'qty', 'cost')
+    )
+    if not rows:
+        return (
+            np.empty(0, dtype=np.int64), np.empty(0, dtype=object),
+            np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64),
+        )
+    user_ids, assets, quantities, open_prices = zip(*rows)
+    return (
+        np.array(user_ids, dtype=np.int64), np.array(assets, dtype=object),
+        np.array(quantities, dtype=np.float64), np.array(open_prices, dtype=np.float64),
+    )
+
+
+def latest_prices(symbols):
+    """Símbolo -> último preço, da tabela partilhada da ingestão e, em falta, de `MarketTicker`."""
+    symbols = list(symbols)
+    table = get_price_table()
+    prices = table.prices(symbols) if table is not None else {}
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing:
+        prices.update(
+            MarketTicker.objects.filter(symbol__in=missing)
+            .annotate(last=_as_float('price'))
+            .values_list('symbol', 'last')
+        )
+    return prices
+
+
+def mark_to_market(assets, quantities, open_prices, prices):
+    """Avalia as posições contra `prices` (símbolo -> preço).
+
+    Devolve os símbolos distintos, o índice de cada posição nesses símbolos e
+    os arrays por posição de valor, PnL não realizado e exposição. Ativos sem
+    cotação são marcados ao preço de abertura.
+    """
+    symbols, inverse = np.unique(assets, return_inverse=True)
+    last = np.array([prices.get(symbol, np.nan) for symbol in symbols], dtype=np.float64)
+    mark = last[inverse]
+    mark = np.where(np.isnan(mark), open_prices, mark)
+    value = quantities * mark
+    pnl = quantities * (mark - open_prices)
+    return symbols, inverse, value, pnl, np.abs(value)
+
+
+def value_portfolio(user):
+    """Linhas por ativo (quantidade, preço, valor, PnL, exposição) de um utilizador."""
+    _, assets, quantities, open_prices = load_open_positions(user=user)
+    if not len(assets):
+        return []
+    symbols, inverse, value, pnl, exposure = mark_to_market(
+        assets, quantities, open_prices, latest_prices(set(assets)),
+    )
+    n = len(symbols)
+    totals = {
+        'quantity': np.bincount(inverse, weights=quantities, minlength=n),
+        'value': np.bincount(inverse, weights=value, minlength=n),
+        'pnl': np.bincount(inverse, weights=pnl, minlength=n),
+        'exposure': np.bincount(inverse, weights=exposure, minlength=n),
+    }
+    return [
+        {
+            'name': symbol,
+            'quantity': totals['quantity'][i],
+            'current_value': round(totals['value'][i], 2),
+            'unrealized_pnl': round(totals['pnl'][i], 2),
+            'exposure': round(totals['exposure'][i], 2),
+        }
+        for i, symbol in enumerate(symbols)
+    ]
+
+
+def revalue_portfolios(symbols=None):
+    """Recalcula `Portfolio.total_value` de todos os utilizadores de uma vez.
+
+    Com `symbols`, só são reavaliados os utilizadores com posições abertas
+    nesses símbolos (o caso de um tick a chegar). Devolve os ids afetados.
+    """
+    filters = {}
+    if symbols is not None:
+        filters['user_id__in'] = (
+            Position.objects.filter(is_open=True, asset__in=list(symbols)).values('user_id')
+        )
+    user_ids, assets, quantities, open_prices = load_open_positions(**filters)
+    if symbols is None:
+        Portfolio.objects.exclude(user_id__in=set(user_ids.tolist())).update(total_value=0)
+    if not len(assets):
+        return []
+    _, _, value, _, _ = mark_to_market(assets, quantities, open_prices, latest_prices(set(assets)))
+    users, user_index = np.unique(user_ids, return_inverse=True)
+    totals = np.bincount(user_index, weights=value, minlength=len(users))
+    now = timezone.now()
+    portfolios = [
+        Portfolio(
+            user_id=int(user_id),
+            total_value=Decimal(repr(total)).quantize(CENTS, ROUND_HALF_UP),
+            last_updated=now,
+        )
+        for user_id, total in zip(users.tolist(), totals.tolist())
+    ]
+    Portfolio.objects.bulk_create(
+        portfolios, update_conflicts=True, unique_fields=['user'],
+        update_fields=['total_value', 'last_updated'],
+    )
+    # O upsert em lote não dispara sinais; invalida os painéis destes utilizadores.
+    bump(*(user_scope(user_id) for user_id in users.tolist()))
+    return users.tolist()
@@ -1,71 +1,323 @@
-from rest_framework import viewsets
-from .models import Position, Order
-from .serializers import PositionSerializer, OrderSerializer
+import copy
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .models import Position, Order, Candle
+from .serializers import PositionSerializer, OrderSerializer, OrderBatchSerializer
+from .batch import CREATED, submit_batch
+from .fast_serializers import compile_serializer
+from .renderers import trading_renderers
+from .matching import get_engine, RESTING_STATUSES
+from .risk import get_risk_engine
+from .valuation import value_portfolio
+from .ledger import close_position
+from .candles import INTERVALS, get_candles
+from .pagination import KeysetPagination
+from .export import CONTENT_TYPES, EXPORTS, aexport_stream, export_stream
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
+from django.db import close_old_connections
 from django.views import View
-from django.shortcuts import render
-from django.http import HttpResponse
-from django.template.loader import render_to_string
-from django.utils import timezone
+from django.shortcuts import get_object_or_404, render
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from rest_framework.views import APIView
+from market_data.snapshot import get_price_table
+from trading_platform.db_routing import ReplicaReadMixin, ReplicaReadViewSetMixin
+from trading_platform.fragment_cache import render_cached, user_scope
+from automation.views import AutomationPanelHTMXView
+from chat.views import ChatPanelHTMXView
 
-class PositionViewSet(viewsets.ModelViewSet):
+logger = logging.getLogger(__name__)
+
+class UserScopedViewSetMixin:
+    """
+    Restringe o viewset aos registos do utilizador, pagina por keyset em
+    (`keyset_field`, id) e aceita `?fields=a,b` para projetar colunas.
+
+    Com `API_FAST_SERIALIZATION`, as listagens leem `values_list` e usam o
+    serializer compilado (mesmo resultado, sem instanciar modelos).
+    """
+    keyset_field = None
+    pagination_class = KeysetPagination
+    renderer_classes = trading_renderers()
+
+    def requested_fields(self):
+        if self.request is None or self.request.method != 'GET':
+            return None
+        param = self.request.query_params.get('fields')
+        if not param:
+            return None
+        model_fields = {field.name for field in self.queryset.model._meta.concrete_fields}
+        return {name for name in param.split(',') if name in model_fields} or None
+
+    def get_queryset(self):
+        queryset = super().get_queryset().filter(user=self.request.user)
+        fields = self.requested_fields()
+        if fields:
+            queryset = queryset.only(*(fields | {'id', self.keyset_field}))
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        plan = None
+        if settings.API_FAST_SERIALIZATION:
+            plan = compile_serializer(self.get_serializer_class(), self.requested_fields())
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        rows = plan.values_list(self.filter_queryset(self.get_queryset()), 'id', self.keyset_field)
+        return self.get_paginated_response(plan.serialize(self.paginate_queryset(rows)))
+
+class PositionViewSet(ReplicaReadViewSetMixin, UserScopedViewSetMixin, viewsets.ModelViewSet):
     queryset = Position.objects.all()
     serializer_class = PositionSerializer
     permission_classes = [IsAuthenticated]
+    keyset_field = 'open_time'
+
+    def destroy(self, request, *args, **kwargs):
+        position = self.get_object()
+        # Uma posição do livro de execuções deriva das execuções: fecha-se, não se apaga.
+        if position.fills.exists():
+            return Response(
+                {'detail': 'A posição tem execuções; feche-a em vez de a apagar.'}, status=status.HTTP_409_CONFLICT,
+            )
+        return super().destroy(request, *args, **kwargs)
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ReplicaReadViewSetMixin, UserScopedViewSetMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    keyset_field = 'created_at'
+    # Uma ordem não se edita (cancela-se e cria-se outra) e apagá-la é cancelá-la:
+    # o livro do motor de matching tem de saber de ambas.
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
+
+    def destroy(self, request, *args, **kwargs):
+        order = self.get_object()
+        if order.status not in RESTING_STATUSES or not get_engine().cancel(order):
+            return Response(
+                {'detail': f'A ordem já está {order.status} e não pode ser cancelada.'}, status=status.HTTP_409_CONFLICT,
+            )
+        return Response(self.get_serializer(order).data)
+
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        risk = get_risk_engine()
+        with risk.order_lock(self.request.user.pk):
+            reason = risk.check(self.request.user.pk, data['asset'], data['order_type'], data['quantity'], data['price'])
+            if reason:
+                raise ValidationError({'risk': reason})
+            order = serializer.save(user=self.request.user)
+            get_engine().submit([order])
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Cria e/ou cancela várias ordens num pedido (escadas de cotações):
+        `{"orders": [...], "cancel": [ids], "atomic": true}`. Responde com o
+        resultado de cada ordem, pela ordem do pedido, os ids cancelados e, em
+        `cancel_errors`, o motivo de cada cancelamento que falhou: 201 se tudo
+        foi feito, 207 se só uma parte, 400 se nada.
+        """
+        params = OrderBatchSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        results, orders, cancelled, cancel_errors = submit_batch(request.user, **params.validated_data)
+        plan = compile_serializer(OrderSerializer) if settings.API_FAST_SERIALIZATION else None
+        data = plan.serialize_objects(orders) if plan else OrderSerializer(orders, many=True).data
+        created = iter(data)
+        for result in results:
+            if result['status'] == CREATED:
+                result['order'] = next(created)
+        if len(orders) == len(results) and not cancel_errors:
+            code = status.HTTP_201_CREATED if orders else status.HTTP_200_OK
+        else:
+            code = status.HTTP_207_MULTI_STATUS if orders or cancelled else status.HTTP_400_BAD_REQUEST
+        cancel_errors = {str(pk): reason for pk, reason in cancel_errors.items()}
+        return Response({'results': results, 'cancelled': cancelled, 'cancel_errors': cancel_errors}, status=code)
+
+class ExportView(APIView):
+    """
+    Exporta o histórico do utilizador (trades, orders, positions) em NDJSON ou CSV, em streaming.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, resource, fmt):
+        if resource not in EXPORTS or fmt not in CONTENT_TYPES:
+            raise Http404
+        model, _ = EXPORTS[resource]
+        queryset = model.objects.filter(user=request.user)
+        if isinstance(request._request, ASGIRequest):
+            stream = aexport_stream(resource, fmt, queryset)
+        else:
+            stream = export_stream(resource, fmt, queryset)
+        response = StreamingHttpResponse(stream, content_type=CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="{resource}.{fmt}"'
+        return response
 
 class TradingDashboardView(View):
     def get(self, request):
         return render(request, 'trading/dashboard.html')
 
-class PositionsListHTMXView(View):
+def _positions_panel(request):
+    return render_cached(
+        request, 'positions', [user_scope(request.user.pk)], 'trading/partials/positions_list.html',
+        lambda: {'positions': Position.objects.filter(user=request.user, is_open=True)},
+    )
+
+class PositionsListHTMXView(ReplicaReadMixin, View):
     def get(self, request):
-        positions = Position.objects.filter(user=request.user, is_open=True)
-        return render(request, 'trading/partials/positions_list.html', {'positions': positions})
+        return _positions_panel(request)
 
 class ClosePositionView(View):
     def post(self, request, position_id):
-        position = Position.objects.get(id=position_id, user=request.user)
-        position.is_open = False
-        position.close_time = timezone.now()
-        position.save()
-        positions = Position.objects.filter(user=request.user, is_open=True)
-        html = render_to_string('trading/partials/positions_list.html', {'positions': positions}, request=request)
-        return HttpResponse(html)
+        position = get_object_or_404(Position, id=position_id, user=request.user)
+        if position.is_open:
+            # Fecha ao último preço de mercado, com preço de fecho e PnL realizado.
+            close_position(position)
+        # O fecho incrementa a versão do utilizador; o painel é renderizado e guardado de novo.
+        return _positions_panel(request)
 
 class OrderBookHTMXView(View):
     def get(self, request):
-        # Exemplo: buscar ordens do modelo OrderBook (ajuste conforme seu modelo real)
-        from .models import OrderBook
-        orders = OrderBook.objects.all()[:20]
-        return render(request, 'trading/partials/order_book.html', {'orders': orders})
+        # A profundidade vem do livro em memória do motor de matching.
+        symbol = request.GET.get('symbol') or (
+            Order.objects.filter(status__in=RESTING_STATUSES)
+            .order_by('-id').values_list('asset', flat=True).first()
+        )
+        orders = []
+        if symbol:
+            depth = get_engine().depth(symbol, levels=10)
+            orders += [{'type': 'sell', 'price': price, 'quantity': quantity} for price, quantity in reversed(depth['asks'])]
+            orders += [{'type': 'buy', 'price': price, 'quantity': quantity} for price, quantity in depth['bids']]
+        return render(request, 'trading/partials/order_book.html', {'orders': orders, 'symbol': symbol})
 
 class PortfolioHTMXView(View):
     def get(self, request):
-        # Exemplo: buscar ativos do portfólio (ajuste conforme seu modelo real)
-        from .models import Portfolio
-        portfolio = Portfolio.objects.filter(user=request.user)
-        return render(request, 'trading/partials/portfolio.html', {'portfolio': portfolio})
+        return render_cached(
+            request, 'portfolio', [user_scope(request.user.pk)], 'trading/partials/portfolio.html',
+            lambda: {'portfolio': value_portfolio(request.user)},
+        )
 
-class RecentTradesHTMXView(View):
+class RecentTradesHTMXView(ReplicaReadMixin, View):
     def get(self, request):
         # Exemplo: buscar negociações recentes (ajuste conforme seu modelo real)
         from .models import Trade
         trades = Trade.objects.order_by('-timestamp')[:20]
         return render(request, 'trading/partials/recent_trades.html', {'trades': trades})
 
+def _polyline_points(values, width=300, height=100, padding=10):
+    if len(values) < 2:
+        return ''
+    low, high = min(values), max(values)
+    span = (high - low) or 1
+    step = width / (len(values) - 1)
+    return ' '.join(
+        f'{i * step:.1f},{padding + (high - value) / span * (height - 2 * padding):.1f}'
+        for i, value in enumerate(values)
+    )
+
 class PerformanceChartHTMXView(View):
     def get(self, request):
-        # Exemplo: dados estáticos ou busque dados reais do modelo
-        return render(request, 'trading/partials/performance_chart.html')
+        # Lê as velas pré-calculadas em vez de percorrer o histórico de Trade.
+        interval = request.GET.get('interval')
+        if interval not in INTERVALS:
+            interval = '1h'
+        symbol = request.GET.get('symbol') or (
+            Candle.objects.order_by('-id').values_list('symbol', flat=True).first()
+        )
+        candles = get_candles(symbol, interval, limit=48) if symbol else []
+        points = _polyline_points([float(candle.close) for candle in candles])
+        return render(request, 'trading/partials/performance_chart.html', {
+            'symbol': symbol, 'interval': interval, 'candles': candles, 'points': points,
+        })
 
-class MarketTickerHTMXView(View):
+class MarketTickerHTMXView(ReplicaReadMixin, View):
     def get(self, request):
         # Exemplo: dados estáticos ou busque dados reais do modelo
         from .models import MarketTicker
-        tickers = MarketTicker.objects.all()[:10]
+        # Da tabela partilhada da ingestão, sem consulta; sem ela, da base de dados.
+        table = get_price_table()
+        tickers = table.quotes(10) if table is not None else MarketTicker.objects.all()[:10]
         return render(request, 'trading/partials/market_ticker.html', {'tickers': tickers})
+
+
+# (id do contentor no dashboard, nome curto para o Server-Timing, view do painel)
+DASHBOARD_PANELS = [
+    ('positions-container', 'positions', PositionsListHTMXView),
+    ('orderbook-container', 'orderbook', OrderBookHTMXView),
+    ('portfolio-container', 'portfolio', PortfolioHTMXView),
+    ('recent-trades-container', 'trades', RecentTradesHTMXView),
+    ('performance-chart-container', 'chart', PerformanceChartHTMXView),
+    ('market-ticker-container', 'ticker', MarketTickerHTMXView),
+    ('automation-panel-container', 'automation', AutomationPanelHTMXView),
+    ('chat-panel-container', 'chat', ChatPanelHTMXView),
+]
+
+_panel_executor = None
+
+def _get_panel_executor():
+    global _panel_executor
+    if _panel_executor is None:
+        _panel_executor = ThreadPoolExecutor(
+            max_workers=settings.DASHBOARD_PANEL_WORKERS, thread_name_prefix='dashboard-panel',
+        )
+    return _panel_executor
+
+def _render_panel(view_class, request, threaded):
+    if threaded:
+        close_old_connections()
+    started = time.perf_counter()
+    try:
+        html = view_class.as_view()(request).content.decode()
+    except Exception:
+        logger.exception('Falha ao renderizar o painel %s', view_class.__name__)
+        html = '<p>Erro ao carregar o painel.</p>'
+    finally:
+        if threaded:
+            close_old_connections()
+    return html, (time.perf_counter() - started) * 1000
+
+def _panels_threaded():
+    # Cada thread abre a sua ligação: só compensa se abri-la for barato (pool ou PgBouncer).
+    return settings.DASHBOARD_PANEL_WORKERS > 1 and bool(settings.DB_POOL_SIZE or settings.DB_PGBOUNCER)
+
+class DashboardPanelsHTMXView(View):
+    """
+    Renderiza todos os painéis do dashboard num único pedido e devolve-os
+    como swaps out-of-band do HTMX, com o tempo de cada painel no Server-Timing.
+    Por omissão em sequência, na ligação do pedido.
+    """
+    def get(self, request):
+        started = time.perf_counter()
+        threaded = _panels_threaded()
+        if threaded:
+            # Resolve o utilizador (e a sessão) antes de partilhar o pedido; cada painel
+            # recebe a sua cópia, para não trocarem atributos entre threads.
+            request.user.pk
+            executor = _get_panel_executor()
+            futures = [
+                executor.submit(_render_panel, view_class, copy.copy(request), True)
+                for _, _, view_class in DASHBOARD_PANELS
+            ]
+            results = [future.result() for future in futures]
+        else:
+            results = [_render_panel(view_class, request, False) for _, _, view_class in DASHBOARD_PANELS]
+        body = ''.join(
+            f'<div id="{container}" hx-swap-oob="innerHTML">{html}</div>'
+            for (container, _, _), (html, _) in zip(DASHBOARD_PANELS, results)
+        )
+        timings = [f'{name};dur={ms:.2f}' for (_, name, _), (_, ms) in zip(DASHBOARD_PANELS, results)]
+        timings.append(f'total;dur={(time.perf_counter() - started) * 1000:.2f}')
+        response = HttpResponse(body)
+        response['Server-Timing'] = ', '.join(timings)
+        return response
@@ -0,0 +1,149 @@
+"""
+Versões assíncronas das views HTMX do trading, ativadas com `ASYNC_HTMX_VIEWS`.
+
+Sob ASGI cada view síncrona ocupa uma thread do `sync_to_async` do início ao
+fim; estas correm no event loop e só as consultas do ORM assíncrono passam
+pela thread do pedido. As escritas e a avaliação do portfolio reutilizam o
+código síncrono (livro de execuções, NumPy) através de `sync_to_async`.
+
+O dashboard junta os painéis com `asyncio.gather`, mas o ORM assíncrono e o
+`sync_to_async` usam `thread_sensitive=True`: as consultas e o código síncrono
+de todos os painéis continuam em fila na mesma thread. O ganho é libertar o
+event loop, não paralelizar os painéis.
+"""
+import asyncio
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.shortcuts import aget_object_or_404, render
+from django.views import View
+
+from automation.views_async import AutomationPanelHTMXView
+from chat.views_async import ChatPanelHTMXView
+from market_data.snapshot import get_price_table
+from trading_platform.async_views import request_user
+from trading_platform.db_routing import AsyncReplicaReadMixin
+from trading_platform.fragment_cache import arender_cached, user_scope
+from .candles import INTERVALS
+from .ledger import close_position
+from .matching import RESTING_STATUSES, get_engine
+from .models import Candle, MarketTicker, Order, Position, Trade
+from .valuation import value_portfolio
+from .views import _polyline_points
+
+logger = logging.getLogger(__name__)
+
+async def _positions_panel(request, user):
+    async def context():
+        return {'positions': [position async for position in Position.objects.filter(user=user, is_open=True)]}
+    return await arender_cached(
+        request, 'positions', [user_scope(user.pk)], 'trading/partials/positions_list.html', context,
+    )
+
+class PositionsListHTMXView(AsyncReplicaReadMixin, View):
+    async def get(self, request):
+        return await _positions_panel(request, await request_user(request))
+
+class ClosePositionView(View):
+    async def post(self, request, position_id):
+        user = await request_user(request)
+        position = await aget_object_or_404(Position, id=position_id, user=user)
+        if position.is_open:
+            await sync_to_async(close_position)(position)
+        return await _positions_panel(request, user)
+
+class OrderBookHTMXView(View):
+    async def get(self, request):
+        symbol = request.GET.get('symbol') or await (
+            Order.objects.filter(status__in=RESTING_STATUSES)
+            .order_by('-id').values_list('asset', flat=True).afirst()
+        )
+        orders = []
+        if symbol:
+            # A profundidade confirma na base de dados que o livro em memória está em dia.
+            depth = await sync_to_async(get_engine().depth)(symbol, levels=10)
+            orders += [{'type': 'sell', 'price': price, 'quantity': quantity} for price, quantity in reversed(depth['asks'])]
+            orders += [{'type': 'buy', 'price': price, 'quantity': quantity} for price, quantity in depth['bids']]
+        return render(request, 'trading/partials/order_book.html', {'orders': orders, 'symbol': symbol})
+
+class PortfolioHTMXView(View):
+    async def get(self, request):
+        user = await request_user(request)
+
+        async def context():
+            return {'portfolio': await sync_to_async(value_portfolio)(user)}
+        return await arender_cached(request, 'portfolio', [user_scope(user.pk)], 'trading/partials/portfolio.html', context)
+
+class RecentTradesHTMXView(AsyncReplicaReadMixin, View):
+    async def get(self, request):
+        trades = [trade async for trade in Trade.objects.order_by('-timestamp')[:20]]
+        return render(request, 'trading/partials/recent_trades.html', {'trades': trades})
+
+class PerformanceChartHTMXView(View):
+    async def get(self, request):
+        interval = request.GET.get('interval')
+        if interval not in INTERVALS:
+            interval = '1h'
+        symbol = request.GET.get('symbol') or await (
+            Candle.objects.order_by('-id').values_list('symbol', flat=True).afirst()
+        )
+        candles = []
+        if symbol:
+            recent = Candle.objects.filter(symbol=symbol, interval=interval).order_by('-bucket_start')[:48]
+            candles = [candle async for candle in recent][::-1]
+        points = _polyline_points([float(candle.close) for candle in candles])
+        return render(request, 'trading/partials/performance_chart.html', {
+            'symbol': symbol, 'interval': interval, 'candles': candles, 'points': points,
+        })
+
+class MarketTickerHTMXView(AsyncReplicaReadMixin, View):
+    async def get(self, request):
+        table = get_price_table()
+        if table is not None:
+            tickers = table.quotes(10)
+        else:
+            tickers = [ticker async for ticker in MarketTicker.objects.all()[:10]]
+        return render(request, 'trading/partials/market_ticker.html', {'tickers': tickers})
+
+
+# A mesma ordem e os mesmos nomes que `views.DASHBOARD_PANELS`.
+DASHBOARD_PANELS = [
+    ('positions-container', 'positions', PositionsListHTMXView),
+    ('orderbook-container', 'orderbook', OrderBookHTMXView),
+    ('portfolio-container', 'portfolio', PortfolioHTMXView),
+    ('recent-trades-container', 'trades', RecentTradesHTMXView),
+    ('performance-chart-container', 'chart', PerformanceChartHTMXView),
+    ('market-ticker-container', 'ticker', MarketTickerHTMXView),
+    ('automation-panel-container', 'automation', AutomationPanelHTMXView),
+    ('chat-panel-container', 'chat', ChatPanelHTMXView),
+]
+
+async def _render_panel(view_class, request):
+    started = time.perf_counter()
+    try:
+        html = (await view_class.as_view()(request)).content.decode()
+    except Exception:
+        logger.exception('Falha ao renderizar o painel %s', view_class.__name__)
+        html = '<p>Erro ao carregar o painel.</p>'
+    return html, (time.perf_counter() - started) * 1000
+
+class DashboardPanelsHTMXView(View):
+    """
+    Como `views.DashboardPanelsHTMXView`, sem ocupar uma thread enquanto os painéis
+    esperam pela base de dados (que continuam a ser servidos um a um pela thread do pedido).
+    """
+    async def get(self, request):
+        started = time.perf_counter()
+        await request_user(request)
+        results = await asyncio.gather(*(_render_panel(view_class, request) for _, _, view_class in DASHBOARD_PANELS))
+        body = ''.join(
+            f'<div id="{container}" hx-swap-oob="innerHTML">{html}</div>'
+            for (container, _, _), (html, _) in zip(DASHBOARD_PANELS, results)
+        )
+        timings = [f'{name};dur={ms:.2f}' for (_, name, _), (_, ms) in zip(DASHBOARD_PANELS, results)]
+        timings.append(f'total;dur={(time.perf_counter() - started) * 1000:.2f}')
+        response = HttpResponse(body)
+        response['Server-Timing'] = ', '.join(timings)
+        return response
@@ -2,15 +2,21 @@ import os
 from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
 from channels.auth import AuthMiddlewareStack
-import chat.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trading_platform.settings')
 
+# Inicializa o Django antes de importar consumidores que usam modelos.
+django_asgi_app = get_asgi_application()
+
+import chat.routing  # noqa: E402
+import trading.routing  # noqa: E402
+
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(
             chat.routing.websocket_urlpatterns
+            + trading.routing.websocket_urlpatterns
         )
     ),
 })
@@ -0,0 +1,14 @@
+"""
+Apoio às views HTMX assíncronas (`views_async.py` de cada app).
+"""
+
+
+async def request_user(request):
+    """Carrega o utilizador da sessão sem bloquear e fixa-o em `request.user`.
+
+    O código síncrono e os templates que usem `request.user` depois disto já
+    não fazem consultas (que falhariam no event loop).
+    """
+    user = await request.auser()
+    request.user = user
+    return user
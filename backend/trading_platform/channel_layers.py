@@ -0,0 +1,283 @@
+"""
+Channel layer multi-processo para uma só máquina, sem Redis.
+
+Os workers ASGI ligam-se por socket Unix ao broker lançado com o comando
+`run_channel_broker`, que guarda os grupos e encaminha as mensagens:
+
+- cada mensagem é serializada (msgpack) uma única vez por quem a envia; o
+  broker reencaminha os bytes sem os descodificar;
+- um `group_send` gera um só frame por processo destino, com a lista dos
+  canais desse processo que pertencem ao grupo;
+- os envios feitos na mesma volta do event loop seguem juntos numa única
+  escrita no socket.
+
+Só existem canais específicos de processo (`prefixo!sufixo`), que são os que
+os consumidores usam. A capacidade de cada canal é aplicada do lado de quem
+recebe: as mensagens em excesso são descartadas, como num `group_send`.
+"""
+import asyncio
+import logging
+import os
+import struct
+import uuid
+from collections import defaultdict
+
+import msgpack
+from channels.layers import BaseChannelLayer
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct('!I')
+
+HELLO, SEND, GROUP_ADD, GROUP_DISCARD, GROUP_SEND, FORGET, FLUSH, DELIVER = range(8)
+
+
+def encode_frame(frame):
+    payload = msgpack.packb(frame, use_bin_type=True)
+    return _HEADER.pack(len(payload)) + payload
+
+
+async def read_frame(reader):
+    header = await reader.readexactly(_HEADER.size)
+    return msgpack.unpackb(await reader.readexactly(_HEADER.unpack(header)[0]), raw=False)
+
+
+def owner(channel):
+    return channel[:channel.index('!')]
+
+
+class ChannelBroker:
+    """Grupos e encaminhamento entre processos, servido num socket Unix."""
+
+    def __init__(self, max_buffer=64 * 1024 * 1024):
+        # Um processo que deixa de ler é desligado quando o seu buffer de
+        # escrita passa de `max_buffer`, em vez de crescer sem limite.
+        self.max_buffer = max_buffer
+        self.clients = {}
+        self.groups = defaultdict(set)
+        self.memberships = defaultdict(set)
+        self.owned = defaultdict(set)
+
+    async def serve(self, path):
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(self.handle, path=path)
+        os.chmod(path, 0o660)
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        prefix = None
+        try:
+            _, prefix = await read_frame(reader)
+            self.clients[prefix] = writer
+            while True:
+                self.dispatch(await read_frame(reader))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if prefix is not None and self.clients.get(prefix) is writer:
+                del self.clients[prefix]
+                for channel in list(self.owned.pop(prefix, ())):
+                    self.forget(channel)
+            writer.close()
+
+    def dispatch(self, frame):
+        op = frame[0]
+        if op == GROUP_SEND:
+            _, group, payload = frame
+            targets = defaultdict(list)
+            for channel in self.groups.get(group, ()):
+                targets[owner(channel)].append(channel)
+            for prefix, channels in targets.items():
+                self.deliver(prefix, channels, payload)
+        elif op == SEND:
+            _, channel, payload = frame
+            self.deliver(owner(channel), [channel], payload)
+        elif op == GROUP_ADD:
+            _, group, channel = frame
+            self.groups[group].add(channel)
+            self.memberships[channel].add(group)
+            self.owned[owner(channel)].add(channel)
+        elif op == GROUP_DISCARD:
+            _, group, channel = frame
+            self.groups[group].discard(channel)
+            self.memberships[channel].discard(group)
+            if not self.groups[group]:
+                del self.groups[group]
+        elif op == FORGET:
+            self.forget(frame[1])
+            self.owned[owner(frame[1])].discard(frame[1])
+        elif op == FLUSH:
+            self.groups.clear()
+            self.memberships.clear()
+            self.owned.clear()
+
+    def forget(self, channel):
+        for group in self.memberships.pop(channel, ()):
+            members = self.groups.get(group)
+            if members is not None:
+                members.discard(channel)
+                if not members:
+                    del self.groups[group]
+
+    def deliver(self, prefix, channels, payload):
+        writer = self.clients.get(prefix)
+        if writer is None or writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > self.max_buffer:
+            logger.warning('Processo %s não acompanha as mensagens; ligação fechada', prefix)
+            writer.close()
+            return
+        writer.write(encode_frame([DELIVER, channels, payload]))
+
+
+class _BrokerConnection:
+    """Ligação ao broker de um event loop, com as filas dos seus canais."""
+
+    def __init__(self, layer, loop):
+        self.layer = layer
+        self.loop = loop
+        self.prefix = 'specific.' + uuid.uuid4().hex
+        self.queues = {}
+        self.memberships = defaultdict(set)
+        self.writer = None
+        self._lock = asyncio.Lock()
+        self._buffer = []
+        self._scheduled = False
+
+    async def ensure(self):
+        if self.writer is not None and not self.writer.is_closing():
+            return
+        async with self._lock:
+            if self.writer is not None and not self.writer.is_closing():
+                return
+            reader, self.writer = await asyncio.open_unix_connection(self.layer.path)
+            # Numa reconexão, volta a registar os grupos dos canais locais.
+            frames = [[HELLO, self.prefix]] + [
+                [GROUP_ADD, group, channel]
+                for channel, groups in self.memberships.items() for group in groups
+            ]
+            self.writer.write(b''.join(encode_frame(frame) for frame in frames))
+            asyncio.ensure_future(self._read(reader, self.writer))
+
+    def enqueue(self, frame):
+        self._buffer.append(encode_frame(frame))
+        if not self._scheduled:
+            self._scheduled = True
+            self.loop.call_soon(self.flush_buffer)
+
+    def flush_buffer(self):
+        self._scheduled = False
+        if self._buffer and self.writer is not None and not self.writer.is_closing():
+            self.writer.write(b''.join(self._buffer))
+        self._buffer = []
+
+    async def write(self, frame):
+        await self.ensure()
+        self.enqueue(frame)
+        await self.writer.drain()
+
+    def put(self, channel, payload):
+        queue = self.queues.get(channel)
+        if queue is None:
+            return
+        if queue.qsize() >= self.layer.get_capacity(channel):
+            logger.debug('Canal %s cheio; mensagem descartada', channel)
+            return
+        queue.put_nowait(msgpack.unpackb(payload, raw=False))
+
+    async def _read(self, reader, writer):
+        try:
+            while True:
+                _, channels, payload = await read_frame(reader)
+                for channel in channels:
+                    self.put(channel, payload)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            logger.warning('Ligação ao broker de canais perdida')
+        finally:
+            self.flush_buffer()
+            writer.close()
+
+    def forget(self, channel):
+        self.queues.pop(channel, None)
+        self.memberships.pop(channel, None)
+        if self.writer is not None:
+            self.enqueue([FORGET, channel])
+
+
+class UnixSocketChannelLayer(BaseChannelLayer):
+    extensions = ['groups', 'flush']
+
+    def __init__(self, path, expiry=60, capacity=100, channel_capacity=None):
+        super().__init__(expiry=expiry, capacity=capacity)
+        self.path = path
+        self.channel_capacity = self.compile_capacities(channel_capacity or {})
+        self._connections = {}
+
+    async def _connection(self):
+        loop = asyncio.get_running_loop()
+        connection = self._connections.get(loop)
+        if connection is None:
+            # Ligações de loops já fechados (chamadas via async_to_sync) são largadas.
+            for stale in [other for other in self._connections if other.is_closed()]:
+                del self._connections[stale]
+            connection = self._connections[loop] = _BrokerConnection(self, loop)
+        await connection.ensure()
+        return connection
+
+    async def new_channel(self, prefix='specific'):
+        connection = await self._connection()
+        channel = f'{connection.prefix}!{uuid.uuid4().hex}'
+        connection.queues[channel] = asyncio.Queue()
+        return channel
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_channel_name(channel)
+        assert '!' in channel, 'só são suportados canais específicos de processo'
+        connection = await self._connection()
+        payload = msgpack.packb(message, use_bin_type=True)
+        if owner(channel) == connection.prefix:
+            connection.put(channel, payload)
+        else:
+            await connection.write([SEND, channel, payload])
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        connection = await self._connection()
+        queue = connection.queues.setdefault(channel, asyncio.Queue())
+        try:
+            return await queue.get()
+        except asyncio.CancelledError:
+            # O consumidor terminou: o canal deixa de pertencer aos seus grupos.
+            connection.forget(channel)
+            raise
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        connection = await self._connection()
+        connection.memberships[channel].add(group)
+        await connection.write([GROUP_ADD, group, channel])
+
+    async def group_discard(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        connection = await self._connection()
+        connection.memberships[channel].discard(group)
+        await connection.write([GROUP_DISCARD, group, channel])
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_group_name(group)
+        connection = await self._connection()
+        await connection.write([GROUP_SEND, group, msgpack.packb(message, use_bin_type=True)])
+
+    async def flush(self):
+        connection = await self._connection()
+        for queue in connection.queues.values():
+            while not queue.empty():
+                queue.get_nowait()
+        connection.memberships.clear()
+        await connection.write([FLUSH])
@@ -0,0 +1,168 @@
+"""
+Leituras nas réplicas para as views só de leitura.
+
+`ReplicaRouter` envia as escritas e, por omissão, as leituras para
+`default`. As views marcadas com `ReplicaReadMixin` (views Django) ou
+`ReplicaReadViewSetMixin` (ações `list`/`retrieve` dos viewsets) leem de uma
+das réplicas de `DATABASE_REPLICAS` enquanto respondem a pedidos GET/HEAD.
+
+Leitura das próprias escritas: depois de um pedido que altera dados
+(`StickyWritesMiddleware`) ou de uma alteração às posições ou ao portfolio
+do utilizador (`mark_written`), as leituras desse utilizador ficam na base
+principal durante `DATABASE_REPLICA_STICKY_SECONDS`, o atraso máximo que se
+admite nas réplicas. A marca vive na cache do Django, partilhada entre
+processos. Sem réplicas configuradas tudo vai para `default`.
+
+As views assíncronas usam `AsyncReplicaReadMixin`; o alias segue para o ORM
+assíncrono com o contexto do `sync_to_async`.
+"""
+import contextvars
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject, empty
+
+_read_alias = contextvars.ContextVar('db_read_alias', default=None)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _sticky_key(user_id):
+    return f'db:sticky:{user_id}'
+
+
+def mark_written(*user_ids):
+    """As próximas leituras destes utilizadores vão à base principal."""
+    if settings.DATABASE_REPLICAS and user_ids:
+        cache.set_many(
+            {_sticky_key(user_id): 1 for user_id in user_ids}, settings.DATABASE_REPLICA_STICKY_SECONDS,
+        )
+
+
+async def amark_written(*user_ids):
+    if settings.DATABASE_REPLICAS and user_ids:
+        await cache.aset_many(
+            {_sticky_key(user_id): 1 for user_id in user_ids}, settings.DATABASE_REPLICA_STICKY_SECONDS,
+        )
+
+
+def _routable(request):
+    return settings.DATABASE_REPLICAS and request.method in SAFE_METHODS
+
+
+def read_alias(request, user_id):
+    """Réplica para as leituras deste pedido, ou None se devem ir à base principal."""
+    if not _routable(request):
+        return None
+    # Os painéis do dashboard partilham o pedido: a escolha faz-se uma vez.
+    if not hasattr(request, '_db_read_alias'):
+        sticky = user_id is not None and cache.get(_sticky_key(user_id))
+        request._db_read_alias = None if sticky else random.choice(settings.DATABASE_REPLICAS)
+    return request._db_read_alias
+
+
+async def aread_alias(request):
+    """Como `read_alias`, para views assíncronas com sessão."""
+    if not _routable(request):
+        return None
+    if not hasattr(request, '_db_read_alias'):
+        user_id = await request.session.aget(SESSION_KEY)
+        sticky = user_id is not None and await cache.aget(_sticky_key(user_id))
+        request._db_read_alias = None if sticky else random.choice(settings.DATABASE_REPLICAS)
+    return request._db_read_alias
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # As réplicas são cópias da base principal.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaReadMixin:
+    """Para views Django só de leitura (autenticação por sessão)."""
+
+    def dispatch(self, request, *args, **kwargs):
+        # O id vem da sessão: não é preciso carregar o utilizador só para decidir.
+        token = _read_alias.set(read_alias(request, request.session.get(SESSION_KEY)))
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+
+
+class AsyncReplicaReadMixin:
+    """Como `ReplicaReadMixin`, para views com handlers assíncronos."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        token = _read_alias.set(await aread_alias(request))
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+
+
+class ReplicaReadViewSetMixin:
+    """Para viewsets DRF: só `replica_actions`, depois da autenticação (JWT)."""
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions:
+            self._read_alias_token = _read_alias.set(read_alias(request, request.user.pk))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_read_alias_token', None)
+        if token is not None:
+            _read_alias.reset(token)
+            self._read_alias_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+def _written(request, response):
+    return request.method not in SAFE_METHODS and response.status_code < 400
+
+
+class StickyWritesMiddleware:
+    """Marca o utilizador depois de um pedido bem-sucedido que altera dados."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if _written(request, response):
+            # O DRF copia para aqui o utilizador autenticado por JWT.
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                mark_written(user.pk)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if _written(request, response):
+            user = getattr(request, 'user', None)
+            # Ainda o utilizador preguiçoso da sessão: carregá-lo aqui seria uma consulta síncrona.
+            if type(user) is SimpleLazyObject and user._wrapped is empty:
+                user = await request.auser()
+            if user is not None and user.is_authenticated:
+                await amark_written(user.pk)
+        return response
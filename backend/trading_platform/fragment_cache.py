@@ -0,0 +1,123 @@
+"""
+Cache de fragmentos HTML para os painéis HTMX.
+
+Cada fragmento é guardado sob uma chave que inclui a versão dos âmbitos de
+que depende (por exemplo `user:42` ou `chat`). Os sinais `post_save` e
+`post_delete` dos modelos incrementam essas versões, pelo que um painel só é
+renderizado de novo quando os seus dados mudam; as entradas antigas
+simplesmente expiram.
+
+As versões vivem na cache do Django: com vários processos, `CACHES` tem de
+apontar para um backend partilhado (Redis). Os fragmentos não podem conter
+dados que variem por pedido, como `{% csrf_token %}`.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+_stats = {'hits': 0, 'misses': 0, 'render_ms': 0.0, 'render_ms_saved': 0.0}
+_stats_lock = threading.Lock()
+
+
+def user_scope(user_id):
+    return f'user:{user_id}'
+
+
+def _version_key(scope):
+    return f'frag:v:{scope}'
+
+
+def get_versions(scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, 1, None)
+            versions[key] = cache.get(key, 1)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 2, None)
+
+
+def _fragment_key(name, scopes, versions, variant=None):
+    key = 'frag:{}:{}'.format(name, ':'.join(f'{scope}.{version}' for scope, version in zip(scopes, versions)))
+    return key if variant is None else f'{key}:{variant}'
+
+
+def _hit(entry):
+    html, render_ms = entry
+    with _stats_lock:
+        _stats['hits'] += 1
+        _stats['render_ms_saved'] += render_ms
+    return HttpResponse(html)
+
+
+def _render(request, template, context):
+    started = time.perf_counter()
+    html = render_to_string(template, context, request=request)
+    render_ms = (time.perf_counter() - started) * 1000
+    with _stats_lock:
+        _stats['misses'] += 1
+        _stats['render_ms'] += render_ms
+    return html, render_ms
+
+
+def render_cached(request, name, scopes, template, get_context, variant=None):
+    """Devolve o fragmento `name` da cache ou renderiza `template` com `get_context()`.
+
+    `variant` entra na chave: para dados locais ao processo que podem estar
+    atrasados em relação à versão partilhada (por exemplo, o anel do chat).
+    """
+    key = _fragment_key(name, scopes, get_versions(scopes), variant)
+    entry = cache.get(key)
+    if entry is not None:
+        return _hit(entry)
+    entry = _render(request, template, get_context())
+    cache.set(key, entry, settings.FRAGMENT_CACHE_TIMEOUT)
+    return HttpResponse(entry[0])
+
+
+async def aget_versions(scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    versions = await cache.aget_many(keys)
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, 1, None)
+            versions[key] = await cache.aget(key, 1)
+    return [versions[key] for key in keys]
+
+
+async def arender_cached(request, name, scopes, template, get_context, variant=None):
+    """Como `render_cached`, para views assíncronas: `get_context` é uma corrotina."""
+    key = _fragment_key(name, scopes, await aget_versions(scopes), variant)
+    entry = await cache.aget(key)
+    if entry is not None:
+        return _hit(entry)
+    entry = _render(request, template, await get_context())
+    await cache.aset(key, entry, settings.FRAGMENT_CACHE_TIMEOUT)
+    return HttpResponse(entry[0])
+
+
+def stats():
+    with _stats_lock:
+        data = dict(_stats)
+    lookups = data['hits'] + data['misses']
+    data['hit_ratio'] = data['hits'] / lookups if lookups else 0.0
+    return data
+
+
+def reset_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0 if key in ('hits', 'misses') else 0.0
@@ -0,0 +1,299 @@
+"""
+Instrumentação dos pedidos HTTP.
+
+`RequestMetricsMiddleware` mede, por pedido, o número e o tempo das consultas
+SQL, o tempo de renderização de templates (com o backend
+`InstrumentedDjangoTemplates` em `TEMPLATES`), o tempo da view e o total. Os
+valores seguem no cabeçalho `Server-Timing` e são agregados em histogramas
+por nome de URL, expostos em formato Prometheus por `MetricsView`. O
+middleware funciona em modo síncrono e assíncrono (ASGI); as consultas do ORM
+assíncrono contam porque o contexto do pedido segue para o `sync_to_async`.
+
+Com `INSTRUMENTATION_SAMPLE_RATE` abaixo de 1, só a fração indicada de pedidos
+é medida em detalhe (SQL, templates e cabeçalho); os restantes só contam para
+o histograma de duração, o que mantém o custo desprezável sob carga. As
+consultas feitas noutras threads (por exemplo, os painéis do dashboard
+renderizados em paralelo) não são atribuídas ao pedido.
+
+`assert_max_queries` é um orçamento de consultas para os testes.
+"""
+import contextlib
+import contextvars
+import ipaddress
+import random
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates, Template
+from django.views import View
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    """Histograma cumulativo à Prometheus, com uma série por etiqueta."""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label, value):
+        with self._lock:
+            series = self.series.get(label)
+            if series is None:
+                series = self.series[label] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def reset(self):
+        with self._lock:
+            self.series.clear()
+
+    def exposition(self, label_name):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {label: (list(counts), total) for label, (counts, total) in self.series.items()}
+        for label, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_name}="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_name}="{label}"}} {total:.6f}')
+            lines.append(f'{self.name}_count{{{label_name}="{label}"}} {cumulative}')
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Duração dos pedidos por nome de URL.', DURATION_BUCKETS,
+)
+DB_DURATION = Histogram(
+    'http_request_db_seconds', 'Tempo em consultas SQL por pedido (pedidos amostrados).', DURATION_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'http_request_db_queries', 'Consultas SQL por pedido (pedidos amostrados).', QUERY_BUCKETS,
+)
+TEMPLATE_DURATION = Histogram(
+    'http_request_template_seconds', 'Tempo de renderização de templates por pedido (pedidos amostrados).',
+    DURATION_BUCKETS,
+)
+HISTOGRAMS = (REQUEST_DURATION, DB_DURATION, DB_QUERIES, TEMPLATE_DURATION)
+
+
+def reset_metrics():
+    for histogram in HISTOGRAMS:
+        histogram.reset()
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'db_seconds', 'template_seconds', 'view_started')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.view_started = None
+
+
+def _timed_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_seconds += time.perf_counter() - started
+        metrics.queries += 1
+
+
+def _install_query_timer(connection, **kwargs):
+    """Instala `_timed_query` como execute_wrapper permanente da ligação (uma vez por ligação)."""
+    if _timed_query not in connection.execute_wrappers:
+        # À cabeça: `execute_wrapper()` retira o último da lista ao sair, e a ligação pode
+        # abrir-se (e disparar `connection_created`) dentro de um desses blocos.
+        connection.execute_wrappers.insert(0, _timed_query)
+
+
+# Cada ligação nova, em qualquer thread (pedidos síncronos e as threads do ORM assíncrono),
+# e as já abertas nesta thread antes de o módulo ser importado.
+connection_created.connect(_install_query_timer)
+for _connection in connections.all(initialized_only=True):
+    _install_query_timer(_connection)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_seconds += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Backend `DjangoTemplates` que mede o tempo de renderização para o `RequestMetricsMiddleware`.
+
+    Só os templates de topo passam pelo backend: includes e extends não são contados duas vezes.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+def _url_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        # Pedidos sem rota ficam numa só série para limitar a cardinalidade.
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+            # Um process_view síncrono passaria pela threadpool em cada pedido.
+            self.process_view = self._aprocess_view
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        metrics, token = _begin()
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                _current.reset(token)
+        return _finish(request, response, metrics, started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        metrics, token = _begin()
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                _current.reset(token)
+        return _finish(request, response, metrics, started)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _view_started()
+
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        _view_started()
+
+
+def _view_started():
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.view_started = time.perf_counter()
+
+
+def _begin():
+    if random.random() >= settings.INSTRUMENTATION_SAMPLE_RATE:
+        return None, None
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def _finish(request, response, metrics, started):
+    finished = time.perf_counter()
+    total = finished - started
+    name = _url_name(request)
+    REQUEST_DURATION.observe(name, total)
+    if metrics is None:
+        return response
+    view = finished - metrics.view_started if metrics.view_started else 0.0
+    DB_DURATION.observe(name, metrics.db_seconds)
+    DB_QUERIES.observe(name, metrics.queries)
+    TEMPLATE_DURATION.observe(name, metrics.template_seconds)
+    timing = (
+        f'db;dur={metrics.db_seconds * 1000:.2f};desc="{metrics.queries} queries", '
+        f'tpl;dur={metrics.template_seconds * 1000:.2f}, view;dur={view * 1000:.2f}, '
+        f'app;dur={total * 1000:.2f}'
+    )
+    # As views podem ter o seu próprio Server-Timing (por exemplo, os painéis do dashboard).
+    if response.has_header('Server-Timing'):
+        timing = f'{response["Server-Timing"]}, {timing}'
+    response['Server-Timing'] = timing
+    return response
+
+
+def _stats_lines(prefix, stats):
+    lines = []
+    for key, value in sorted(stats.items()):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f'# TYPE {prefix}_{key} gauge')
+            lines.append(f'{prefix}_{key} {value}')
+    return lines
+
+
+def exposition():
+    """Todas as métricas deste processo em formato de texto Prometheus."""
+    from chat.consumers import fanout_stats
+    from . import fragment_cache
+
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.exposition('view'))
+    lines.extend(_stats_lines('fragment_cache', fragment_cache.stats()))
+    lines.extend(_stats_lines('chat_fanout', fanout_stats()))
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsView(View):
+    """
+    Endpoint para o Prometheus; só responde aos endereços de `METRICS_ALLOWED_IPS`.
+    """
+    def get(self, request):
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', '0.0.0.0'))
+        if not any(address in ipaddress.ip_network(network) for network in settings.METRICS_ALLOWED_IPS):
+            return HttpResponseForbidden()
+        return HttpResponse(exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextlib.contextmanager
+def assert_max_queries(limit, using=None):
+    """Falha se o bloco fizer mais de `limit` consultas SQL, listando-as."""
+    executed = []
+
+    def record(execute, sql, params, many, context):
+        executed.append(sql)
+        return execute(sql, params, many, context)
+
+    aliases = [using] if using else list(connections)
+    with contextlib.ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(connections[alias].execute_wrapper(record))
+        yield executed
+    if len(executed) > limit:
+        listing = '\n'.join(f'{i}. {sql}' for i, sql in enumerate(executed, 1))
+        raise QueryBudgetExceeded(f'{len(executed)} consultas, orçamento de {limit}:\n{listing}')
@@ -1,6 +1,9 @@
+import importlib.util
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', 'your-secret-key')
@@ -24,15 +27,19 @@ INSTALLED_APPS = [
     'news',
     'automation',
     'chat',
+    'benchmarks',
     # 'django_vite',  # Adicionado para integração com Vite
 ]
 
 MIDDLEWARE = [
+    # Primeiro, para que a duração medida inclua os restantes middlewares.
+    'trading_platform.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'trading_platform.db_routing.StickyWritesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -41,7 +48,8 @@ ROOT_URLCONF = 'trading_platform.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates com o tempo de renderização medido para o Server-Timing
+        'BACKEND': 'trading_platform.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -58,6 +66,21 @@ TEMPLATES = [
 WSGI_APPLICATION = 'trading_platform.wsgi.application'
 ASGI_APPLICATION = 'trading_platform.asgi.application'
 
+# Ligações persistentes (segundos; 0 fecha no fim de cada pedido), validadas antes de serem reutilizadas.
+# Sob ASGI cada pedido síncrono corre numa thread do sync_to_async e uma ligação persistente fica presa
+# à thread que a abriu: mantenha 0 e reutilize ligações com DB_POOL_SIZE ou um PgBouncer
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '0'))
+
+# Pool de ligações por processo do psycopg 3 (tamanho máximo; 0 desliga); exige DB_CONN_MAX_AGE=0.
+# Por omissão 10 se o psycopg_pool estiver instalado (requirements.txt), senão desligado
+_HAS_PSYCOPG_POOL = importlib.util.find_spec('psycopg_pool') is not None
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '10' if _HAS_PSYCOPG_POOL else '0'))
+# Pool de cada réplica de leitura (por omissão, o mesmo tamanho que o da base principal)
+DB_REPLICA_POOL_SIZE = int(os.environ.get('DB_REPLICA_POOL_SIZE', DB_POOL_SIZE))
+
+# Ligações através de um PgBouncer em modo transaction: sem cursores no servidor (exportações)
+DB_PGBOUNCER = os.environ.get('DB_PGBOUNCER', '0') == '1'
+
 if os.environ.get('USE_SQLITE_FOR_TESTS', '0') == '1':
     DATABASES = {
         'default': {
@@ -65,6 +88,11 @@ if os.environ.get('USE_SQLITE_FOR_TESTS', '0') == '1':
             'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
         }
     }
+    # Réplicas locais: ficheiros SQLite copiados da base principal, separados por vírgulas
+    DATABASE_REPLICA_SETTINGS = [
+        {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}
+        for path in filter(None, os.environ.get('SQLITE_REPLICA_PATHS', '').split(','))
+    ]
 else:
     DATABASES = {
         'default': {
@@ -74,26 +102,133 @@ else:
             'PASSWORD': os.environ.get('POSTGRES_PASSWORD', 'postgres'),
             'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
             'PORT': os.environ.get('POSTGRES_PORT', '54322'),  # Supabase local Postgres
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
         }
     }
+    if (DB_POOL_SIZE or DB_REPLICA_POOL_SIZE) and not _HAS_PSYCOPG_POOL:
+        raise ImproperlyConfigured(
+            'DB_POOL_SIZE/DB_REPLICA_POOL_SIZE exigem o psycopg 3 com o pool: pip install "psycopg[binary,pool]".'
+        )
+    if DB_POOL_SIZE:
+        DATABASES['default']['OPTIONS'] = {'pool': {'min_size': 1, 'max_size': DB_POOL_SIZE}}
+    # Réplicas de leitura (host:porta separados por vírgulas), com as credenciais da base principal
+    # e o seu próprio pool
+    DATABASE_REPLICA_SETTINGS = [
+        {
+            **DATABASES['default'], 'HOST': host.partition(':')[0], 'PORT': host.partition(':')[2] or '5432',
+            'OPTIONS': {'pool': {'min_size': 1, 'max_size': DB_REPLICA_POOL_SIZE}} if DB_REPLICA_POOL_SIZE else {},
+        }
+        for host in filter(None, os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(','))
+    ]
+
+for _index, _replica in enumerate(DATABASE_REPLICA_SETTINGS, 1):
+    # Nos testes as réplicas apontam para a base de testes principal.
+    DATABASES[f'replica_{_index}'] = {**_replica, 'TEST': {'MIRROR': 'default'}}
+DATABASE_REPLICAS = [f'replica_{index}' for index in range(1, len(DATABASE_REPLICA_SETTINGS) + 1)]
+DATABASE_ROUTERS = ['trading_platform.db_routing.ReplicaRouter']
+
+# Segundos em que as leituras de um utilizador ficam na base principal depois de uma escrita sua
+DATABASE_REPLICA_STICKY_SECONDS = int(os.environ.get('DATABASE_REPLICA_STICKY_SECONDS', '5'))
 
 AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
 }
 
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
-}
+# Com vários processos a cache tem de ser partilhada (as versões da cache de
+# fragmentos vivem aqui); sem REDIS_URL usa-se memória local.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Segundos que o utilizador autenticado por JWT fica em cache (0 consulta sempre a base de dados); só com
+# uma cache partilhada entre processos (Redis), senão a invalidação não chegaria aos outros workers
+AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL', '60'))
+
+# Tempo máximo (segundos) de um fragmento HTMX na cache
+FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('FRAGMENT_CACHE_TIMEOUT', '300'))
+
+# Listagens da API de trading com o serializer compilado (values_list, sem modelos)
+API_FAST_SERIALIZATION = os.environ.get('API_FAST_SERIALIZATION', '1') == '1'
+
+# Views HTMX assíncronas (trading, chat, automação); só compensam servidas por ASGI
+ASYNC_HTMX_VIEWS = os.environ.get('ASYNC_HTMX_VIEWS', '0') == '1'
+
+# Threads usadas para renderizar os painéis do dashboard em paralelo (1 = sequencial, na ligação do
+# pedido). Cada thread abre e fecha a sua ligação à base de dados por painel, por isso só é usado
+# com DB_POOL_SIZE ou DB_PGBOUNCER; sem eles os painéis são sempre renderizados em sequência
+DASHBOARD_PANEL_WORKERS = int(os.environ.get('DASHBOARD_PANEL_WORKERS', '1'))
+
+# Chat: tamanho do histórico em memória por sala e escrita diferida em lote
+CHAT_HISTORY_SIZE = int(os.environ.get('CHAT_HISTORY_SIZE', '30'))
+CHAT_HISTORY_SYNC_INTERVAL = float(os.environ.get('CHAT_HISTORY_SYNC_INTERVAL', '5.0'))
+CHAT_FLUSH_SIZE = int(os.environ.get('CHAT_FLUSH_SIZE', '200'))
+CHAT_FLUSH_INTERVAL = float(os.environ.get('CHAT_FLUSH_INTERVAL', '1.0'))
+
+# Chat: mensagens por gravar guardadas enquanto a base de dados falha (as mais antigas são descartadas)
+CHAT_MAX_PENDING = int(os.environ.get('CHAT_MAX_PENDING', '10000'))
+
+# Chat WebSocket: fila de envio por ligação e limite de mensagens recebidas (por segundo)
+CHAT_SEND_QUEUE_SIZE = int(os.environ.get('CHAT_SEND_QUEUE_SIZE', '100'))
+CHAT_RATE_LIMIT = float(os.environ.get('CHAT_RATE_LIMIT', '5'))
+CHAT_RATE_BURST = int(os.environ.get('CHAT_RATE_BURST', '10'))
+
+# Channel layer partilhado pelos workers ASGI. Com Redis, CHANNEL_REDIS_HOSTS aceita
+# vários endereços separados por vírgulas (os canais são distribuídos por eles);
+# numa só máquina sem Redis, CHANNEL_BROKER_SOCKET aponta para o socket Unix do
+# comando `run_channel_broker`. Sem nenhum dos dois fica em memória, o que só
+# funciona com um único worker.
+CHANNEL_REDIS_HOSTS = [
+    host for host in os.environ.get('CHANNEL_REDIS_HOSTS', os.environ.get('REDIS_URL', '')).split(',') if host
+]
+CHANNEL_BROKER_SOCKET = os.environ.get('CHANNEL_BROKER_SOCKET', '')
+CHANNEL_LAYER_CAPACITY = int(os.environ.get('CHANNEL_LAYER_CAPACITY', '200'))
+if CHANNEL_REDIS_HOSTS:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': CHANNEL_REDIS_HOSTS,
+                'capacity': CHANNEL_LAYER_CAPACITY,
+                'expiry': 10,
+            },
+        },
+    }
+elif CHANNEL_BROKER_SOCKET:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'trading_platform.channel_layers.UnixSocketChannelLayer',
+            'CONFIG': {
+                'path': CHANNEL_BROKER_SOCKET,
+                'capacity': CHANNEL_LAYER_CAPACITY,
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
 
 # Configuração do Django Vite
 DJANGO_VITE_ASSETS_PATH = BASE_DIR / "static" / "dist"
@@ -108,4 +243,48 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 
 # External API keys
 ALPHA_VANTAGE_API_KEY = os.environ.get('ALPHA_VANTAGE_API_KEY', '')
+
+# Ingestão de cotações: intervalo (segundos) entre escritas em lote em MarketTicker
+MARKET_DATA_FLUSH_INTERVAL = float(os.environ.get('MARKET_DATA_FLUSH_INTERVAL', '1.0'))
+
+# Tabela de últimos preços em memória partilhada, escrita pela ingestão e lida pelos workers
+# (vazio = desativada): ficheiro, número máximo de símbolos e idade máxima (segundos) do
+# último flush antes de voltar a ler MarketTicker
+MARKET_SNAPSHOT_PATH = os.environ.get(
+    'MARKET_SNAPSHOT_PATH', '/dev/shm/trading-prices' if os.path.isdir('/dev/shm') else '',
+)
+MARKET_SNAPSHOT_CAPACITY = int(os.environ.get('MARKET_SNAPSHOT_CAPACITY', '4096'))
+MARKET_SNAPSHOT_MAX_AGE = float(os.environ.get('MARKET_SNAPSHOT_MAX_AGE', '60'))
+
+# Risco pré-negociação: limites para utilizadores sem RiskSettings (vazio = sem limite)
+# e intervalo (segundos) para reler o estado de cada utilizador da base de dados
+RISK_DEFAULT_MAX_POSITION_SIZE = float(os.environ['RISK_DEFAULT_MAX_POSITION_SIZE']) if os.environ.get('RISK_DEFAULT_MAX_POSITION_SIZE') else None
+RISK_DEFAULT_MAX_MARGIN = float(os.environ['RISK_DEFAULT_MAX_MARGIN']) if os.environ.get('RISK_DEFAULT_MAX_MARGIN') else None
+RISK_RESYNC_INTERVAL = float(os.environ.get('RISK_RESYNC_INTERVAL', '60'))
+
+# Número máximo de ordens num pedido a orders/batch/
+ORDER_BATCH_MAX_SIZE = int(os.environ.get('ORDER_BATCH_MAX_SIZE', '500'))
+
+# Instrumentação: fração dos pedidos medidos em detalhe (SQL, templates, Server-Timing)
+# e redes autorizadas a ler /metrics
+INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get('INSTRUMENTATION_SAMPLE_RATE', '1.0'))
+METRICS_ALLOWED_IPS = os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1/32,::1/128').split(',')
+
+# Livro de execuções: execuções de (utilizador, símbolo) entre snapshots do estado FIFO
+LEDGER_SNAPSHOT_INTERVAL = int(os.environ.get('LEDGER_SNAPSHOT_INTERVAL', '50'))
+
+# Intervalo (segundos) entre recargas das automações ativas pelo runtime de estratégias
+AUTOMATION_RELOAD_INTERVAL = float(os.environ.get('AUTOMATION_RELOAD_INTERVAL', '5.0'))
+
+# Frames por segundo, no máximo, enviados a cada cliente do stream de mercado
+MARKET_STREAM_MAX_RATE = float(os.environ.get('MARKET_STREAM_MAX_RATE', '4'))
+
+# Símbolos que cada cliente do stream de mercado pode subscrever ao mesmo tempo
+MARKET_STREAM_MAX_SYMBOLS = int(os.environ.get('MARKET_STREAM_MAX_SYMBOLS', '100'))
 NEWS_API_KEY = os.environ.get('NEWS_API_KEY', '')
+
+# NewsAPI: cache partilhada (segundos) e timeouts (ligação, leitura)
+NEWS_API_URL = os.environ.get('NEWS_API_URL', 'https://newsapi.org/v2/everything')
+NEWS_CACHE_TTL = int(os.environ.get('NEWS_CACHE_TTL', '300'))
+NEWS_CACHE_STALE_TTL = int(os.environ.get('NEWS_CACHE_STALE_TTL', '3600'))
+NEWS_API_TIMEOUT = (3.05, 10)
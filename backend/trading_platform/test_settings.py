@@ -7,3 +7,16 @@ DATABASES = {
         'NAME': ':memory:',
     }
 }
+
+# Réplica de leitura: espelho da base de testes, usada só nos testes que definem DATABASE_REPLICAS
+DATABASES['replica_1'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+
+# Testes correm num só processo
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
+
+# Sem tabela de preços partilhada: os testes que a usam indicam um ficheiro temporário
+MARKET_SNAPSHOT_PATH = ''
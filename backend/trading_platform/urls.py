@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include, re_path
-from .views import index
+from .views import index, FragmentCacheStatsView, ChatFanoutStatsView
+from .instrumentation import MetricsView
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
 from django.views.decorators.csrf import csrf_exempt
 from django.http import HttpResponseRedirect
@@ -15,6 +16,11 @@ urlpatterns = [
     path('api/auth/', include('users.urls')),
     path('api/trading/', include('trading.urls')),
     path('api/news/', include('news.urls')),
+    path('api/automation/', include('automation.urls')),
+    path('api/chat/', include('chat.urls')),
+    path('api/metrics/fragment-cache/', FragmentCacheStatsView.as_view(), name='fragment-cache-stats'),
+    path('api/metrics/chat/', ChatFanoutStatsView.as_view(), name='chat-fanout-stats'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/docs/swagger-ui/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('api/docs/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
@@ -1,4 +1,9 @@
 from django.shortcuts import render
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from users.permissions import IsAdmin
+from chat.consumers import fanout_stats
+from . import fragment_cache
 
 def index(request):
     """
@@ -6,3 +11,23 @@ def index(request):
     carrega a aplicação React.
     """
     return render(request, "base.html")
+
+
+class FragmentCacheStatsView(APIView):
+    """
+    Métricas da cache de fragmentos HTMX deste processo.
+    """
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        return Response(fragment_cache.stats())
+
+
+class ChatFanoutStatsView(APIView):
+    """
+    Métricas de fan-out do chat WebSocket deste processo.
+    """
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        return Response(fanout_stats())
@@ -0,0 +1,95 @@
+"""
+Autenticação JWT com o utilizador em cache.
+
+`CachedJWTAuthentication` valida o token como o `JWTAuthentication` do
+simplejwt, mas vai buscar o utilizador à cache do Django em vez de à base de
+dados. Só ficam em cache o `pk`, o `role` que as permissões verificam, o
+`is_active` e o resumo da palavra-passe que revoga os tokens (nunca o hash);
+os restantes campos são lidos da base de dados se uma view os usar. Em regime
+estável um pedido autenticado não faz consultas de autenticação.
+
+Cada utilizador tem na cache um token de versão aleatório; a entrada em cache
+guarda a versão com que foi lida e só é válida enquanto ela for a atual. Os
+sinais de `User` (`save()`, incluindo mudanças de `role`, e `delete()`)
+trocam a versão, o que invalida a entrada mesmo que uma leitura concorrente
+grave depois uma cópia antiga. Atualizações com `QuerySet.update()` não
+emitem sinais: chame `invalidate_user`.
+
+A troca de versão só chega aos outros processos através de uma cache
+partilhada (Redis, ficheiros, base de dados). Com uma cache local a cada
+processo (`LocMemCache`) a cache de utilizadores fica desligada.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# Campos guardados na cache, pela ordem em que estão no modelo (como `from_db` os espera);
+# os outros ficam diferidos e são lidos só se forem usados.
+CACHED_FIELDS = ('id', 'is_active', 'role')
+
+
+def _version_key(user_id):
+    return f'auth:v:{user_id}'
+
+
+def _user_key(user_id):
+    return f'auth:u:{user_id}'
+
+
+def invalidate_user(user_id):
+    cache.set(_version_key(user_id), uuid.uuid4().hex, None)
+
+
+def user_cache_ttl():
+    """TTL efetivo: 0 se a cache não for partilhada entre processos (a invalidação não chegaria aos outros)."""
+    if isinstance(caches['default'], (LocMemCache, DummyCache)):
+        return 0
+    return settings.AUTH_USER_CACHE_TTL
+
+
+def _revoke_digest(password):
+    return get_md5_hash_password(password) if api_settings.CHECK_REVOKE_TOKEN else None
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        ttl = user_cache_ttl()
+        if ttl <= 0:
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        version_key, user_key = _version_key(user_id), _user_key(user_id)
+        found = cache.get_many([version_key, user_key])
+        version = found.get(version_key)
+        if version is None:
+            cache.add(version_key, uuid.uuid4().hex, None)
+            version = cache.get(version_key)
+        entry = found.get(user_key)
+        if entry is not None and entry[0] == version:
+            values, digest = entry[1], entry[2]
+            # As mesmas verificações do simplejwt, sobre a cópia em cache.
+            if api_settings.CHECK_USER_IS_ACTIVE and not values[CACHED_FIELDS.index('is_active')]:
+                raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+            if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != digest:
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+            # Instância com os restantes campos diferidos, como a de um `.only()`.
+            return self.user_model.from_db(router.db_for_read(self.user_model), CACHED_FIELDS, values)
+
+        user = super().get_user(validated_token)
+        cache.set(
+            user_key, (version, tuple(getattr(user, field) for field in CACHED_FIELDS), _revoke_digest(user.password)),
+            ttl,
+        )
+        return user
@@ -0,0 +1,102 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from trading_platform.instrumentation import assert_max_queries
+from users.authentication import CachedJWTAuthentication, invalidate_user
+from users.models import User
+
+
+def authenticate(user):
+    token = RefreshToken.for_user(user).access_token
+    request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+    return CachedJWTAuthentication().authenticate(request)[0]
+
+
+@pytest.fixture
+def trader(settings, tmp_path):
+    # Uma cache partilhada entre processos; com a LocMemCache a cache de utilizadores fica desligada.
+    settings.CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': str(tmp_path)},
+    }
+    cache.clear()
+    return User.objects.create_user(username='trader', password='x')
+
+
+@pytest.mark.django_db
+def test_cached_user_needs_no_queries(trader):
+    """
+    Depois do primeiro pedido, o utilizador vem da cache sem consultas.
+    """
+    with assert_max_queries(1):
+        assert authenticate(trader).pk == trader.pk
+    with assert_max_queries(0):
+        user = authenticate(trader)
+        assert (user.pk, user.role, user.is_active) == (trader.pk, 'trader', True)
+    # Nem o hash da palavra-passe nem os outros campos vão para a cache: são lidos só se usados.
+    assert 'password' not in user.__dict__
+    with assert_max_queries(1):
+        assert user.username == 'trader'
+
+
+@pytest.mark.django_db
+def test_save_invalidates_role_and_active(trader):
+    authenticate(trader)
+    trader.role = 'admin'
+    trader.save()
+    assert authenticate(trader).role == 'admin'
+
+    trader.is_active = False
+    trader.save()
+    with pytest.raises(AuthenticationFailed):
+        authenticate(trader)
+
+
+@pytest.mark.django_db
+def test_queryset_update_needs_explicit_invalidation(trader):
+    authenticate(trader)
+    User.objects.filter(pk=trader.pk).update(role='manager')
+    assert authenticate(trader).role == 'trader'
+    invalidate_user(trader.pk)
+    assert authenticate(trader).role == 'manager'
+
+
+@pytest.mark.django_db
+def test_ttl_zero_reads_database(trader, settings):
+    settings.AUTH_USER_CACHE_TTL = 0
+    authenticate(trader)
+    with assert_max_queries(1) as executed:
+        authenticate(trader)
+    assert len(executed) == 1
+
+
+@pytest.mark.django_db
+def test_process_local_cache_disables_the_user_cache(settings):
+    """
+    Com a LocMemCache a invalidação não chegaria aos outros processos: cada pedido lê a base de dados.
+    """
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    user = User.objects.create_user(username='local', password='x')
+    authenticate(user)
+    with assert_max_queries(1) as executed:
+        authenticate(user)
+    assert len(executed) == 1
+
+
+@pytest.mark.django_db
+def test_cached_entry_still_revokes_tokens_after_password_change(trader, monkeypatch):
+    """
+    A cache guarda só o resumo da palavra-passe, o bastante para recusar tokens emitidos antes da mudança.
+    """
+    # Os módulos do simplejwt guardam o objeto `api_settings`; reatribuir SIMPLE_JWT não lhes chega.
+    monkeypatch.setattr(api_settings, 'CHECK_REVOKE_TOKEN', True)
+    old = RefreshToken.for_user(trader).access_token
+    trader.set_password('y')
+    trader.save()
+    assert authenticate(trader).pk == trader.pk
+    request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {old}')
+    with assert_max_queries(0), pytest.raises(AuthenticationFailed):
+        CachedJWTAuthentication().authenticate(request)